@@ -1,6 +1,15 @@
-from flask import Flask, request, redirect, url_for, flash, jsonify, render_template
+from flask import Flask, request, redirect, url_for, flash, jsonify, render_template, stream_with_context, send_from_directory, send_file
 from flask_sqlalchemy import SQLAlchemy
+from flask_migrate import Migrate, upgrade
 import os
+import sys
+import atexit
+import json
+import base64
+import io
+import hashlib
+import hmac
+import zipfile
 import face_recognition
 from werkzeug.utils import secure_filename
 from PIL import Image
@@ -10,7 +19,31 @@ import time
 from datetime import datetime, timedelta
 import threading
 import queue
+from collections import deque
 import dlib 
+from config import Config
+from face_gallery import gallery
+from face_matchers import create_matcher
+from camera_pipeline import CameraPipeline
+from camera_sessions import CameraSessionRegistry, SourceUnavailable
+from recognition_service import RecognitionSupervisor
+from face_tracking import FaceTracker
+from face_detection import detect_faces, parse_detection_scale, parse_detection_model, parse_detection_upsample
+from motion_gate import MotionGate
+from encoding_service import BatchEncoder
+from attendance_cache import AttendanceDedup
+from attendance_writer import AttendanceWriter
+from event_bus import EventBus
+from presence import PresenceTable
+from mjpeg import EncodedFrame, stream_variant
+from encoding_storage import Float32Encoding, open_gallery_snapshot, write_gallery_snapshot
+from bulk_enrollment import BulkEnrollmentJob, ZipSource, DirectorySource
+from video_analysis import VideoAnalysisJob, probe_video
+from chunked_upload import ChunkedUploads, UploadError
+from metrics import MetricsRegistry
+from profiling import capture_profile
+from thumbnails import (thumbnail_extension, thumbnail_name, parse_thumbnail_name, write_thumbnails,
+                        remove_thumbnails)
 
 if dlib.DLIB_USE_CUDA:
     print("Running on GPU")
@@ -21,6 +54,7 @@ else:
 app = Flask(__name__)
 
 # Configurations
+app.config.from_object(Config)
 app.config['SECRET_KEY'] = 'your_secret_key_here'
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///database.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
@@ -31,6 +65,7 @@ app.config['DETECTION_COOLDOWN_SECONDS'] = 30  # Time window to prevent duplicat
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 db = SQLAlchemy(app)
+migrate = Migrate(app, db)
 
 class Employee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -38,7 +73,11 @@ class Employee(db.Model):
     employee_id = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.Text, nullable=True)
     image_filename = db.Column(db.String(200), nullable=False)
-    face_encoding = db.Column(db.PickleType, nullable=False)  # Store numpy array as binary
+    face_encoding = db.Column(Float32Encoding, nullable=False)  # Version byte + 128 little-endian float32
+    image_sha256 = db.Column(db.String(64), nullable=True, index=True)  # Content hash of the enrolled image
+
+    # AUTOINCREMENT: a deleted employee's id is never handed to a new enrollment
+    __table_args__ = {'sqlite_autoincrement': True}
 
     def __repr__(self):
         return f'<Employee {self.name}>'
@@ -52,6 +91,14 @@ class CameraFeed(db.Model):
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Per-camera recognition settings; NULL falls back to the global default in config.Config
+    recognize_every_n_frames = db.Column(db.Integer, nullable=True)
+    recognize_interval_ms = db.Column(db.Integer, nullable=True)
+    detection_scale = db.Column(db.Float, nullable=True)  # Detect on a frame resized by this factor
+    detection_model = db.Column(db.String(10), nullable=True)  # 'hog' or 'cnn'
+    detection_upsample = db.Column(db.Integer, nullable=True)  # number_of_times_to_upsample
+    motion_gate_enabled = db.Column(db.Boolean, nullable=True)  # Skip detection on static frames
+    motion_gate_restrict_region = db.Column(db.Boolean, nullable=True)  # Detect only inside the motion box
 
     def __repr__(self):
         return f'<CameraFeed {self.name}>'
@@ -64,15 +111,109 @@ class AttendanceLog(db.Model):
     camera_feed_id = db.Column(db.Integer, db.ForeignKey('camera_feed.id'), nullable=True)
     camera_feed_name = db.Column(db.String(100), nullable=True)
     confidence_score = db.Column(db.Float, nullable=True)
+    employee_pk = db.Column(db.Integer, db.ForeignKey('employee.id', name='fk_attendance_log_employee_pk', ondelete='SET NULL'), nullable=True)
+    day = db.Column(db.Date, nullable=True)  # UTC date of timestamp, materialized for per-day lookups
+
+    employee = db.relationship('Employee')
+
+    __table_args__ = (
+        db.Index('ix_attendance_log_day_employee_pk', 'day', 'employee_pk'),
+        db.Index('ix_attendance_log_timestamp', 'timestamp'),
+        db.Index('ix_attendance_log_camera_feed_id_timestamp', 'camera_feed_id', 'timestamp'),
+    )
 
     def __repr__(self):
         return f'<AttendanceLog {self.employee_name} at {self.timestamp}>'
 
+class GalleryChange(db.Model):
+    id = db.Column(db.Integer, primary_key=True)  # Doubles as the gallery version
+    employee_pk = db.Column(db.Integer, nullable=False)
+    op = db.Column(db.String(10), nullable=False)  # 'upsert', 'delete'
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<GalleryChange {self.id} {self.op} {self.employee_pk}>'
+
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
+# Per-camera recognition settings: CameraFeed column -> (global default config key, type)
+CAMERA_RECOGNITION_SETTINGS = {
+    'recognize_every_n_frames': ('RECOGNIZE_EVERY_N_FRAMES', int),
+    'recognize_interval_ms': ('RECOGNIZE_INTERVAL_MS', int),
+    'detection_scale': ('DETECTION_SCALE', parse_detection_scale),
+    'detection_model': ('DETECTION_MODEL', parse_detection_model),
+    'detection_upsample': ('DETECTION_UPSAMPLE', parse_detection_upsample),
+    'motion_gate_enabled': ('MOTION_GATE_ENABLED', bool),
+    'motion_gate_restrict_region': ('MOTION_GATE_RESTRICT_REGION', bool),
+}
+
+def camera_setting(camera_feed, column):
+    """A camera's recognition setting, or the global default when unset"""
+    value = getattr(camera_feed, column, None) if camera_feed is not None else None
+    if value is None:
+        config_key, _ = CAMERA_RECOGNITION_SETTINGS[column]
+        value = app.config.get(config_key)
+    return value
+
+def apply_camera_settings(camera_feed, form):
+    """Set per-camera recognition settings from form fields; an empty value resets to the default"""
+    for column, (_, cast) in CAMERA_RECOGNITION_SETTINGS.items():
+        if column in form:
+            raw = form.get(column).strip()
+            if cast is bool:
+                setattr(camera_feed, column, raw.lower() == 'true' if raw else None)
+            else:
+                setattr(camera_feed, column, cast(raw) if raw else None)
+
+def file_sha256(path):
+    """Content hash of a saved image, used to spot images that are already enrolled"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def record_gallery_change(employee_pk, op):
+    """Add a gallery change row to the current session; its id becomes the new gallery version"""
+    change = GalleryChange(employee_pk=employee_pk, op=op)
+    db.session.add(change)
+    return change
+
+THUMBNAIL_EXT = thumbnail_extension(app.config.get('THUMBNAIL_FORMAT', 'webp'))
+
+def make_thumbnails(source, image_hash):
+    """Write an employee photo's thumbnails; failures are logged, the thumbnail route retries on request"""
+    try:
+        write_thumbnails(source, app.config['THUMBNAIL_FOLDER'], image_hash, app.config['THUMBNAIL_SIZES'],
+                         THUMBNAIL_EXT, app.config.get('THUMBNAIL_QUALITY', 80))
+    except (OSError, ValueError) as e:
+        print(f"Error writing thumbnails for {image_hash}: {e}")
+
+def discard_thumbnails(image_hash):
+    """Remove a photo's thumbnails once no employee uses that photo any more"""
+    if image_hash and not Employee.query.filter_by(image_sha256=image_hash).first():
+        remove_thumbnails(app.config['THUMBNAIL_FOLDER'], image_hash, app.config['THUMBNAIL_SIZES'], THUMBNAIL_EXT)
+
+def employee_image_urls():
+    """
+    Return urls(image_filename, image_sha256) -> (image_url, thumbnail_url), with the
+    URL prefixes computed once per response. Employees without a content hash fall
+    back to the original photo.
+    """
+    uploads_url = url_for('static', filename='uploads/', _external=True)
+    thumbnails_url = url_for('employee_thumbnail', filename='', _external=True)
+    size = app.config['THUMBNAIL_DEFAULT_SIZE']
+
+    def urls(image_filename, image_hash):
+        image_url = uploads_url + image_filename
+        if not image_hash:
+            return image_url, image_url
+        return image_url, thumbnails_url + thumbnail_name(image_hash, size, THUMBNAIL_EXT)
+    return urls
+
 @app.route('/')
 def home():
     return redirect('/live_detection_page')
@@ -106,10 +247,15 @@ def add_employee():
             employee_id=employee_id,
             description=description,
             image_filename=filename,
-            face_encoding=face_encoding
+            face_encoding=face_encoding,
+            image_sha256=file_sha256(filepath)
         )
         db.session.add(employee)
+        db.session.flush()
+        change = record_gallery_change(employee.id, 'upsert')
         db.session.commit()
+        gallery.upsert(employee.id, employee.name, face_encoding, version=change.id)
+        make_thumbnails(filepath, employee.image_sha256)
         return jsonify({'status': 'success', 'message': 'Employee added successfully'})
     except Exception as e:
         if os.path.exists(filepath):
@@ -118,17 +264,28 @@ def add_employee():
 
 @app.route('/employees', methods=['GET'])
 def list_employees():
-    employees = Employee.query.all()
-    result = []
-    for e in employees:
-        result.append({
-            'id': e.id,
-            'name': e.name,
-            'employee_id': e.employee_id,
-            'description': e.description,
-            'image_url': url_for('static', filename=f'uploads/{e.image_filename}', _external=True)
-        })
-    return jsonify(result)
+    """All employees; every employee change is a gallery change, so the gallery version is the ETag"""
+    etag = f'employees-{latest_gallery_version()}-{THUMBNAIL_EXT}'
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        urls = employee_image_urls()
+        employees = Employee.query.all()
+        result = []
+        for e in employees:
+            image_url, thumbnail_url = urls(e.image_filename, e.image_sha256)
+            result.append({
+                'id': e.id,
+                'name': e.name,
+                'employee_id': e.employee_id,
+                'description': e.description,
+                'image_url': image_url,
+                'thumbnail_url': thumbnail_url
+            })
+        response = jsonify(result)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
 
 @app.route('/edit_employee/<int:employee_id>', methods=['POST'])
 def edit_employee(employee_id):
@@ -145,7 +302,9 @@ def edit_employee(employee_id):
     if description is not None:
         employee.description = description
 
+    old_hash = None
     if file and hasattr(file, 'filename') and file.filename and allowed_file(file.filename):
+        old_hash = employee.image_sha256
         # Remove old image
         old_path = os.path.join(app.config['UPLOAD_FOLDER'], employee.image_filename)
         if os.path.exists(old_path):
@@ -161,9 +320,15 @@ def edit_employee(employee_id):
             return jsonify({'status': 'error', 'message': 'No face detected in new image'}), 400
         employee.face_encoding = encodings[0]
         employee.image_filename = filename
+        employee.image_sha256 = file_sha256(filepath)
 
     try:
+        change = record_gallery_change(employee.id, 'upsert')
         db.session.commit()
+        gallery.upsert(employee.id, employee.name, employee.face_encoding, version=change.id)
+        if old_hash is not None and old_hash != employee.image_sha256:
+            make_thumbnails(os.path.join(app.config['UPLOAD_FOLDER'], employee.image_filename), employee.image_sha256)
+            discard_thumbnails(old_hash)
         return jsonify({'status': 'success', 'message': 'Employee updated successfully'})
     except Exception as e:
         db.session.rollback()
@@ -173,11 +338,17 @@ def edit_employee(employee_id):
 def delete_employee(employee_id):
     employee = Employee.query.get_or_404(employee_id)
     image_path = os.path.join(app.config['UPLOAD_FOLDER'], employee.image_filename)
+    image_hash = employee.image_sha256
     try:
+        # Keep the history but detach it; SQLite does not enforce the SET NULL rule itself
+        AttendanceLog.query.filter_by(employee_pk=employee.id).update({'employee_pk': None})
         db.session.delete(employee)
+        change = record_gallery_change(employee_id, 'delete')
         db.session.commit()
+        gallery.remove(employee_id, version=change.id)
         if os.path.exists(image_path):
             os.remove(image_path)
+        discard_thumbnails(image_hash)
         return jsonify({'status': 'success', 'message': 'Employee deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -191,109 +362,1004 @@ def upload_video():
     filename = secure_filename(file.filename)
     filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
     file.save(filepath)
-    # Do not process video here, just return filename for live detection
-    return jsonify({'status': 'success', 'video_filename': filename})
+    if request.form.get('analyze', '').lower() != 'true':
+        # Not processed here, the filename is replayed by live detection
+        return jsonify({'status': 'success', 'video_filename': filename})
+    try:
+        job = start_video_analysis(filepath, filename, request.form)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid analysis parameter: {e}'}), 400
+    return jsonify({
+        'status': 'success',
+        'video_filename': filename,
+        'job_id': job.id,
+        'status_url': url_for('video_analysis_status', job_id=job.id)
+    }), 202
+
+# Resumable chunked video uploads: init, PUT chunks at an offset, finalize
+chunked_uploads = ChunkedUploads(
+    app.config['UPLOAD_CHUNK_FOLDER'],
+    max_bytes=app.config.get('UPLOAD_MAX_BYTES', 20 << 30),
+    max_active_per_client=app.config.get('UPLOAD_MAX_ACTIVE_PER_CLIENT', 2),
+    expire_seconds=app.config.get('UPLOAD_EXPIRE_SECONDS', 86400)
+)
+
+def upload_error_response(e):
+    body = {'status': 'error', 'message': str(e)}
+    if e.offset is not None:
+        body['offset'] = e.offset
+    return jsonify(body), e.status
+
+def upload_state(meta):
+    return {
+        'status': 'success',
+        'upload_id': meta['id'],
+        'filename': meta['filename'],
+        'size': meta['size'],
+        'offset': meta['offset'],
+        'chunk_size': app.config.get('UPLOAD_CHUNK_SIZE', 8 << 20),
+        'upload_url': url_for('upload_video_chunk', upload_id=meta['id'])
+    }
+
+@app.route('/upload_video/init', methods=['POST'])
+def upload_video_init():
+    """Start a chunked upload: filename and size (bytes), optionally the file's sha256"""
+    filename = secure_filename(request.form.get('filename') or '')
+    if not filename:
+        return jsonify({'status': 'error', 'message': 'No video filename provided'}), 400
+    try:
+        meta = chunked_uploads.init(request.remote_addr, filename, request.form.get('size', type=int) or 0,
+                                    request.form.get('sha256'))
+    except UploadError as e:
+        return upload_error_response(e)
+    return jsonify(upload_state(meta)), 201
+
+@app.route('/upload_video/<upload_id>', methods=['GET', 'PUT', 'DELETE'])
+def upload_video_chunk(upload_id):
+    """
+    GET: bytes received so far (the offset to resume from).
+    PUT: raw chunk body written at ?offset= (or the Upload-Offset header), with its
+    hex SHA-256 in the X-Chunk-SHA256 header.
+    DELETE: abandon the upload.
+    """
+    try:
+        if request.method == 'PUT':
+            offset = request.args.get('offset', type=int)
+            if offset is None:
+                offset = request.headers.get('Upload-Offset', type=int)
+            if offset is None or offset < 0:
+                raise UploadError('offset is required')
+            # request.stream is read in blocks; the chunk is never held in memory
+            new_offset = chunked_uploads.write(upload_id, offset, request.stream, request.content_length,
+                                               request.headers.get('X-Chunk-SHA256'))
+            return jsonify({'status': 'success', 'offset': new_offset})
+        if request.method == 'DELETE':
+            chunked_uploads.status(upload_id)
+            chunked_uploads.abort(upload_id)
+            return jsonify({'status': 'success', 'message': 'Upload discarded'})
+        return jsonify(upload_state(chunked_uploads.status(upload_id)))
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route('/upload_video/<upload_id>/finalize', methods=['POST'])
+def upload_video_finalize(upload_id):
+    """
+    Check the optional whole-file sha256 (given here or at init), move the file into the upload
+    folder and, with analyze=true, start offline analysis (sample_fps, recorded_at) on it.
+    """
+    try:
+        meta = chunked_uploads.status(upload_id)
+        filepath = os.path.join(app.config['UPLOAD_FOLDER'], meta['filename'])
+        chunked_uploads.finalize(upload_id, filepath, request.form.get('sha256'))
+    except UploadError as e:
+        return upload_error_response(e)
+    result = {'status': 'success', 'video_filename': meta['filename']}
+    if request.form.get('analyze', '').lower() == 'true':
+        try:
+            job = start_video_analysis(filepath, meta['filename'], request.form)
+        except ValueError as e:
+            return jsonify({'status': 'error', 'message': f'Invalid analysis parameter: {e}',
+                            'video_filename': meta['filename']}), 400
+        result.update(job_id=job.id, status_url=url_for('video_analysis_status', job_id=job.id))
+        return jsonify(result), 202
+    return jsonify(result)
+
+# Background jobs (bulk enrollment, video analysis) started by this process, by job id.
+# Their status is also copied to JOB_STATUS_FOLDER so any worker process can answer a status request.
+bulk_enrollment_jobs = {}
+video_analysis_jobs = {}
+job_registries = {'bulk_enroll': bulk_enrollment_jobs, 'analyze_video': video_analysis_jobs}
+jobs_lock = threading.Lock()
+job_status_thread = None
+JOBS_KEPT = 50
+BULK_ENROLLMENT_QUERY_CHUNK = 500
+
+def remember_job(kind, job):
+    """Register a job for its status endpoint, forgetting the oldest finished jobs beyond JOBS_KEPT"""
+    global job_status_thread
+    jobs = job_registries[kind]
+    with jobs_lock:
+        finished = sorted((j for j in jobs.values() if j.finished_at is not None), key=lambda j: j.finished_at)
+        for old in finished[:max(0, len(jobs) - JOBS_KEPT)]:
+            del jobs[old.id]
+            remove_job_status(kind, old.id)
+        jobs[job.id] = job
+        if job_status_thread is None:
+            job_status_thread = threading.Thread(target=write_job_statuses, name='job-status', daemon=True)
+            job_status_thread.start()
+
+def job_status_path(kind, job_id):
+    return os.path.join(app.config['JOB_STATUS_FOLDER'], f'{kind}-{job_id}.json')
+
+def save_job_status(kind, job):
+    """Write a job's status for the other worker processes; the rename makes the update atomic"""
+    folder = app.config['JOB_STATUS_FOLDER']
+    os.makedirs(folder, exist_ok=True)
+    temp_path = os.path.join(folder, f'.{kind}-{job.id}.{os.getpid()}.tmp')
+    with open(temp_path, 'w') as f:
+        json.dump(job.status(), f)
+    os.replace(temp_path, job_status_path(kind, job.id))
+
+def remove_job_status(kind, job_id):
+    try:
+        os.remove(job_status_path(kind, job_id))
+    except OSError:
+        pass
+
+def write_job_statuses():
+    """Background thread: copy the status of this process's jobs to disk until each has finished"""
+    saved_final = set()
+    while True:
+        with jobs_lock:
+            jobs = [(kind, job) for kind, registry in job_registries.items() for job in registry.values()]
+        saved_final &= {job.id for _, job in jobs}
+        for kind, job in jobs:
+            if job.id in saved_final:
+                continue
+            finished = job.finished_at is not None
+            try:
+                save_job_status(kind, job)
+            except (OSError, TypeError, ValueError) as e:
+                print(f"Error saving status of job {job.id}: {e}")
+                continue
+            if finished:
+                saved_final.add(job.id)
+        time.sleep(app.config.get('JOB_STATUS_INTERVAL_SECONDS', 1))
+
+def job_status(kind, job_id):
+    """Status of a job started by any worker process; None when unknown"""
+    job = job_registries[kind].get(job_id)
+    if job is not None:
+        return job.status()
+    if len(job_id) != 32 or not all(c in '0123456789abcdef' for c in job_id):
+        return None
+    try:
+        with open(job_status_path(kind, job_id)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def store_video_appearances(video_filename, recorded_at):
+    """Job callback: write one 'video' attendance row per merged appearance"""
+    def store(appearances):
+        rows = []
+        for appearance in appearances:
+            timestamp = recorded_at + timedelta(seconds=appearance['first_seen'])
+            rows.append({
+                'timestamp': timestamp,
+                'day': timestamp.date(),
+                'employee_pk': appearance['employee_pk'],
+                'employee_name': appearance['employee_name'],
+                'attendance_type': 'video',
+                'camera_feed_id': None,
+                'camera_feed_name': video_filename[:100],
+                'confidence_score': 1 - appearance['best_distance']
+            })
+        chunk = app.config.get('ATTENDANCE_FLUSH_ROWS', 100)
+        for start in range(0, len(rows), chunk):
+            write_attendance_rows(rows[start:start + chunk])
+        return len(rows)
+    return store
+
+def start_video_analysis(path, video_filename, params):
+    """
+    Start an offline analysis job for a saved video.
+    :param params: form with optional sample_fps and recorded_at (ISO, UTC start of the recording;
+                   defaults to the file's mtime minus the video's duration)
+    """
+    sample_fps = float(params.get('sample_fps') or app.config.get('VIDEO_ANALYSIS_SAMPLE_FPS', 2))
+    if sample_fps <= 0:
+        raise ValueError('sample_fps must be positive')
+    fps, frame_count = probe_video(path)
+    duration = timedelta(seconds=frame_count / fps)
+    # The file was last written when the recording ended
+    recorded_at = parse_log_time(params.get('recorded_at')) or datetime.utcfromtimestamp(os.path.getmtime(path)) - duration
+    if recorded_at + duration > datetime.utcnow() + timedelta(minutes=1):
+        raise ValueError('recorded_at puts the end of the video in the future')
+    ensure_gallery_loaded()
+    maybe_sync_gallery()
+    job = VideoAnalysisJob(
+        path,
+        gallery.snapshot(),
+        store_video_appearances(video_filename, recorded_at),
+        processes=app.config.get('VIDEO_ANALYSIS_PROCESSES') or None,
+        sample_fps=sample_fps,
+        segment_seconds=app.config.get('VIDEO_ANALYSIS_SEGMENT_SECONDS', 30),
+        detection=detection_settings(),
+        tolerance=app.config.get('FACE_RECOGNITION_TOLERANCE', 0.5),
+        merge_gap_seconds=app.config.get('DETECTION_COOLDOWN_SECONDS', 30)
+    )
+    remember_job('analyze_video', job)
+    return job.start()
+
+@app.route('/analyze_video', methods=['POST'])
+def analyze_video():
+    """Analyze an uploaded video offline; poll /analyze_video/<job_id> for progress and results"""
+    video_filename = secure_filename(request.form.get('video_filename') or '')
+    path = os.path.join(app.config['UPLOAD_FOLDER'], video_filename)
+    if not video_filename or not os.path.isfile(path):
+        return jsonify({'status': 'error', 'message': 'Video not found'}), 404
+    try:
+        job = start_video_analysis(path, video_filename, request.form)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid analysis parameter: {e}'}), 400
+    return jsonify({
+        'status': 'success',
+        'job_id': job.id,
+        'status_url': url_for('video_analysis_status', job_id=job.id)
+    }), 202
+
+@app.route('/analyze_video/<job_id>', methods=['GET'])
+def video_analysis_status(job_id):
+    """Progress, frames-per-second report and merged appearances of a video analysis job"""
+    status = job_status('analyze_video', job_id)
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'Unknown video analysis job'}), 404
+    return jsonify(status)
+
+def enrolled_values(column, values):
+    """Which of the given employee_id / image hash values are already in the database"""
+    values = list(values)
+    found = set()
+    with app.app_context():
+        for start in range(0, len(values), BULK_ENROLLMENT_QUERY_CHUNK):
+            chunk = values[start:start + BULK_ENROLLMENT_QUERY_CHUNK]
+            found.update(v for (v,) in db.session.query(column).filter(column.in_(chunk)))
+    return found
+
+def save_enrollment_image(row):
+    ext = row['image'].rsplit('.', 1)[-1].lower()
+    filename = secure_filename(f"{row['employee_id']}_{row['sha256'][:12]}.{ext}")
+    with open(os.path.join(app.config['UPLOAD_FOLDER'], filename), 'wb') as f:
+        f.write(row['data'])
+    return filename
+
+def remove_enrollment_image(filename):
+    path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+    if os.path.exists(path):
+        os.remove(path)
+
+def add_enrolled_employees(rows):
+    """Insert employees and their gallery changes in the current session; returns (employee, change) pairs"""
+    added = []
+    for row in rows:
+        employee = Employee(
+            name=row['name'],
+            employee_id=row['employee_id'],
+            description=row.get('description') or None,
+            image_filename=row['filename'],
+            face_encoding=row['encoding'],
+            image_sha256=row['sha256']
+        )
+        db.session.add(employee)
+        added.append(employee)
+    db.session.flush()
+    return [(employee, record_gallery_change(employee.id, 'upsert')) for employee in added]
+
+def commit_enrollment_chunk(rows):
+    """
+    Store one chunk of encoded rows in a single transaction. If it fails, rows are
+    retried one by one so only the offending rows are reported.
+    :return: {row number: error} for rows that were not stored
+    """
+    failures = {}
+    with app.app_context():
+        for row in rows:
+            row['filename'] = save_enrollment_image(row)
+        try:
+            added = add_enrolled_employees(rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            print(f"Bulk enrollment chunk failed, retrying row by row: {e}")
+            added = []
+            for row in rows:
+                try:
+                    added.extend(add_enrolled_employees([row]))
+                    db.session.commit()
+                except Exception as row_error:
+                    db.session.rollback()
+                    failures[row['_row']] = str(getattr(row_error, 'orig', row_error))
+                    remove_enrollment_image(row['filename'])
+        for employee, change in added:
+            gallery.upsert(employee.id, employee.name, employee.face_encoding, version=change.id)
+        for row in rows:
+            if row['_row'] not in failures:
+                make_thumbnails(io.BytesIO(row['data']), row['sha256'])
+    return failures
+
+def bulk_enrollment_source():
+    """
+    The images for a bulk enrollment request: an uploaded zip ('archive'), or a
+    server-side zip or directory ('path', under BULK_ENROLL_ROOT) with an optional
+    uploaded 'manifest' CSV. Raises ValueError with a message for the client.
+    """
+    archive = request.files.get('archive')
+    if archive is not None and archive.filename:
+        folder = app.config['BULK_ENROLL_UPLOAD_FOLDER']
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, f'{os.urandom(8).hex()}.zip')
+        archive.save(path)
+        try:
+            return ZipSource(path, delete=True)
+        except zipfile.BadZipFile:
+            os.remove(path)
+            raise ValueError('Archive is not a zip file')
+
+    path = (request.form.get('path') or '').strip()
+    if not path:
+        raise ValueError('Provide an archive upload or a server path')
+    root = app.config.get('BULK_ENROLL_ROOT')
+    if not root:
+        raise ValueError('Server-side paths are disabled (BULK_ENROLL_ROOT is not set)')
+    root = os.path.realpath(root)
+    path = os.path.realpath(os.path.join(root, path))
+    if os.path.commonpath([path, root]) != root:
+        raise ValueError('Path is outside BULK_ENROLL_ROOT')
+    if os.path.isdir(path):
+        manifest = request.files.get('manifest')
+        return DirectorySource(path, manifest.read().decode('utf-8-sig') if manifest and manifest.filename else None)
+    if os.path.isfile(path):
+        try:
+            return ZipSource(path)
+        except zipfile.BadZipFile:
+            raise ValueError('Path is not a zip file or directory')
+    raise ValueError('Path not found')
+
+@app.route('/bulk_enroll', methods=['POST'])
+def bulk_enroll():
+    """Start a bulk enrollment job; poll /bulk_enroll/<job_id> for progress and per-row errors"""
+    try:
+        source = bulk_enrollment_source()
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 400
+
+    job = BulkEnrollmentJob(
+        source,
+        existing_ids=lambda ids: enrolled_values(Employee.employee_id, ids),
+        existing_hashes=lambda hashes: enrolled_values(Employee.image_sha256, hashes),
+        commit_chunk=commit_enrollment_chunk,
+        processes=app.config.get('BULK_ENROLL_PROCESSES') or None,
+        chunk_rows=app.config.get('BULK_ENROLL_CHUNK_ROWS', 200),
+        max_image_side=app.config.get('BULK_ENROLL_MAX_IMAGE_SIDE', 1024)
+    )
+    remember_job('bulk_enroll', job)
+    job.start()
+    return jsonify({
+        'status': 'success',
+        'job_id': job.id,
+        'status_url': url_for('bulk_enroll_status', job_id=job.id)
+    }), 202
+
+@app.route('/bulk_enroll/<job_id>', methods=['GET'])
+def bulk_enroll_status(job_id):
+    status = job_status('bulk_enroll', job_id)
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'Unknown bulk enrollment job'}), 404
+    return jsonify(status)
+
+@app.route('/thumbnails/<filename>', methods=['GET'])
+def employee_thumbnail(filename):
+    """
+    An employee photo thumbnail. Names are content-hashed, so responses are cached as
+    immutable; a missing thumbnail is regenerated from the original photo.
+    """
+    parsed = parse_thumbnail_name(filename)
+    if parsed is None or parsed[1] not in app.config['THUMBNAIL_SIZES'] or parsed[2] != THUMBNAIL_EXT:
+        return jsonify({'status': 'error', 'message': 'Unknown thumbnail'}), 404
+    folder = app.config['THUMBNAIL_FOLDER']
+    if not os.path.exists(os.path.join(folder, filename)):
+        employee = Employee.query.filter(Employee.image_sha256.startswith(parsed[0])).first()
+        image_path = os.path.join(app.config['UPLOAD_FOLDER'], employee.image_filename) if employee else None
+        if image_path is None or not os.path.exists(image_path):
+            return jsonify({'status': 'error', 'message': 'Unknown thumbnail'}), 404
+        make_thumbnails(image_path, employee.image_sha256)
+    response = send_from_directory(folder, filename, etag=filename,
+                                   max_age=app.config.get('THUMBNAIL_MAX_AGE_SECONDS', 31536000))
+    response.cache_control.immutable = True
+    return response
+
+def build_face_matcher():
+    """Create the matcher backend selected by FACE_MATCHER"""
+    kind = app.config.get('FACE_MATCHER', 'exact')
+    if kind == 'ivf':
+        return create_matcher(
+            'ivf',
+            nlist=app.config.get('FACE_MATCHER_IVF_NLIST', 0),
+            nprobe=app.config.get('FACE_MATCHER_IVF_NPROBE', 8),
+            index_path=app.config.get('FACE_MATCHER_INDEX_PATH')
+        )
+    return create_matcher(kind)
+
+# Attached (and the IVF index built or loaded) on the first gallery load
+gallery.matcher = build_face_matcher()
+
+def latest_gallery_version():
+    return db.session.query(db.func.max(GalleryChange.id)).scalar() or 0
+
+def ensure_gallery_loaded():
+    """
+    Load all employee encodings into the shared gallery once per process, from the
+    memory-mapped snapshot when there is one, otherwise from the database
+    """
+    if gallery.loaded:
+        return
+    # Read the version first so changes committed during the load are re-applied by sync
+    version = latest_gallery_version()
+    path = app.config.get('GALLERY_SNAPSHOT_PATH')
+    snapshot = open_gallery_snapshot(path) if path else None
+    if snapshot is not None and snapshot[0] <= version:
+        snapshot_version, ids, names, encodings = snapshot
+        gallery.adopt(ids, names, encodings, version=snapshot_version)
+        # Changes made after the snapshot was written come from the change log
+        sync_gallery()
+        if version - snapshot_version >= app.config.get('GALLERY_SNAPSHOT_REFRESH_CHANGES', 100):
+            save_gallery_snapshot()
+        return
+    rows = db.session.query(Employee.id, Employee.name, Employee.face_encoding).all()
+    gallery.load(rows, version=version)
+    if path:
+        save_gallery_snapshot()
+
+def save_gallery_snapshot():
+    """Write the loaded gallery to GALLERY_SNAPSHOT_PATH for other processes to memory-map"""
+    snapshot = gallery.snapshot()
+    try:
+        write_gallery_snapshot(app.config['GALLERY_SNAPSHOT_PATH'], snapshot.ids, snapshot.names,
+                               snapshot.encodings, gallery.version)
+    except OSError as e:
+        print(f"Error writing gallery snapshot: {e}")
+
+def sync_gallery():
+    """Apply gallery changes committed by other processes since our last sync"""
+    changes = GalleryChange.query.filter(GalleryChange.id > gallery.version).order_by(GalleryChange.id).all()
+    if not changes:
+        return
+    changed_pks = {c.employee_pk for c in changes if c.op == 'upsert'}
+    employees = {e.id: e for e in Employee.query.filter(Employee.id.in_(changed_pks))} if changed_pks else {}
+    for change in changes:
+        employee = employees.get(change.employee_pk)
+        if change.op == 'delete' or employee is None:
+            gallery.remove(change.employee_pk, version=change.id)
+        else:
+            gallery.upsert(employee.id, employee.name, employee.face_encoding, version=change.id)
+
+def maybe_sync_gallery():
+    """Pull gallery changes from other processes at most every GALLERY_SYNC_INTERVAL_SECONDS"""
+    global last_gallery_sync
+    if time.monotonic() - last_gallery_sync >= app.config.get('GALLERY_SYNC_INTERVAL_SECONDS', 2):
+        last_gallery_sync = time.monotonic()
+        sync_gallery()
+
+last_gallery_sync = time.monotonic()
+
+def detection_settings(camera_feed=None):
+    """Keyword arguments for detect_faces() for a camera, falling back to the global defaults"""
+    return {
+        'scale': camera_setting(camera_feed, 'detection_scale'),
+        'model': camera_setting(camera_feed, 'detection_model'),
+        'upsample': camera_setting(camera_feed, 'detection_upsample'),
+    }
+
+# Push channel for dashboards; worker processes relay their events into the web process's bus
+events = EventBus(capacity=app.config.get('EVENT_BUFFER_SIZE', 1000))
+last_suppressed_event = {}
+suppressed_events_lock = threading.Lock()
+
+def attendance_logged_on(day):
+    """Latest log time per (employee pk, camera) on a UTC day, to warm the attendance dedup cache"""
+    return db.session.query(
+        AttendanceLog.employee_pk,
+        AttendanceLog.camera_feed_id,
+        db.func.max(AttendanceLog.timestamp)
+    ).filter(AttendanceLog.day == day, AttendanceLog.employee_pk.is_not(None)).group_by(
+        AttendanceLog.employee_pk, AttendanceLog.camera_feed_id
+    ).all()
+
+def last_attendance_logged(employee_pk, camera_feed_id, day):
+    """Latest log time of an employee (on one camera, when given) on a UTC day; served by the (day, employee_pk) index"""
+    query = db.session.query(db.func.max(AttendanceLog.timestamp)).filter(
+        AttendanceLog.day == day, AttendanceLog.employee_pk == employee_pk)
+    if camera_feed_id is not None:
+        query = query.filter(AttendanceLog.camera_feed_id == camera_feed_id)
+    try:
+        return query.scalar()
+    except Exception as e:
+        # Rather log a duplicate than drop a sighting while the database is unavailable
+        print(f"Error checking attendance of employee {employee_pk}: {e}")
+        db.session.rollback()
+        return None
+
+# "Last logged at" per employee for today, shared by every stream in this process;
+# misses are checked against the database, so logs from other processes count too
+attendance_dedup = AttendanceDedup(
+    relog_seconds=app.config.get('ATTENDANCE_RELOG_SECONDS', 0),
+    per_camera=app.config.get('ATTENDANCE_DEDUP_PER_CAMERA', False),
+    lookup=last_attendance_logged,
+    loader=attendance_logged_on
+)
+
+def ensure_attendance_dedup_loaded():
+    """Warm the attendance dedup cache from today's logs once per process"""
+    if attendance_dedup.loaded:
+        return
+    now = datetime.utcnow()
+    attendance_dedup.warm(attendance_logged_on(now.date()), now)
+
+# Exported on /metrics; recognition worker processes report theirs to the parent
+metrics = MetricsRegistry()
+frames_read_total = metrics.counter('face_frames_read_total', 'Frames read from the video source', ('camera',))
+frames_recognized_total = metrics.counter('face_frames_recognized_total', 'Frames run through face detection', ('camera',))
+faces_detected_total = metrics.counter('face_faces_detected_total', 'Faces found by detection', ('camera',))
+face_matches_total = metrics.counter('face_matches_total', 'Faces matched to an employee', ('camera',))
+face_unknowns_total = metrics.counter('face_unknowns_total', 'Faces not matching any employee', ('camera',))
+attendance_rows_total = metrics.counter('face_attendance_rows_written_total', 'Attendance rows committed', ('camera',))
+stage_seconds = metrics.histogram('face_stage_seconds', 'Time spent per frame in one pipeline stage', ('camera', 'stage'))
+attendance_commit_seconds = metrics.histogram('face_attendance_commit_seconds', 'Insert and commit time of one attendance batch')
+stream_viewers = metrics.gauge('face_stream_viewers', 'MJPEG viewers currently connected', ('camera',))
+stream_connections_total = metrics.counter('face_stream_connections_total', 'MJPEG viewer connections opened', ('camera',))
+camera_reconnects_total = metrics.counter('face_camera_reconnects_total', 'Camera sources reopened after their first open', ('camera',))
+slow_frames_total = metrics.counter('face_slow_frames_total', 'Frames over SLOW_FRAME_BUDGET_MS from capture to a viewer', ('camera',))
+opened_cameras = set()
+
+def metrics_camera_label(camera_feed_id):
+    return str(camera_feed_id) if camera_feed_id else 'default'
+
+class CameraMetrics:
+    """The metric children of one camera, resolved once so the frame loop does no label lookups"""
+
+    def __init__(self, camera_feed_id):
+        label = metrics_camera_label(camera_feed_id)
+        self.frames_read = frames_read_total.labels(label)
+        self.frames_recognized = frames_recognized_total.labels(label)
+        self.faces = faces_detected_total.labels(label)
+        self.matches = face_matches_total.labels(label)
+        self.unknowns = face_unknowns_total.labels(label)
+        self.stages = {stage: stage_seconds.labels(label, stage)
+                       for stage in ('capture', 'recognize', 'annotate', 'detect', 'encode', 'match', 'jpeg_encode')}
+        self.detect = self.stages['detect']
+        self.encode = self.stages['encode']
+        self.match = self.stages['match']
+        self.jpeg_encode = self.stages['jpeg_encode'].observe
+
+    def observe_pipeline(self, stage, seconds):
+        """CameraPipeline observe hook; its 'encode' stage is annotation, JPEG encoding happens per viewer"""
+        if stage == 'capture':
+            self.frames_read.inc()
+        self.stages['annotate' if stage == 'encode' else stage].observe(seconds)
+
+def write_attendance_rows(rows):
+    """Insert one batch of attendance rows in a single transaction"""
+    with app.app_context():
+        started = time.perf_counter()
+        try:
+            # RETURNING gives the events their row ids, which the presence table dedups on
+            ids = db.session.execute(AttendanceLog.__table__.insert().returning(AttendanceLog.id, sort_by_parameter_order=True),
+                                     rows).scalars().all()
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        attendance_commit_seconds.labels().observe(time.perf_counter() - started)
+    for row, log_id in zip(rows, ids):
+        attendance_rows_total.labels(metrics_camera_label(row['camera_feed_id'])).inc()
+        events.publish('attendance', dict(attendance_event_data(row), id=log_id))
+
+def attendance_event_data(row):
+    """JSON-safe event payload for one attendance row or sighting"""
+    return {
+        'timestamp': row['timestamp'].strftime('%Y-%m-%d %H:%M:%S'),
+        'employee_name': row['employee_name'],
+        'employee_pk': row['employee_pk'],
+        'attendance_type': row['attendance_type'],
+        'camera_feed_id': row['camera_feed_id'],
+        'camera_feed_name': row['camera_feed_name'],
+        'confidence_score': row['confidence_score']
+    }
+
+def publish_suppressed_sighting(row):
+    """Publish a cooldown-suppressed sighting, at most once per SUPPRESSED_EVENT_INTERVAL_SECONDS per employee and camera"""
+    key = (row['employee_pk'], row['camera_feed_id'])
+    now = time.monotonic()
+    with suppressed_events_lock:
+        if now - last_suppressed_event.get(key, float('-inf')) < app.config.get('SUPPRESSED_EVENT_INTERVAL_SECONDS', 10):
+            return
+        last_suppressed_event[key] = now
+    events.publish('sighting_suppressed', attendance_event_data(row))
+
+def release_attendance_rows(rows):
+    """Let sightings whose rows were never written be logged again"""
+    for row in rows:
+        attendance_dedup.release(row['employee_pk'], row['camera_feed_id'], row['timestamp'])
+
+# Background attendance writer of this process; recreated in a forked child
+attendance_writer = None
+attendance_writer_pid = None
+attendance_writer_lock = threading.Lock()
+
+def get_attendance_writer():
+    """Return this process's write-behind attendance writer, starting it on first use"""
+    global attendance_writer, attendance_writer_pid
+    with attendance_writer_lock:
+        if attendance_writer is None or attendance_writer_pid != os.getpid():
+            attendance_writer = AttendanceWriter(
+                write_attendance_rows,
+                max_batch=app.config.get('ATTENDANCE_FLUSH_ROWS', 100),
+                flush_interval_ms=app.config.get('ATTENDANCE_FLUSH_INTERVAL_MS', 500),
+                max_queue=app.config.get('ATTENDANCE_QUEUE_SIZE', 10000),
+                on_failure=release_attendance_rows
+            ).start()
+            attendance_writer_pid = os.getpid()
+            atexit.register(attendance_writer.stop)
+        return attendance_writer
+
+def flush_attendance_writer():
+    """Best-effort flush of queued attendance rows before this process exits"""
+    global attendance_writer
+    if attendance_writer is not None and attendance_writer_pid == os.getpid():
+        attendance_writer.stop()
+        attendance_writer = None
+
+# Shared by every camera pipeline in this process; recreated in a forked child
+batch_encoder = None
+batch_encoder_pid = None
+batch_encoder_lock = threading.Lock()
+
+def get_batch_encoder():
+    """Return this process's batch encoder, or None when batching is disabled"""
+    global batch_encoder, batch_encoder_pid
+    if app.config.get('ENCODING_BATCH_MAX_SIZE', 0) <= 1:
+        return None
+    with batch_encoder_lock:
+        if batch_encoder is None or batch_encoder_pid != os.getpid():
+            batch_encoder = BatchEncoder(
+                max_batch=app.config['ENCODING_BATCH_MAX_SIZE'],
+                max_wait_ms=app.config.get('ENCODING_BATCH_MAX_WAIT_MS', 5)
+            ).start()
+            batch_encoder_pid = os.getpid()
+        return batch_encoder
+
+def recognize_frame(frame, camera_feed_id=None, camera_feed_name=None, detection=None, region=None,
+                    camera_metrics=None):
+    """
+    Detect and match faces in a BGR frame, logging attendance for known employees
+    :param camera_metrics: optional CameraMetrics recording counts and per-step latency
+    """
+    maybe_sync_gallery()
+    ensure_attendance_dedup_loaded()
+    tolerance = app.config.get('FACE_RECOGNITION_TOLERANCE', 0.5)
+    started = time.perf_counter()
+    rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    # Boxes come back in full-resolution coordinates so encodings use full-res pixels
+    face_locations = detect_faces(rgb_frame, region=region, **(detection or detection_settings()))
+    detected = time.perf_counter()
+    encoder = get_batch_encoder()
+    if encoder is not None:
+        face_encodings = encoder.encode(rgb_frame, face_locations)
+    else:
+        face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+    encoded = time.perf_counter()
+
+    matches = gallery.match(face_encodings, tolerance=tolerance)
+    if camera_metrics is not None:
+        camera_metrics.detect.observe(detected - started)
+        camera_metrics.encode.observe(encoded - detected)
+        camera_metrics.match.observe(time.perf_counter() - encoded)
+        camera_metrics.frames_recognized.inc()
+        if matches:
+            known = sum(1 for employee_pk, _, _ in matches if employee_pk is not None)
+            camera_metrics.faces.inc(len(matches))
+            camera_metrics.matches.inc(known)
+            camera_metrics.unknowns.inc(len(matches) - known)
+
+    detections = []
+    for location, (employee_pk, name, distance) in zip(face_locations, matches):
+        confidence = 0.0
+        if employee_pk is not None:
+            confidence = 1 - distance
+            now = datetime.utcnow()
+            row = {
+                'timestamp': now,
+                'day': now.date(),
+                'employee_pk': employee_pk,
+                'employee_name': name,
+                'attendance_type': 'live' if camera_feed_id else 'cctv',
+                'camera_feed_id': camera_feed_id,
+                'camera_feed_name': camera_feed_name,
+                'confidence_score': confidence
+            }
+            # Dict lookup per sighting; only new or cooled-down employees reach the database
+            if attendance_dedup.claim(employee_pk, camera_feed_id, now):
+                # Queued for the background writer; never block the frame loop on a commit
+                get_attendance_writer().submit(row)
+            else:
+                publish_suppressed_sighting(row)
+        detections.append((location, name, confidence))
+    return detections
+
+def annotate_frame(frame, detections):
+    """Draw detection boxes and labels onto the frame in place"""
+    for (top, right, bottom, left), name, confidence in detections:
+        color = (0, 0, 255) if name != "Unknown" else (0, 255, 0)
+        cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+        label = f"{name} ({confidence:.2f})" if name != "Unknown" else name
+        cv2.putText(frame, label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+    return frame
+
+# One shared recognition pipeline per camera, fanned out to every viewer
+camera_sessions = CameraSessionRegistry()
+# Background recognition supervisor, started from __main__ when enabled
+recognition_service = None
 
-def gen_frames(video_filename=None, camera_feed_id=None):
+def open_capture(video_filename=None, camera_feed=None):
+    """Open the video source for a stream, raising SourceUnavailable with a viewer-facing message"""
+    if camera_feed is not None:
+        if camera_feed.camera_type == 'device':
+            try:
+                cam_index = int(camera_feed.camera_url)
+                # Check if the device index is available
+                test_cam = cv2.VideoCapture(cam_index)
+                if not test_cam.isOpened():
+                    test_cam.release()
+                    raise SourceUnavailable(f"Camera device index {cam_index} not available")
+                test_cam.release()
+                camera = cv2.VideoCapture(cam_index)
+            except ValueError:
+                camera = find_available_camera()
+        else:
+            camera = cv2.VideoCapture(camera_feed.camera_url)
+    elif video_filename:
+        video_path = os.path.join(app.config['UPLOAD_FOLDER'], video_filename)
+        camera = cv2.VideoCapture(video_path)
+    else:
+        camera = find_available_camera()
+
+    if camera is None or not camera.isOpened():
+        if camera is not None:
+            camera.release()
+        raise SourceUnavailable("Camera not available")
+    return camera
+
+def start_pipeline(video_filename=None, camera_feed_id=None, camera_feed=None):
+    """Open the source and start its capture / recognition / encode pipeline"""
+    camera = open_capture(video_filename, camera_feed)
+    if camera_feed_id:
+        if camera_feed_id in opened_cameras:
+            camera_reconnects_total.labels(metrics_camera_label(camera_feed_id)).inc()
+        opened_cameras.add(camera_feed_id)
+    camera_feed_name = camera_feed.name if camera_feed is not None else None
+    detection = detection_settings(camera_feed)
+    camera_metrics = CameraMetrics(camera_feed_id)
+    tracker = FaceTracker(
+        every_n_frames=camera_setting(camera_feed, 'recognize_every_n_frames'),
+        interval_ms=camera_setting(camera_feed, 'recognize_interval_ms')
+    )
+    gate = None
+    if camera_setting(camera_feed, 'motion_gate_enabled'):
+        gate = MotionGate(
+            threshold=app.config.get('MOTION_GATE_THRESHOLD', 0.002),
+            max_skip_seconds=app.config.get('MOTION_GATE_MAX_SKIP_SECONDS', 5)
+        )
+    restrict_region = camera_setting(camera_feed, 'motion_gate_restrict_region')
+
+    def recognize(frame):
+        region = None
+        if gate is not None:
+            moved, region = gate.check(frame)
+            if not moved:
+                # Static scene: the last boxes and labels are still valid
+                return tracker.last_detections()
+        if not restrict_region:
+            region = None
+        return tracker.update(frame, lambda f: recognize_frame(f, camera_feed_id, camera_feed_name, detection, region,
+                                                               camera_metrics))
+
+    def stats():
+        result = tracker.stats()
+        if gate is not None:
+            result.update(gate.stats())
+        return result
+
+    return CameraPipeline(
+        camera,
+        recognize=recognize,
+        # JPEG encoding is left to the viewers, once per requested variant (see mjpeg.EncodedFrame)
+        encode=lambda frame, detections, timings: EncodedFrame(annotate_frame(frame, detections),
+                                                               camera_metrics.jpeg_encode, timings),
+        live=not video_filename,
+        queue_size=app.config.get('PIPELINE_QUEUE_SIZE', 2),
+        context=app.app_context,
+        name=f'camera-{camera_feed_id}' if camera_feed_id else 'stream',
+        extra_stats=stats,
+        observe=camera_metrics.observe_pipeline,
+        timed_encode=True
+    ).start()
+
+# Most recent frames that went over SLOW_FRAME_BUDGET_MS, newest last
+slow_frames = deque(maxlen=app.config.get('SLOW_FRAME_LOG_SIZE', 200))
+
+def frame_parts(frames, variant, camera_feed_id):
+    """MJPEG parts of a session's frames, logging frames that took longer than the budget to reach the viewer"""
+    budget = app.config.get('SLOW_FRAME_BUDGET_MS', 500) / 1000.0
+    slow = slow_frames_total.labels(metrics_camera_label(camera_feed_id))
+    for frame in frames:
+        part = frame.part(variant)
+        timings = frame.timings
+        if budget and timings is not None and not timings.reported:
+            total = time.perf_counter() - timings.captured_at
+            if total > budget:
+                # Shared frames are logged once, by the first viewer to notice
+                timings.reported = True
+                slow.inc()
+                slow_frames.append({
+                    'camera_feed_id': camera_feed_id,
+                    'timestamp': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3],
+                    'total_ms': round(total * 1000.0, 2),
+                    'stages_ms': timings.as_ms(total)
+                })
+        yield part
+
+def paced(parts, fps):
+    """Yield at most fps parts per second; the source always hands over its newest frame, so nothing queues up"""
+    interval = 1.0 / fps if fps else 0
+    next_at = 0.0
+    for part in parts:
+        if interval:
+            delay = next_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            next_at = time.monotonic() + interval
+        yield part
+
+# Last camera_status published per camera for sessions opened by viewers, so only changes are sent
+viewer_camera_states = {}
+viewer_camera_states_lock = threading.Lock()
+
+def publish_viewer_camera_status(camera_feed_id, state, message=None):
+    """Publish a camera_status event for a camera a viewer opened, when its state changed"""
+    if not camera_feed_id or (recognition_service is not None and recognition_service.owns(camera_feed_id)):
+        return  # The recognition service reports the cameras it runs
+    with viewer_camera_states_lock:
+        if viewer_camera_states.get(camera_feed_id) == state:
+            return
+        viewer_camera_states[camera_feed_id] = state
+    events.publish('camera_status', {'camera_feed_id': camera_feed_id, 'state': state, 'message': message})
+
+def gen_frames(video_filename=None, camera_feed_id=None, variant=None, fps=None):
+    if variant is None:
+        variant = stream_variant(default_quality=app.config.get('MJPEG_QUALITY', 80))
     ctx = app.app_context()
     ctx.push()
-    camera = None
+    session = None
+    remote_viewer = None
+    viewers = stream_viewers.labels(metrics_camera_label(camera_feed_id))
+    viewers.inc()
+    stream_connections_total.labels(metrics_camera_label(camera_feed_id)).inc()
     try:
-        # Load all employee encodings
-        employees = Employee.query.all()
-        known_encodings = [e.face_encoding for e in employees]
-        known_names = [e.name for e in employees]
+        ensure_gallery_loaded()
+        camera_feed = None
 
         if camera_feed_id:
             camera_feed = CameraFeed.query.get(camera_feed_id)
             if not camera_feed or not camera_feed.is_active:
                 return
-            if camera_feed.camera_type == 'device':
-                try:
-                    cam_index = int(camera_feed.camera_url)
-                    # Check if the device index is available
-                    test_cam = cv2.VideoCapture(cam_index)
-                    if not test_cam.isOpened():
-                        error_frame = generate_error_frame(f"Camera device index {cam_index} not available")
-                        ret, buffer = cv2.imencode('.jpg', error_frame)
-                        frame_bytes = buffer.tobytes()
-                        yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-                        test_cam.release()
-                        return
-                    test_cam.release()
-                    camera = cv2.VideoCapture(cam_index)
-                except ValueError:
-                    camera = find_available_camera()
-            else:
-                camera = cv2.VideoCapture(camera_feed.camera_url)
-        elif video_filename:
-            video_path = os.path.join(app.config['UPLOAD_FOLDER'], video_filename)
-            camera = cv2.VideoCapture(video_path)
-        else:
-            camera = find_available_camera()
 
-        if camera is None or not camera.isOpened():
-            error_frame = generate_error_frame("Camera not available")
-            ret, buffer = cv2.imencode('.jpg', error_frame)
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
-            return
+            if recognition_service is not None and recognition_service.uses_processes and recognition_service.owns(camera_feed_id):
+                # Recognition runs in a worker process; just relay its frames
+                remote_viewer = recognition_service.watch(camera_feed_id, variant)
+                yield from paced(remote_viewer.frames(variant), fps)
+                if remote_viewer.broadcaster.error:
+                    # The camera or its worker went down; end the response so the viewer can reconnect
+                    yield EncodedFrame(generate_error_frame(str(remote_viewer.broadcaster.error))).part(variant)
+                return
 
-        detected_today = set()
-        while True:
-            success, frame = camera.read()
-            if not success or frame is None:
-                break
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_frame)
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
-
-            for (top, right, bottom, left), face_encoding in zip(face_locations, face_encodings):
-                matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=0.5)
-                name = "Unknown"
-                confidence = 0.0
-
-                for idx, match in enumerate(matches):
-                    if match:
-                        name = known_names[idx]
-                        face_distances = face_recognition.face_distance(known_encodings, face_encoding)
-                        confidence = 1 - face_distances[idx]
-                        # Only log attendance once per employee per day
-                        today = datetime.utcnow().date()
-                        recent_attendance = AttendanceLog.query.filter(
-                            AttendanceLog.employee_name == name,
-                            db.func.date(AttendanceLog.timestamp) == today
-                        ).first()
-                        if not recent_attendance:
-                            log = AttendanceLog(
-                                employee_name=name,
-                                attendance_type='live' if camera_feed_id else 'cctv',
-                                camera_feed_id=camera_feed_id,
-                                camera_feed_name=camera_feed.name if camera_feed_id else None,
-                                confidence_score=confidence
-                            )
-                            db.session.add(log)
-                            db.session.commit()
-                            detected_today.add(name)
-                        break
-                color = (0, 0, 255) if name != "Unknown" else (0, 255, 0)
-                cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                label = f"{name} ({confidence:.2f})" if name != "Unknown" else name
-                cv2.putText(frame, label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-            ret, buffer = cv2.imencode('.jpg', frame)
-            frame_bytes = buffer.tobytes()
-            yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        # Uploaded videos are replayed per viewer; cameras are shared
+        key = None if video_filename else (camera_feed_id or 'default')
+        session = camera_sessions.acquire(key, lambda: start_pipeline(video_filename, camera_feed_id, camera_feed))
+        publish_viewer_camera_status(camera_feed_id, 'up')
+        yield from paced(frame_parts(session.frames(), variant, camera_feed_id), fps)
+        # Reached only when the source ended, not when the viewer disconnected
+        publish_viewer_camera_status(camera_feed_id, 'down', 'stream ended')
+    except SourceUnavailable as e:
+        publish_viewer_camera_status(camera_feed_id, 'down', str(e))
+        yield EncodedFrame(generate_error_frame(str(e))).part(variant)
     except Exception as e:
         print(f"Error in gen_frames: {e}")
-        error_frame = generate_error_frame(f"Error: {str(e)}")
-        ret, buffer = cv2.imencode('.jpg', error_frame)
-        frame_bytes = buffer.tobytes()
-        yield (b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n')
+        publish_viewer_camera_status(camera_feed_id, 'down', str(e))
+        yield EncodedFrame(generate_error_frame(f"Error: {str(e)}")).part(variant)
     finally:
-        if camera is not None:
-            camera.release()
+        if session is not None:
+            camera_sessions.release(session)
+            if camera_feed_id and camera_sessions.get(camera_feed_id) is None:
+                publish_viewer_camera_status(camera_feed_id, 'stopped')
+        if remote_viewer is not None:
+            recognition_service.unwatch(camera_feed_id, remote_viewer, variant)
+        viewers.dec()
         ctx.pop()
 
+def start_camera_pipeline(camera_feed_id):
+    """Session factory used by the background recognition service"""
+    with app.app_context():
+        ensure_gallery_loaded()
+        camera_feed = CameraFeed.query.get(camera_feed_id)
+        if not camera_feed or not camera_feed.is_active:
+            raise SourceUnavailable(f"Camera feed {camera_feed_id} is not active")
+        return start_pipeline(None, camera_feed_id, camera_feed)
+
+def camera_feed_signature(camera_feed):
+    """Settings whose change requires reopening the camera's recognition session"""
+    return (camera_feed.camera_url, camera_feed.camera_type, camera_feed.name) + tuple(
+        getattr(camera_feed, column) for column in CAMERA_RECOGNITION_SETTINGS
+    )
+
+def list_active_camera_feeds():
+    with app.app_context():
+        return {cf.id: camera_feed_signature(cf) for cf in CameraFeed.query.filter_by(is_active=True)}
+
+def init_recognition_worker():
+    """
+    First thing a recognition worker process runs. Importing this module gave the worker its
+    own app and database engine; load the gallery (from the snapshot when there is one) before
+    the first camera opens, and return the event bus whose events are relayed to the web process
+    """
+    with app.app_context():
+        ensure_gallery_loaded()
+    return events
+
+def recognition_worker_metrics():
+    """Metrics snapshot a recognition worker process reports to the web process"""
+    return metrics.snapshot()
+
+def profile_camera(camera_feed_id, mode, seconds, interval):
+    """Profile one camera's pipeline, or the whole process when camera_feed_id is None"""
+    return capture_profile(mode, seconds, f'camera-{camera_feed_id}' if camera_feed_id else None, interval)
+
+def start_recognition_service():
+    """Start background recognition for every active camera feed"""
+    global recognition_service
+    recognition_service = RecognitionSupervisor(
+        start_camera_pipeline,
+        list_active_camera_feeds,
+        processes=app.config.get('RECOGNITION_WORKER_PROCESSES', 0),
+        registry=camera_sessions,
+        child_init=init_recognition_worker,
+        child_exit=flush_attendance_writer,
+        events=events,
+        restart_delay=app.config.get('RECOGNITION_RESTART_DELAY_SECONDS', 5),
+        reconcile_interval=app.config.get('RECOGNITION_RECONCILE_SECONDS', 10),
+        child_metrics=recognition_worker_metrics,
+        child_profile=profile_camera,
+        fold_metrics=metrics.fold
+    ).start()
+    return recognition_service
+
+def camera_feed_changed(camera_feed_id, restart):
+    """Apply a camera feed add/edit/delete to running sessions and the recognition service"""
+    if restart:
+        camera_sessions.terminate(camera_feed_id)
+    if recognition_service is not None:
+        recognition_service.reconcile()
+
 def find_available_camera():
     """Find an available camera by trying different device indices"""
     for i in range(4):  # Try cameras 0-3
@@ -345,11 +1411,25 @@ def generate_error_frame(message):
 
 @app.route('/live_detection')
 def live_detection():
+    """
+    MJPEG stream. Optional ?max_width= (pixels, never upscaled), ?quality= (JPEG 10-95)
+    and ?fps= (cap) shape the stream for this viewer; viewers asking for the same
+    width and quality share one encoding of each frame.
+    """
     video_filename = request.args.get('video')
     camera_feed_id = request.args.get('camera_feed_id')
     if camera_feed_id:
         camera_feed_id = int(camera_feed_id)
-    return app.response_class(gen_frames(video_filename, camera_feed_id), mimetype='multipart/x-mixed-replace; boundary=frame')
+    try:
+        max_width = request.args.get('max_width', type=int) or app.config.get('MJPEG_MAX_WIDTH') or None
+        quality = request.args.get('quality', type=int)
+        fps = request.args.get('fps', type=float) or app.config.get('MJPEG_MAX_FPS') or None
+        if fps is not None and fps <= 0:
+            raise ValueError('fps must be positive')
+        variant = stream_variant(max_width, quality, app.config.get('MJPEG_QUALITY', 80))
+    except (ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': f'Invalid stream parameter: {e}'}), 400
+    return app.response_class(gen_frames(video_filename, camera_feed_id, variant, fps), mimetype='multipart/x-mixed-replace; boundary=frame')
 
 @app.route('/add_employee_form', methods=['GET'])
 def add_employee_form():
@@ -367,25 +1447,141 @@ def live_detection_page():
 def upload_video_page():
     return render_template('upload_video.html')
 
+ATTENDANCE_PAGE_SIZE = 100
+ATTENDANCE_MAX_PAGE_SIZE = 1000
+ATTENDANCE_EXPORT_CHUNK = 1000
+
+def parse_log_time(value):
+    """Parse an ISO date or datetime query parameter; None when absent"""
+    if not value:
+        return None
+    return datetime.fromisoformat(value.strip().replace('Z', '').replace(' ', 'T'))
+
+def encode_log_cursor(log):
+    return base64.urlsafe_b64encode(f"{log.timestamp.isoformat()}|{log.id}".encode()).decode()
+
+def decode_log_cursor(cursor):
+    timestamp, log_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit('|', 1)
+    return datetime.fromisoformat(timestamp), int(log_id)
+
+def filtered_attendance_query(args):
+    """AttendanceLog query with the since/until/employee/camera_feed_id/attendance_type filters applied"""
+    query = AttendanceLog.query.options(db.joinedload(AttendanceLog.employee))
+    since = parse_log_time(args.get('since'))
+    until = parse_log_time(args.get('until'))
+    if since is not None:
+        query = query.filter(AttendanceLog.timestamp >= since)
+    if until is not None:
+        query = query.filter(AttendanceLog.timestamp < until)
+    employee = (args.get('employee') or '').strip()
+    if employee.isdigit():
+        query = query.filter(AttendanceLog.employee_pk == int(employee))
+    elif employee:
+        query = query.filter(AttendanceLog.employee_name == employee)
+    camera_feed_id = args.get('camera_feed_id', type=int)
+    if camera_feed_id is not None:
+        query = query.filter(AttendanceLog.camera_feed_id == camera_feed_id)
+    attendance_type = args.get('attendance_type')
+    if attendance_type:
+        query = query.filter(AttendanceLog.attendance_type == attendance_type)
+    return query
+
+def serialize_attendance_log(log, urls):
+    """JSON view of one log; urls comes from employee_image_urls(), computed once per response"""
+    if log.employee:
+        image_url, thumbnail_url = urls(log.employee.image_filename, log.employee.image_sha256)
+    else:
+        image_url = thumbnail_url = urls('default.jpg', None)[0]
+    return {
+        'id': log.id,
+        'timestamp': log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        'employee_name': log.employee_name,
+        'employee_pk': log.employee_pk,
+        'attendance_type': log.attendance_type,
+        'camera_feed_id': log.camera_feed_id,
+        'camera_feed_name': log.camera_feed_name,
+        'confidence_score': log.confidence_score,
+        'image_url': image_url,
+        'thumbnail_url': thumbnail_url
+    }
+
 @app.route('/attendance_logs', methods=['GET'])
 def attendance_logs():
-    logs = AttendanceLog.query.order_by(AttendanceLog.timestamp.desc()).all()
-    # Get all employees for image lookup, using trimmed, lowercased names as keys
-    employees = {e.name.strip().lower(): e for e in Employee.query.all()}
-    default_image = 'default.jpg'
-    return jsonify([
-        {
-            'id': log.id,
-            'timestamp': log.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-            'employee_name': log.employee_name,
-            'attendance_type': log.attendance_type,
-            'camera_feed_name': log.camera_feed_name,
-            # Refactored image_url assignment for clarity and efficiency
-            'image_url': (lambda employee: url_for('static', filename=f'uploads/{employee.image_filename if employee else default_image}', _external=True))(
-                employees.get((log.employee_name or '').strip().lower())
-            )
-        } for log in logs
-    ])
+    """
+    One page of attendance logs, newest first, as a JSON array.
+    Paging is keyset on (timestamp, id): pass the X-Next-Cursor header back as ?cursor=.
+    With ?since_id=<id> the rows newer than that id are returned oldest first, for pollers.
+    """
+    try:
+        limit = min(max(request.args.get('limit', ATTENDANCE_PAGE_SIZE, type=int), 1), ATTENDANCE_MAX_PAGE_SIZE)
+        query = filtered_attendance_query(request.args)
+        since_id = request.args.get('since_id', type=int)
+        cursor = request.args.get('cursor')
+        if since_id is not None:
+            query = query.filter(AttendanceLog.id > since_id).order_by(AttendanceLog.id)
+        else:
+            if cursor:
+                cursor_time, cursor_id = decode_log_cursor(cursor)
+                query = query.filter(db.or_(
+                    AttendanceLog.timestamp < cursor_time,
+                    db.and_(AttendanceLog.timestamp == cursor_time, AttendanceLog.id < cursor_id)
+                ))
+            query = query.order_by(AttendanceLog.timestamp.desc(), AttendanceLog.id.desc())
+    except (ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': f'Invalid query parameter: {e}'}), 400
+
+    logs = query.limit(limit + 1).all()
+    has_more = len(logs) > limit
+    logs = logs[:limit]
+    urls = employee_image_urls()
+    response = jsonify([serialize_attendance_log(log, urls) for log in logs])
+    if since_id is not None:
+        response.headers['X-Last-Id'] = str(logs[-1].id if logs else since_id)
+    elif has_more:
+        response.headers['X-Next-Cursor'] = encode_log_cursor(logs[-1])
+    return response
+
+@app.route('/attendance_logs/export', methods=['GET'])
+def export_attendance_logs():
+    """
+    Stream every matching log (same filters as /attendance_logs) as NDJSON, or as one
+    JSON array with ?format=json. Rows are read in keyset chunks, never all at once.
+    """
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in ('ndjson', 'json'):
+        return jsonify({'status': 'error', 'message': 'format must be ndjson or json'}), 400
+    try:
+        base_query = filtered_attendance_query(request.args)
+    except (ValueError, TypeError) as e:
+        return jsonify({'status': 'error', 'message': f'Invalid query parameter: {e}'}), 400
+    urls = employee_image_urls()
+
+    def generate():
+        last_id = 0
+        first = True
+        if export_format == 'json':
+            yield '['
+        while True:
+            logs = base_query.filter(AttendanceLog.id > last_id).order_by(AttendanceLog.id).limit(ATTENDANCE_EXPORT_CHUNK).all()
+            if not logs:
+                break
+            for log in logs:
+                row = json.dumps(serialize_attendance_log(log, urls))
+                if export_format == 'json':
+                    yield row if first else ',' + row
+                else:
+                    yield row + '\n'
+                first = False
+            last_id = logs[-1].id
+            # Release the chunk's objects before loading the next one
+            db.session.expunge_all()
+        if export_format == 'json':
+            yield ']'
+
+    mimetype = 'application/x-ndjson' if export_format == 'ndjson' else 'application/json'
+    response = app.response_class(stream_with_context(generate()), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename=attendance_logs.{export_format}'
+    return response
 
 @app.route('/delete_attendance_log/<int:log_id>', methods=['DELETE'])
 def delete_attendance_log(log_id):
@@ -424,16 +1620,22 @@ def add_camera_feed():
     if not name or not camera_url or not camera_type:
         return jsonify({'status': 'error', 'message': 'Missing required fields'}), 400
     
+    camera_feed = CameraFeed(
+        name=name,
+        camera_url=camera_url,
+        camera_type=camera_type,
+        location=location,
+        description=description
+    )
+    try:
+        apply_camera_settings(camera_feed, request.form)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid recognition setting: {e}'}), 400
+
     try:
-        camera_feed = CameraFeed(
-            name=name,
-            camera_url=camera_url,
-            camera_type=camera_type,
-            location=location,
-            description=description
-        )
         db.session.add(camera_feed)
         db.session.commit()
+        camera_feed_changed(camera_feed.id, restart=False)
         return jsonify({'status': 'success', 'message': 'Camera feed added successfully'})
     except Exception as e:
         db.session.rollback()
@@ -452,7 +1654,8 @@ def list_camera_feeds():
             'location': cf.location,
             'description': cf.description,
             'is_active': cf.is_active,
-            'created_at': cf.created_at.strftime('%Y-%m-%d %H:%M:%S')
+            'created_at': cf.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+            'recognition_settings': {column: getattr(cf, column) for column in CAMERA_RECOGNITION_SETTINGS}
         })
     return jsonify(result)
 
@@ -465,6 +1668,7 @@ def edit_camera_feed(camera_feed_id):
     location = request.form.get('location')
     description = request.form.get('description')
     is_active = request.form.get('is_active')
+    old_signature = (camera_feed_signature(camera_feed), camera_feed.is_active)
     
     if name:
         camera_feed.name = name
@@ -478,9 +1682,14 @@ def edit_camera_feed(camera_feed_id):
         camera_feed.description = description
     if is_active is not None:
         camera_feed.is_active = is_active.lower() == 'true'
+    try:
+        apply_camera_settings(camera_feed, request.form)
+    except ValueError as e:
+        return jsonify({'status': 'error', 'message': f'Invalid recognition setting: {e}'}), 400
     
     try:
         db.session.commit()
+        camera_feed_changed(camera_feed_id, restart=(camera_feed_signature(camera_feed), camera_feed.is_active) != old_signature)
         return jsonify({'status': 'success', 'message': 'Camera feed updated successfully'})
     except Exception as e:
         db.session.rollback()
@@ -492,6 +1701,7 @@ def delete_camera_feed(camera_feed_id):
     try:
         db.session.delete(camera_feed)
         db.session.commit()
+        camera_feed_changed(camera_feed_id, restart=True)
         return jsonify({'status': 'success', 'message': 'Camera feed deleted successfully'})
     except Exception as e:
         db.session.rollback()
@@ -552,67 +1762,254 @@ def get_detection_config():
         'cooldown_seconds': app.config.get('DETECTION_COOLDOWN_SECONDS', 30)
     })
 
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Prometheus text exposition of this process's metrics plus those of the recognition workers"""
+    snapshots = recognition_service.worker_metrics() if recognition_service is not None else []
+    return app.response_class(metrics.render(snapshots), mimetype='text/plain; version=0.0.4')
+
+profile_lock = threading.Lock()
+
+@app.route('/admin/profile', methods=['POST'])
+def admin_profile():
+    """
+    Profile live recognition for `seconds` and download the result: mode=sample gives
+    collapsed stacks (flamegraph.pl, speedscope), mode=cprofile a pstats file.
+    With camera_feed_id only that camera's pipeline is profiled, in whichever
+    process runs it; without it, this process (cprofile: only its pipelines' stage
+    calls). Anything the capture had to leave out is reported in X-Profile-Note.
+    """
+    if not app.config.get('PROFILING_ENABLED'):
+        return jsonify({'status': 'error', 'message': 'Profiling is disabled (PROFILING_ENABLED)'}), 403
+    token = app.config.get('PROFILING_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('X-Profiling-Token', ''), token):
+        return jsonify({'status': 'error', 'message': 'Invalid profiling token'}), 403
+    mode = request.values.get('mode', 'sample')
+    camera_feed_id = request.values.get('camera_feed_id', type=int)
+    seconds = request.values.get('seconds', 10, type=float)
+    interval = request.values.get('interval_ms', 5, type=float) / 1000.0
+    if mode not in ('sample', 'cprofile'):
+        return jsonify({'status': 'error', 'message': 'mode must be sample or cprofile'}), 400
+    if not 0 < seconds <= app.config.get('PROFILING_MAX_SECONDS', 60) or interval <= 0:
+        return jsonify({'status': 'error', 'message': 'Invalid seconds or interval_ms'}), 400
+    if not profile_lock.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': 'A profile is already being captured'}), 409
+    try:
+        args = (mode, seconds, interval)
+        if (camera_feed_id and recognition_service is not None and recognition_service.uses_processes
+                and recognition_service.owns(camera_feed_id)):
+            data, extension, note = recognition_service.profile(camera_feed_id, args, timeout=seconds + 30)
+        else:
+            data, extension, note = profile_camera(camera_feed_id, *args)
+    except LookupError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 404
+    except Exception as e:
+        print(f"Error capturing profile: {e}")
+        return jsonify({'status': 'error', 'message': str(e)}), 500
+    finally:
+        profile_lock.release()
+    target = f'camera{camera_feed_id}' if camera_feed_id else f'pid{os.getpid()}'
+    response = send_file(io.BytesIO(data), mimetype='text/plain' if extension == 'collapsed' else 'application/octet-stream',
+                         as_attachment=True,
+                         download_name=f"profile-{target}-{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.{extension}")
+    if note:
+        response.headers['X-Profile-Note'] = note
+    return response
+
+@app.route('/slow_frames', methods=['GET'])
+def get_slow_frames():
+    """Recent frames over SLOW_FRAME_BUDGET_MS with their per-stage breakdown, newest first"""
+    return jsonify({
+        'budget_ms': app.config.get('SLOW_FRAME_BUDGET_MS', 500),
+        'frames': list(reversed(slow_frames))
+    })
+
+@app.route('/pipeline_stats', methods=['GET'])
+def get_pipeline_stats():
+    """Viewer counts and per-stage frames in / processed / dropped for every shared camera session"""
+    return jsonify(camera_sessions.stats())
+
+@app.route('/events', methods=['GET'])
+def event_stream():
+    """
+    Server-Sent Events: attendance, sighting_suppressed and camera_status.
+    Reconnecting clients resume after their Last-Event-ID; a 'reset' event means
+    some events were missed and the client should reload its data. ?types= filters.
+    """
+    last_id = request.headers.get('Last-Event-ID', type=int)
+    if last_id is None:
+        last_id = request.args.get('last_event_id', events.last_id, type=int)
+    types = {t for t in request.args.get('types', '').split(',') if t}
+
+    def generate():
+        current = last_id
+        yield 'retry: 3000\n\n'
+        while True:
+            pending, missed = events.wait(current, timeout=15)
+            if missed:
+                yield 'event: reset\ndata: {}\n\n'
+            if not pending:
+                current = min(current, events.last_id)
+                yield ': keepalive\n\n'
+                continue
+            for event in pending:
+                current = event.id
+                if types and event.type not in types:
+                    continue
+                yield f'id: {event.id}\nevent: {event.type}\ndata: {json.dumps(event.data)}\n\n'
+
+    response = app.response_class(generate(), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/attendance_dedup_stats', methods=['GET'])
+def get_attendance_dedup_stats():
+    """Entries and hit counts of this process's attendance dedup cache"""
+    return jsonify(attendance_dedup.stats())
+
+@app.route('/attendance_writer_stats', methods=['GET'])
+def get_attendance_writer_stats():
+    """Queue depth and flush latency of this process's write-behind attendance writer"""
+    if attendance_writer is None or attendance_writer_pid != os.getpid():
+        return jsonify({'status': 'idle'})
+    return jsonify(attendance_writer.stats())
+
+@app.route('/encoding_stats', methods=['GET'])
+def get_encoding_stats():
+    """Batch size, throughput and latency of this process's shared face encoder"""
+    if batch_encoder is None or batch_encoder_pid != os.getpid():
+        return jsonify({'status': 'disabled' if app.config.get('ENCODING_BATCH_MAX_SIZE', 0) <= 1 else 'idle'})
+    return jsonify(batch_encoder.stats())
+
+@app.route('/recognition_service_status', methods=['GET'])
+def get_recognition_service_status():
+    """Which cameras the background recognition service runs, where, and whether they are up"""
+    if recognition_service is None:
+        return jsonify({'status': 'disabled'})
+    return jsonify(recognition_service.status())
+
+@app.route('/gallery_version', methods=['GET'])
+def get_gallery_version():
+    """Report the latest gallery version and the one loaded in this process"""
+    return jsonify({
+        'version': latest_gallery_version(),
+        'loaded_version': gallery.version if gallery.loaded else None,
+        'size': len(gallery)
+    })
+
+@app.route('/gallery_changes', methods=['GET'])
+def get_gallery_changes():
+    """List gallery changes newer than ?since=<version> so stale workers can pull the delta"""
+    since = request.args.get('since', 0, type=int)
+    changes = GalleryChange.query.filter(GalleryChange.id > since).order_by(GalleryChange.id).all()
+    return jsonify([
+        {'version': c.id, 'employee_pk': c.employee_pk, 'op': c.op} for c in changes
+    ])
+
 @app.route('/employee_status_page', methods=['GET'])
 def employee_status_page():
     return render_template('employee_status.html')
 
+def ensure_presence_current(now):
+    """Load the presence table once per process, then reload its employee list after gallery changes
+    and read attendance rows added since the last call"""
+    version = latest_gallery_version()
+    if presence.employees_version != version:
+        urls = employee_image_urls()
+        employees = []
+        for e in db.session.query(Employee.id, Employee.name, Employee.employee_id, Employee.image_filename,
+                                  Employee.image_sha256).order_by(Employee.id):
+            image_url, thumbnail_url = urls(e.image_filename, e.image_sha256)
+            employees.append({
+                'id': e.id,
+                'name': e.name,
+                'employee_id': e.employee_id,
+                'image_url': image_url,
+                'thumbnail_url': thumbnail_url
+            })
+        presence.set_employees(employees, version, now)
+    # Like the gallery version: one indexed lookup tells whether any process wrote attendance since the last read
+    latest_id = db.session.query(db.func.max(AttendanceLog.id)).scalar() or 0
+    if not presence.loaded or latest_id < presence.synced_log_id:
+        presence.load(presence_rows(now, latest_id), latest_id, now)
+    elif latest_id != presence.synced_log_id:
+        presence.catch_up(presence_rows(now, latest_id, presence.synced_log_id), latest_id, now)
+
+def presence_rows(now, latest_id, after_id=0):
+    """Live attendances within the presence window with after_id < id <= latest_id, as PresenceTable tuples"""
+    logs = db.session.query(AttendanceLog.id, AttendanceLog.employee_pk, AttendanceLog.timestamp,
+                            AttendanceLog.attendance_type, AttendanceLog.camera_feed_name).filter(
+        AttendanceLog.id > after_id,
+        AttendanceLog.id <= latest_id,
+        AttendanceLog.timestamp >= now - presence.window,
+        AttendanceLog.timestamp <= now,
+        AttendanceLog.employee_pk.is_not(None),
+        AttendanceLog.attendance_type != 'video'
+    )
+    return [(log.id, log.employee_pk, log.timestamp,
+             presence_attendance(log.timestamp, log.attendance_type, log.camera_feed_name)) for log in logs]
+
+def presence_attendance(timestamp, attendance_type, camera_feed_name):
+    return {
+        'timestamp': timestamp.strftime('%Y-%m-%d %H:%M:%S'),
+        'attendance_type': attendance_type,
+        'camera_feed_name': camera_feed_name
+    }
+
+def record_presence(event):
+    """
+    Event bus subscriber: add each committed live attendance, and each sighting suppressed
+    as already logged, to the presence table
+    """
+    # Video rows are reconstructed from recorded_at, not evidence of presence now
+    if event.type not in ('attendance', 'sighting_suppressed') or event.data['attendance_type'] == 'video':
+        return
+    data = event.data
+    timestamp = datetime.strptime(data['timestamp'], '%Y-%m-%d %H:%M:%S')
+    attendance = presence_attendance(timestamp, data['attendance_type'], data['camera_feed_name'])
+    if event.type == 'attendance':
+        presence.record(data['id'], data['employee_pk'], timestamp, attendance, datetime.utcnow())
+    else:
+        presence.record_sighting(data['employee_pk'], timestamp, attendance, datetime.utcnow())
+
+# Who is present right now, maintained from attendance and sighting events and caught up from rows other workers wrote
+presence = PresenceTable(window_seconds=app.config.get('DETECTION_COOLDOWN_SECONDS', 30))
+events.subscribe(record_presence)
+
 @app.route('/employee_status_data', methods=['GET'])
 def get_employee_status_data():
-    """Get real-time employee status data"""
+    """Get real-time employee status data; supports If-None-Match"""
     try:
-        # Get all employees
-        employees = Employee.query.all()
-        employee_data = []
-        
-        # Get recent attendance logs
-        cooldown_seconds = app.config.get('DETECTION_COOLDOWN_SECONDS', 30)
-        recent_time = datetime.utcnow() - timedelta(seconds=cooldown_seconds)
-        
-        recent_attendances = AttendanceLog.query.filter(
-            AttendanceLog.timestamp >= recent_time
-        ).all()
-        
-        # Create a map of recent detections
-        recent_attendance_map = {}
-        for attendance in recent_attendances:
-            if attendance.employee_name not in recent_attendance_map:
-                recent_attendance_map[attendance.employee_name] = []
-            recent_attendance_map[attendance.employee_name].append({
-                'timestamp': attendance.timestamp.strftime('%Y-%m-%d %H:%M:%S'),
-                'attendance_type': attendance.attendance_type,
-                'camera_feed_name': attendance.camera_feed_name
-            })
-        
-        # Build status data for each employee
-        for employee in employees:
-            recent_attendances_for_employee = recent_attendance_map.get(employee.name, [])
-            is_present = len(recent_attendances_for_employee) > 0
-            
-            employee_data.append({
-                'id': employee.id,
-                'name': employee.name,
-                'employee_id': employee.employee_id,
-                'image_url': url_for('static', filename=f'uploads/{employee.image_filename}', _external=True),
-                'status': 'present' if is_present else 'absent',
-                'attendance_count': len(recent_attendances_for_employee),
-                'last_detected': recent_attendances_for_employee[-1]['timestamp'] if recent_attendances_for_employee else None,
-                'recent_attendances': recent_attendances_for_employee
-            })
-        
-        return jsonify({
-            'employees': employee_data,
-            'summary': {
-                'total': len(employees),
-                'present': len([e for e in employee_data if e['status'] == 'present']),
-                'absent': len([e for e in employee_data if e['status'] == 'absent']),
-                'attendance_rate': round((len([e for e in employee_data if e['status'] == 'present']) / len(employees)) * 100) if employees else 0,
-                'last_updated': datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-            }
-        })
+        now = datetime.utcnow()
+        ensure_presence_current(now)
+        presence.expire(now)
+        _, payload = presence.snapshot()
+        etag = presence.etag
+        if request.if_none_match.contains(etag):
+            response = app.response_class(status=304)
+        else:
+            response = jsonify(payload)
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 if __name__ == '__main__':
     with app.app_context():
-        db.create_all()
-    app.run(debug=True) 
\ No newline at end of file
+        # Creates a fresh database or brings an existing one up to the current schema
+        upgrade()
+    if '--recognition-only' in sys.argv:
+        # Headless: run background recognition for all active cameras without the web UI
+        start_recognition_service()
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            recognition_service.shutdown()
+    else:
+        # With the debug reloader only the serving child process should run recognition
+        if app.config.get('RECOGNITION_SERVICE_ENABLED') and os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_recognition_service()
+        app.run(debug=True) 
\ No newline at end of file
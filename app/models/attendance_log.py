@@ -12,6 +12,16 @@ class AttendanceLog(db.Model):
     camera_feed_id = db.Column(db.Integer, db.ForeignKey('camera_feed.id'), nullable=True)
     camera_feed_name = db.Column(db.String(100), nullable=True)
     confidence_score = db.Column(db.Float, nullable=True)
+    employee_pk = db.Column(db.Integer, db.ForeignKey('employee.id', name='fk_attendance_log_employee_pk', ondelete='SET NULL'), nullable=True)
+    day = db.Column(db.Date, nullable=True)  # UTC date of timestamp, materialized for per-day lookups
+
+    employee = db.relationship('Employee')
+
+    __table_args__ = (
+        db.Index('ix_attendance_log_day_employee_pk', 'day', 'employee_pk'),
+        db.Index('ix_attendance_log_timestamp', 'timestamp'),
+        db.Index('ix_attendance_log_camera_feed_id_timestamp', 'camera_feed_id', 'timestamp'),
+    )
 
     def __repr__(self):
         return f'<AttendanceLog {self.employee_name} at {self.timestamp}>' 
\ No newline at end of file
@@ -13,6 +13,14 @@ class CameraFeed(db.Model):
     description = db.Column(db.Text, nullable=True)
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Per-camera recognition settings; NULL falls back to the global default in config.Config
+    recognize_every_n_frames = db.Column(db.Integer, nullable=True)
+    recognize_interval_ms = db.Column(db.Integer, nullable=True)
+    detection_scale = db.Column(db.Float, nullable=True)  # Detect on a frame resized by this factor
+    detection_model = db.Column(db.String(10), nullable=True)  # 'hog' or 'cnn'
+    detection_upsample = db.Column(db.Integer, nullable=True)  # number_of_times_to_upsample
+    motion_gate_enabled = db.Column(db.Boolean, nullable=True)  # Skip detection on static frames
+    motion_gate_restrict_region = db.Column(db.Boolean, nullable=True)  # Detect only inside the motion box
 
     def __repr__(self):
         return f'<CameraFeed {self.name}>' 
\ No newline at end of file
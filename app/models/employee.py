@@ -2,6 +2,7 @@
 Employee model for the Criminal Face Detection system.
 """
 from ..extensions import db
+from encoding_storage import Float32Encoding
 
 class Employee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -9,7 +10,11 @@ class Employee(db.Model):
     employee_id = db.Column(db.String(50), unique=True, nullable=False)
     description = db.Column(db.Text, nullable=True)
     image_filename = db.Column(db.String(200), nullable=False)
-    face_encoding = db.Column(db.PickleType, nullable=False)  # Store numpy array as binary
+    face_encoding = db.Column(Float32Encoding, nullable=False)  # Version byte + 128 little-endian float32
+    image_sha256 = db.Column(db.String(64), nullable=True, index=True)  # Content hash of the enrolled image
+
+    # AUTOINCREMENT: a deleted employee's id is never handed to a new enrollment
+    __table_args__ = {'sqlite_autoincrement': True}
 
     def __repr__(self):
         return f'<Employee {self.name}>' 
\ No newline at end of file
@@ -0,0 +1,117 @@
+"""
+In-memory attendance dedup for the Criminal Face Detection system.
+
+Remembers when each employee was last logged today (optionally per camera)
+so a matched face that was already logged costs a dict lookup instead of a
+database query. The cache is warmed from today's attendance rows and warmed
+again when the day rolls over. Each process keeps its own cache, so a miss
+is confirmed with one indexed lookup before the sighting is logged: rows
+written by other processes count too, and only sightings in two processes
+before either row is committed can both be logged.
+"""
+import threading
+from datetime import datetime
+
+
+class AttendanceDedup:
+    """
+    :param relog_seconds: 0 logs each employee at most once per day; otherwise log
+                          them again once this long has passed since their last log
+    :param per_camera: dedup per (employee, camera) instead of per employee
+    :param lookup: optional callable(employee_pk, camera_feed_id, day) returning the latest
+                   log time of that day in the database (camera_feed_id is None unless
+                   per_camera), or None; asked on every cache miss
+    :param loader: optional callable(day) returning that day's (employee_pk, camera_feed_id,
+                   timestamp) rows; re-warms the cache after the day rolls over
+    """
+
+    def __init__(self, relog_seconds=0, per_camera=False, lookup=None, loader=None):
+        self.relog_seconds = relog_seconds
+        self.per_camera = per_camera
+        self.lookup = lookup
+        self.loader = loader
+        self.loaded = False
+        self.day = None
+        self._last_logged = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.claims = 0
+        self.lookups = 0
+
+    def _key(self, employee_pk, camera_feed_id):
+        return (employee_pk, camera_feed_id) if self.per_camera else employee_pk
+
+    def _rollover(self, now):
+        """Start a new day's cache; True when the day changed."""
+        if now.date() == self.day:
+            return False
+        self.day = now.date()
+        self._last_logged = {}
+        return True
+
+    def _remember(self, key, timestamp):
+        if key not in self._last_logged or self._last_logged[key] < timestamp:
+            self._last_logged[key] = timestamp
+
+    def _suppresses(self, last, now):
+        return last is not None and (not self.relog_seconds or (now - last).total_seconds() < self.relog_seconds)
+
+    def warm(self, rows, now=None):
+        """
+        Seed the cache from today's logs, keeping what it already holds for today.
+        :param rows: iterable of (employee_pk, camera_feed_id, timestamp)
+        """
+        now = now or datetime.utcnow()
+        with self._lock:
+            self._rollover(now)
+            for employee_pk, camera_feed_id, timestamp in rows:
+                if employee_pk is None or timestamp is None or timestamp.date() != self.day:
+                    continue
+                self._remember(self._key(employee_pk, camera_feed_id), timestamp)
+            self.loaded = True
+
+    def claim(self, employee_pk, camera_feed_id=None, now=None):
+        """Return True (and record the log time) if this sighting should be logged."""
+        now = now or datetime.utcnow()
+        key = self._key(employee_pk, camera_feed_id)
+        with self._lock:
+            new_day = self._rollover(now)
+            last = self._last_logged.get(key)
+        if new_day and self.loader is not None:
+            self.warm(self.loader(now.date()), now)
+            with self._lock:
+                last = self._last_logged.get(key)
+        if not self._suppresses(last, now) and self.lookup is not None:
+            # Another process may have logged them since this cache last saw the database
+            logged = self.lookup(employee_pk, camera_feed_id if self.per_camera else None, now.date())
+            with self._lock:
+                self.lookups += 1
+                if logged is not None and logged.date() == self.day:
+                    self._remember(key, logged)
+        with self._lock:
+            last = self._last_logged.get(key)
+            if self._suppresses(last, now):
+                self.hits += 1
+                return False
+            self._last_logged[key] = now
+            self.claims += 1
+            return True
+
+    def release(self, employee_pk, camera_feed_id=None, logged_at=None):
+        """Undo a claim whose log could not be written, so the next sighting retries."""
+        with self._lock:
+            key = self._key(employee_pk, camera_feed_id)
+            if logged_at is None or self._last_logged.get(key) == logged_at:
+                self._last_logged.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'day': self.day.isoformat() if self.day else None,
+                'entries': len(self._last_logged),
+                'hits': self.hits,
+                'logged': self.claims,
+                'lookups': self.lookups,
+                'relog_seconds': self.relog_seconds,
+                'per_camera': self.per_camera
+            }
@@ -0,0 +1,129 @@
+"""
+Write-behind attendance logging for the Criminal Face Detection system.
+
+Recognition threads hand new AttendanceLog rows to an AttendanceWriter and
+return immediately. A background flusher bulk-inserts queued rows every
+max_batch records or flush_interval_ms, so the database commit (and, on
+SQLite, the single writer lock) is taken once per batch instead of once per
+detection and never inside a frame loop.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+
+class AttendanceWriter:
+    """
+    :param flush_rows: callable(list of row dicts) that inserts and commits one batch
+    :param max_batch: flush as soon as this many rows are queued
+    :param flush_interval_ms: flush queued rows at least this often
+    :param max_queue: rows held in memory before new ones are dropped
+    :param on_failure: optional callable(list of row dicts) for rows that were
+                       dropped or failed to insert
+    """
+
+    def __init__(self, flush_rows, max_batch=100, flush_interval_ms=500, max_queue=10000, on_failure=None):
+        self.flush_rows = flush_rows
+        self.max_batch = max(1, int(max_batch))
+        self.flush_interval = max(1, flush_interval_ms) / 1000.0
+        self.on_failure = on_failure
+        self._q = queue.Queue(maxsize=max_queue)
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._flush_times = deque(maxlen=100)
+        self.written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='attendance-writer', daemon=True)
+        self._thread.start()
+        return self
+
+    def submit(self, row):
+        """Queue one row without blocking; returns False if the queue is full."""
+        try:
+            self._q.put_nowait(row)
+            return True
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            self._report_failure([row])
+            return False
+
+    def stop(self, timeout=5.0):
+        """Stop the flusher after a best-effort flush of everything still queued."""
+        self._stop.set()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _take(self, limit):
+        rows = []
+        while len(rows) < limit:
+            try:
+                rows.append(self._q.get_nowait())
+            except queue.Empty:
+                break
+        return rows
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                first = self._q.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            deadline = time.monotonic() + self.flush_interval
+            rows = [first]
+            while len(rows) < self.max_batch and not self._stop.is_set():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    rows.append(self._q.get(timeout=min(remaining, 0.1)))
+                except queue.Empty:
+                    continue
+            self._flush(rows)
+        # Shutdown: drain whatever is left
+        rows = self._take(self.max_batch)
+        while rows:
+            self._flush(rows)
+            rows = self._take(self.max_batch)
+
+    def _flush(self, rows):
+        started = time.monotonic()
+        try:
+            self.flush_rows(rows)
+        except Exception as e:
+            print(f"Error writing {len(rows)} attendance logs: {e}")
+            with self._lock:
+                self.failed += len(rows)
+            self._report_failure(rows)
+            return
+        with self._lock:
+            self.written += len(rows)
+            self.batches += 1
+            self._flush_times.append(time.monotonic() - started)
+
+    def _report_failure(self, rows):
+        if self.on_failure is not None:
+            try:
+                self.on_failure(rows)
+            except Exception as e:
+                print(f"Error handling failed attendance logs: {e}")
+
+    def stats(self):
+        with self._lock:
+            times = sorted(self._flush_times)
+            return {
+                'queue_depth': self._q.qsize(),
+                'written': self.written,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'failed': self.failed,
+                'avg_flush_ms': round(sum(times) * 1000.0 / len(times), 2) if times else 0.0,
+                'max_flush_ms': round(times[-1] * 1000.0, 2) if times else 0.0
+            }
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Cold-start gallery load time: pickled float64 rows vs packed float32 rows vs
+the memory-mapped gallery snapshot.
+
+Builds a throwaway SQLite database per size with synthetic encodings, so it
+runs offline without any enrolled employees:
+
+    python benchmarks/bench_gallery_load.py --sizes 1000 10000 100000
+
+The OS page cache is warm after the first pass; the snapshot numbers show
+the per-process cost once another worker has already mapped the file.
+"""
+import argparse
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_gallery import FaceGallery, ENCODING_DIM  # noqa: E402
+from encoding_storage import (pack_encoding, unpack_encoding, open_gallery_snapshot,  # noqa: E402
+                              write_gallery_snapshot)
+
+
+def build_database(path, n, seed=0):
+    rng = np.random.default_rng(seed)
+    conn = sqlite3.connect(path)
+    conn.execute('CREATE TABLE employee (id INTEGER PRIMARY KEY, name TEXT, enc_pickle BLOB, enc_f32 BLOB)')
+    for start in range(0, n, 10000):
+        encodings = rng.normal(0, 0.09, size=(min(10000, n - start), ENCODING_DIM))
+        conn.executemany('INSERT INTO employee VALUES (?, ?, ?, ?)', [
+            (start + i + 1, f'id{start + i}', pickle.dumps(enc), pack_encoding(enc))
+            for i, enc in enumerate(encodings)
+        ])
+    conn.commit()
+    return conn
+
+
+def time_load(load, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        gallery = load()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000.0, gallery
+
+
+def run(sizes, repeat):
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for n in sizes:
+            conn = build_database(os.path.join(tmp, f'bench_{n}.db'), n)
+            snapshot_path = os.path.join(tmp, f'gallery_{n}.bin')
+
+            def load_pickle():
+                gallery = FaceGallery()
+                rows = conn.execute('SELECT id, name, enc_pickle FROM employee')
+                gallery.load((pk, name, pickle.loads(blob)) for pk, name, blob in rows)
+                return gallery
+
+            def load_float32():
+                gallery = FaceGallery()
+                rows = conn.execute('SELECT id, name, enc_f32 FROM employee')
+                gallery.load((pk, name, unpack_encoding(blob)) for pk, name, blob in rows)
+                return gallery
+
+            def load_snapshot():
+                gallery = FaceGallery()
+                version, ids, names, encodings = open_gallery_snapshot(snapshot_path)
+                gallery.adopt(ids, names, encodings, version=version)
+                return gallery
+
+            pickle_ms, gallery = time_load(load_pickle, repeat)
+            float32_ms, gallery = time_load(load_float32, repeat)
+            snapshot = gallery.snapshot()
+            write_gallery_snapshot(snapshot_path, snapshot.ids, snapshot.names, snapshot.encodings, 1)
+            snapshot_ms, _ = time_load(load_snapshot, repeat)
+            conn.close()
+            for storage, ms in (('pickle', pickle_ms), ('float32', float32_ms), ('snapshot', snapshot_ms)):
+                results.append({'size': n, 'storage': storage, 'load_ms': ms, 'speedup': pickle_ms / ms if ms else None})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--repeat', type=int, default=3, help='best of this many loads')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.repeat)
+    print(f"{'size':>8} {'storage':>8} {'load ms':>10} {'speedup':>8}")
+    for r in results:
+        print(f"{r['size']:>8} {r['storage']:>8} {r['load_ms']:>10.1f} {r['speedup']:>7.1f}x")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks of the per-frame recognition path and attendance logging.
+
+Every input is generated from a fixed seed (synthetic frames, a synthetic
+clip and random 128-d encodings), so it runs offline without a camera or
+enrolled employees:
+
+    python benchmarks/bench_hot_path.py --json results.json
+    python benchmarks/bench_hot_path.py --compare baseline.json --threshold 0.2
+
+With --compare, cases whose median time grew by more than the threshold
+(0.2 = 20% slower) against the baseline file are reported and the script
+exits with status 1, so it can gate a CI job. Use --only to run a subset,
+e.g. `--only gallery_match`.
+"""
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+import cv2
+import numpy as np
+import sqlalchemy as sa
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from attendance_cache import AttendanceDedup  # noqa: E402
+from face_gallery import FaceGallery, ENCODING_DIM  # noqa: E402
+from mjpeg import EncodedFrame, mjpeg_part, stream_variant  # noqa: E402
+
+try:
+    import face_recognition  # noqa: E402
+    from face_detection import detect_faces  # noqa: E402
+except ImportError:  # dlib missing: the detection/encoding cases are skipped
+    face_recognition = None
+
+FRAME_SIZES = {'480p': (640, 480), '720p': (1280, 720)}
+DETECTION_SCALES = (1.0, 0.5, 0.25)
+GALLERY_SIZES = (100, 1000, 10000, 100000)
+FACES_PER_FRAME = 4
+
+
+def synthetic_frame(width, height, seed=0):
+    """A deterministic BGR frame with texture and edges, so codecs and HOG do real work."""
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    base = ((x * 255 // max(1, width - 1) + y * 255 // max(1, height - 1)) // 2).astype(np.uint8)
+    frame = np.dstack([base, np.flipud(base), np.fliplr(base)])
+    frame = cv2.add(frame, rng.integers(0, 24, size=frame.shape, dtype=np.uint8))
+    for _ in range(12):
+        x0, y0 = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+        color = tuple(int(c) for c in rng.integers(0, 256, 3))
+        cv2.rectangle(frame, (x0, y0), (x0 + int(rng.integers(20, 200)), y0 + int(rng.integers(20, 200))), color, -1)
+        cv2.circle(frame, (x0 + 20, y0 + 20), int(rng.integers(10, 60)), color[::-1], 3)
+    return frame
+
+
+def write_clip(path, width, height, frames, fps=25):
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*'MJPG'), fps, (width, height))
+    if not writer.isOpened():
+        return False
+    base = synthetic_frame(width, height)
+    for i in range(frames):
+        writer.write(np.roll(base, i * 4, axis=1))
+    writer.release()
+    return True
+
+
+def attendance_table(metadata):
+    """Mirror of the attendance_log table written by write_attendance_rows()"""
+    return sa.Table(
+        'attendance_log', metadata,
+        sa.Column('id', sa.Integer, primary_key=True),
+        sa.Column('timestamp', sa.DateTime),
+        sa.Column('employee_name', sa.String(100), nullable=False),
+        sa.Column('attendance_type', sa.String(20), nullable=False),
+        sa.Column('camera_feed_id', sa.Integer),
+        sa.Column('camera_feed_name', sa.String(100)),
+        sa.Column('confidence_score', sa.Float),
+        sa.Column('employee_pk', sa.Integer),
+        sa.Column('day', sa.Date),
+        sa.Index('ix_attendance_log_day_employee_pk', 'day', 'employee_pk'),
+        sa.Index('ix_attendance_log_timestamp', 'timestamp'),
+        sa.Index('ix_attendance_log_camera_feed_id_timestamp', 'camera_feed_id', 'timestamp')
+    )
+
+
+def attendance_rows(n, start=0):
+    now = datetime(2024, 1, 1, 9, 0, 0)
+    return [{
+        'timestamp': now + timedelta(seconds=start + i),
+        'employee_name': f'id{(start + i) % 500}',
+        'attendance_type': 'live',
+        'camera_feed_id': (start + i) % 8 + 1,
+        'camera_feed_name': f'cam{(start + i) % 8 + 1}',
+        'confidence_score': 0.6,
+        'employee_pk': (start + i) % 500 + 1,
+        'day': now.date()
+    } for i in range(n)]
+
+
+def measure(func, repeat, number, warmup=1):
+    """Time `number` calls per round over `repeat` rounds; returns per-call milliseconds."""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        samples.append((time.perf_counter() - start) * 1000.0 / number)
+    samples.sort()
+    return {
+        'median_ms': samples[len(samples) // 2],
+        'min_ms': samples[0],
+        'p95_ms': samples[min(len(samples) - 1, int(round(0.95 * (len(samples) - 1))))],
+        'rounds': repeat,
+        'calls_per_round': number
+    }
+
+
+def cases(tmp, quick=False):
+    """Yield (name, params, func, number) for every benchmark case."""
+    rng = np.random.default_rng(0)
+    frames = {label: synthetic_frame(w, h) for label, (w, h) in FRAME_SIZES.items()}
+
+    for label, frame in frames.items():
+        jpeg = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, 80])[1]
+        yield 'jpeg_decode', {'frame': label}, lambda jpeg=jpeg: cv2.imdecode(jpeg, cv2.IMREAD_COLOR), 10
+
+    clip = os.path.join(tmp, 'clip.avi')
+    if write_clip(clip, *FRAME_SIZES['720p'], frames=60):
+        capture = cv2.VideoCapture(clip)
+
+        def read_frame():
+            ok, _ = capture.read()
+            if not ok:
+                capture.set(cv2.CAP_PROP_POS_FRAMES, 0)
+                capture.read()
+        yield 'video_read', {'frame': '720p', 'codec': 'MJPG'}, read_frame, 10
+
+    for label, frame in frames.items():
+        yield 'cvt_color', {'frame': label}, lambda frame=frame: cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), 50
+
+    if face_recognition is not None:
+        rgb = cv2.cvtColor(frames['480p'], cv2.COLOR_BGR2RGB)
+        for scale in DETECTION_SCALES:
+            yield 'face_locations_hog', {'frame': '480p', 'scale': scale}, \
+                lambda scale=scale: detect_faces(rgb, scale=scale, model='hog', upsample=1), 1
+        # Fixed boxes stand in for detections; landmarks and the embedding network run the same either way
+        boxes = [(40 + 100 * i, 140 + 100 * i, 140 + 100 * i, 40 + 100 * i) for i in range(FACES_PER_FRAME)]
+        for faces in (1, FACES_PER_FRAME):
+            yield 'face_encodings', {'faces': faces}, \
+                lambda faces=faces: face_recognition.face_encodings(rgb, boxes[:faces]), 1
+
+    probes = rng.normal(0, 0.09, size=(FACES_PER_FRAME, ENCODING_DIM)).astype(np.float32)
+    for size in GALLERY_SIZES[:3] if quick else GALLERY_SIZES:
+        gallery = FaceGallery()
+        identities = rng.normal(0, 0.09, size=(size, ENCODING_DIM)).astype(np.float32)
+        gallery.load((i + 1, f'id{i}', enc) for i, enc in enumerate(identities))
+        yield 'gallery_match', {'identities': size, 'faces': FACES_PER_FRAME}, \
+            lambda gallery=gallery: gallery.match(probes), max(1, 100000 // (size * 10))
+
+    frame = frames['720p']
+    yield 'imencode', {'frame': '720p', 'quality': 80}, lambda: mjpeg_part(frame, 80), 5
+    variant = stream_variant(640, 70)
+    yield 'imencode_variant', {'frame': '720p', 'max_width': 640, 'quality': 70}, \
+        lambda: EncodedFrame(frame).part(variant), 5
+
+    dedup = AttendanceDedup(relog_seconds=30, per_camera=True)
+    clock = [datetime(2024, 1, 1, 9, 0, 0)]
+
+    def claim():
+        clock[0] += timedelta(milliseconds=40)
+        dedup.claim(7, 3, clock[0])
+    yield 'attendance_claim', {'relog_seconds': 30}, claim, 1000
+
+    engine = sa.create_engine(f"sqlite:///{os.path.join(tmp, 'attendance.db')}")
+    metadata = sa.MetaData()
+    table = attendance_table(metadata)
+    metadata.create_all(engine)
+    counter = [0]
+
+    def insert(batch):
+        rows = attendance_rows(batch, counter[0])
+        counter[0] += batch
+        with engine.begin() as conn:
+            conn.execute(table.insert(), rows)
+    # One commit per row (the old logging path) against the batched write-behind flush
+    yield 'attendance_insert', {'rows_per_commit': 1}, lambda: insert(1), 20
+    yield 'attendance_insert', {'rows_per_commit': 100}, lambda: insert(100), 2
+
+
+def case_key(name, params):
+    return name + ''.join(f'[{k}={v}]' for k, v in params.items())
+
+
+def run(repeat, only=None, quick=False):
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, params, func, number in cases(tmp, quick):
+            key = case_key(name, params)
+            if only and not any(o in key for o in only):
+                continue
+            results[key] = dict(measure(func, repeat, number), case=name, params=params)
+            print(f"{key:<60} {results[key]['median_ms']:>10.3f} ms", flush=True)
+    return results
+
+
+def environment():
+    return {
+        'created_at': datetime.utcnow().strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'sqlite': sqlite3.sqlite_version,
+        'face_recognition': face_recognition is not None
+    }
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare median times against a baseline run.
+    :return: list of (case key, baseline ms, current ms, ratio, regressed)
+    """
+    rows = []
+    for key, result in results.items():
+        before = baseline.get('results', {}).get(key)
+        if before is None:
+            continue
+        ratio = result['median_ms'] / before['median_ms'] if before['median_ms'] else float('inf')
+        rows.append((key, before['median_ms'], result['median_ms'], ratio, ratio > 1 + threshold))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--repeat', type=int, default=7, help='timed rounds per case')
+    parser.add_argument('--only', nargs='+', help='run cases whose key contains any of these strings')
+    parser.add_argument('--quick', action='store_true', help='skip the 100k-identity gallery')
+    parser.add_argument('--json', help='write results to this file')
+    parser.add_argument('--compare', help='baseline JSON from an earlier run')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='allowed slowdown against the baseline before failing (0.2 = 20%%)')
+    args = parser.parse_args()
+
+    report = {'environment': environment(), 'results': run(args.repeat, args.only, args.quick)}
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        rows = compare(report['results'], baseline, args.threshold)
+        print(f"\n{'case':<60} {'baseline':>10} {'current':>10} {'ratio':>7}")
+        for key, before, after, ratio, regressed in rows:
+            print(f"{key:<60} {before:>10.3f} {after:>10.3f} {ratio:>6.2f}x{'  REGRESSION' if regressed else ''}")
+        regressions = [row for row in rows if row[4]]
+        if regressions:
+            print(f"\n{len(regressions)} case(s) slower than the baseline by more than {args.threshold:.0%}")
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Recall-vs-latency benchmark of the IVF face matcher against exact matching.
+
+Uses synthetic 128-d embeddings (identities plus per-sighting noise), so it
+runs offline without any enrolled employees. recall@1 is the share of probes
+whose top match is the identity they were planted from; agree is the share
+of IVF answers that equal the exact matcher's:
+
+    python benchmarks/bench_matchers.py --sizes 10000 100000 --nprobe 1 4 8 16
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_gallery import FaceGallery, ENCODING_DIM  # noqa: E402
+from face_matchers import ExactMatcher, IVFMatcher  # noqa: E402
+
+
+def synthetic_gallery(n, queries, seed=0):
+    """Random identities and noisy re-sightings of a subset of them."""
+    rng = np.random.default_rng(seed)
+    identities = rng.normal(0, 0.09, size=(n, ENCODING_DIM)).astype(np.float32)
+    truth = rng.choice(n, queries, replace=False if queries <= n else True)
+    probes = identities[truth] + rng.normal(0, 0.03, size=(queries, ENCODING_DIM)).astype(np.float32)
+    return identities, truth, probes
+
+
+def time_search(matcher, probes, batch, **kwargs):
+    start = time.perf_counter()
+    pks = []
+    for i in range(0, len(probes), batch):
+        found, _ = matcher.search(probes[i:i + batch], **kwargs)
+        pks.append(found)
+    elapsed = time.perf_counter() - start
+    return np.concatenate(pks), elapsed * 1000.0 / len(probes)
+
+
+def run(sizes, nprobes, queries, batch):
+    results = []
+    for n in sizes:
+        identities, truth, probes = synthetic_gallery(n, queries)
+        gallery = FaceGallery()
+        gallery.load((i, f'id{i}', enc) for i, enc in enumerate(identities))
+
+        exact = ExactMatcher()
+        exact.attach(gallery)
+        exact_pks, exact_ms = time_search(exact, probes, batch)
+        results.append({'size': n, 'matcher': 'exact', 'nprobe': None, 'build_s': 0.0,
+                        'recall_at_1': float(np.mean(exact_pks == truth)), 'exact_agreement': None,
+                        'ms_per_face': exact_ms})
+
+        ivf = IVFMatcher()
+        start = time.perf_counter()
+        ivf.attach(gallery)
+        build_s = time.perf_counter() - start
+        for nprobe in nprobes:
+            ivf_pks, ivf_ms = time_search(ivf, probes, batch, nprobe=nprobe)
+            results.append({'size': n, 'matcher': 'ivf', 'nprobe': nprobe, 'build_s': build_s,
+                            'recall_at_1': float(np.mean(ivf_pks == truth)),
+                            'exact_agreement': float(np.mean(ivf_pks == exact_pks)), 'ms_per_face': ivf_ms})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--nprobe', type=int, nargs='+', default=[1, 4, 8, 16, 32])
+    parser.add_argument('--queries', type=int, default=500)
+    parser.add_argument('--batch', type=int, default=8, help='faces matched per call, i.e. faces per frame')
+    parser.add_argument('--json', help='write results to this file')
+    args = parser.parse_args()
+
+    results = run(args.sizes, args.nprobe, args.queries, args.batch)
+    print(f"{'size':>8} {'matcher':>7} {'nprobe':>6} {'build s':>8} {'recall@1':>9} {'agree':>6} {'ms/face':>8}")
+    for r in results:
+        agree = f"{r['exact_agreement']:.3f}" if r['exact_agreement'] is not None else '-'
+        print(f"{r['size']:>8} {r['matcher']:>7} {r['nprobe'] or '-':>6} {r['build_s']:>8.2f} "
+              f"{r['recall_at_1']:>9.3f} {agree:>6} {r['ms_per_face']:>8.3f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
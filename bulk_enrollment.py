@@ -0,0 +1,316 @@
+"""
+Bulk employee enrollment for the Criminal Face Detection system.
+
+A job reads a CSV manifest (name, employee_id, image[, description]) plus the
+images it names from a zip archive or a directory, validates every row,
+drops images whose content hash is already enrolled, and encodes the rest
+across a process pool on downscaled copies. Images are hashed as streams and
+read again only when their encode task is submitted, with a bounded number
+in flight, so memory does not grow with the batch. Results are handed back
+in chunks so the caller can commit them in bounded transactions, and
+progress plus per-row errors are kept on the job for a status endpoint.
+"""
+import collections
+import concurrent.futures
+import csv
+import hashlib
+import io
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+import zipfile
+
+import numpy as np
+
+MANIFEST_NAME = 'manifest.csv'
+REQUIRED_COLUMNS = ('name', 'employee_id', 'image')
+IMAGE_EXTENSIONS = {'png', 'jpg', 'jpeg'}
+HASH_BLOCK_BYTES = 1 << 20
+
+
+class ZipSource:
+    """
+    Images and manifest read straight from a zip archive (nothing is extracted).
+    Image paths are relative to the directory holding manifest.csv.
+    :param delete: remove the archive when the job closes it (uploaded archives)
+    """
+
+    def __init__(self, path, delete=False):
+        self.path = path
+        self.delete = delete
+        self._zip = zipfile.ZipFile(path)
+        self._names = {name.replace('\\', '/').lstrip('/'): name for name in self._zip.namelist()}
+        self._prefix = ''
+
+    def manifest(self):
+        candidates = [n for n in self._names if os.path.basename(n) == MANIFEST_NAME]
+        if not candidates:
+            raise ValueError(f'{MANIFEST_NAME} not found in archive')
+        manifest = min(candidates, key=len)
+        self._prefix = os.path.dirname(manifest)
+        return self._zip.read(self._names[manifest]).decode('utf-8-sig')
+
+    def open(self, name):
+        key = '/'.join(p for p in (self._prefix, name.replace('\\', '/').lstrip('/')) if p)
+        if key not in self._names:
+            raise FileNotFoundError(name)
+        return self._zip.open(self._names[key])
+
+    def read(self, name):
+        with self.open(name) as f:
+            return f.read()
+
+    def close(self):
+        self._zip.close()
+        if self.delete and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+class DirectorySource:
+    """Images and manifest read from a server-side directory."""
+
+    def __init__(self, root, manifest_text=None):
+        self.root = os.path.realpath(root)
+        self._manifest_text = manifest_text
+
+    def manifest(self):
+        if self._manifest_text is not None:
+            return self._manifest_text
+        with open(os.path.join(self.root, MANIFEST_NAME), encoding='utf-8-sig') as f:
+            return f.read()
+
+    def open(self, name):
+        path = os.path.realpath(os.path.join(self.root, name))
+        if os.path.commonpath([path, self.root]) != self.root:
+            raise FileNotFoundError(name)
+        return open(path, 'rb')
+
+    def read(self, name):
+        with self.open(name) as f:
+            return f.read()
+
+    def close(self):
+        pass
+
+
+def parse_manifest(text):
+    """Return manifest rows as dicts; raises ValueError when required columns are missing."""
+    reader = csv.DictReader(io.StringIO(text))
+    columns = {(c or '').strip().lower() for c in reader.fieldnames or []}
+    missing = [c for c in REQUIRED_COLUMNS if c not in columns]
+    if missing:
+        raise ValueError(f"Manifest is missing column(s): {', '.join(missing)}")
+    return [{(k or '').strip().lower(): (v or '').strip() for k, v in row.items()} for row in reader]
+
+
+def _init_worker():
+    """Pool initializer: load the dlib models once per worker instead of per task"""
+    import face_recognition  # noqa: F401
+
+
+def encode_image(task):
+    """
+    Process-pool worker: decode, downscale and encode one image.
+    :param task: (row_number, image_bytes, max_side)
+    :return: (row_number, encoding or None, error or None)
+    """
+    import face_recognition
+    from PIL import Image
+
+    row_number, data, max_side = task
+    try:
+        image = Image.open(io.BytesIO(data))
+        image.draft('RGB', (max_side, max_side))  # Let JPEG decode at reduced size directly
+        image = image.convert('RGB')
+        if max_side and max(image.size) > max_side:
+            image.thumbnail((max_side, max_side))
+        pixels = np.asarray(image)
+    except Exception as e:
+        return row_number, None, f'Unreadable image: {e}'
+    locations = face_recognition.face_locations(pixels)
+    if not locations:
+        return row_number, None, 'No face detected in image'
+    if len(locations) > 1:
+        return row_number, None, f'{len(locations)} faces detected in image'
+    return row_number, face_recognition.face_encodings(pixels, locations)[0].astype(np.float32), None
+
+
+class BulkEnrollmentJob:
+    """
+    :param source: ZipSource or DirectorySource
+    :param existing_ids: callable(set of employee_id) -> the ones already enrolled
+    :param existing_hashes: callable(set of sha256 hex) -> the ones already enrolled
+    :param commit_chunk: callable(list of row dicts with encoding/data/sha256) -> {row_number: error}
+                         for rows that could not be stored
+    :param processes: size of the encoding process pool
+    :param chunk_rows: rows per commit
+    :param max_image_side: images are downscaled to this longest side before encoding
+    :param encode: picklable worker run in the pool, see encode_image
+    :param max_in_flight: images read into memory and queued to the pool at once (default 4 per process)
+    """
+
+    def __init__(self, source, existing_ids, existing_hashes, commit_chunk, processes=None, chunk_rows=200,
+                 max_image_side=1024, encode=encode_image, max_in_flight=None):
+        self.id = uuid.uuid4().hex
+        self.source = source
+        self.existing_ids = existing_ids
+        self.existing_hashes = existing_hashes
+        self.commit_chunk = commit_chunk
+        self.processes = processes or os.cpu_count() or 1
+        self.chunk_rows = max(1, int(chunk_rows))
+        self.max_image_side = max_image_side
+        self.encode = encode
+        self.max_in_flight = max_in_flight or self.processes * 4
+        self._lock = threading.Lock()
+        self.state = 'queued'
+        self.message = None
+        self.total = 0
+        self.processed = 0
+        self.enrolled = 0
+        self.errors = []
+        self.created_at = time.time()
+        self.finished_at = None
+
+    def start(self):
+        threading.Thread(target=self.run, name=f'bulk-enroll-{self.id[:8]}', daemon=True).start()
+        return self
+
+    def _fail_row(self, row, error):
+        with self._lock:
+            self.errors.append({'row': row['_row'], 'employee_id': row.get('employee_id'), 'error': error})
+            self.processed += 1
+
+    def run(self):
+        self.state = 'running'
+        try:
+            rows = self._validate(parse_manifest(self.source.manifest()))
+            rows = self._hash_images(rows)
+            self._encode_and_commit(rows)
+            self.state = 'completed'
+        except Exception as e:
+            self.state = 'failed'
+            self.message = str(e)
+            print(f"Bulk enrollment {self.id} failed: {e}")
+        finally:
+            self.source.close()
+            self.finished_at = time.time()
+
+    def _validate(self, rows):
+        for number, row in enumerate(rows, start=2):  # Row 1 is the CSV header
+            row['_row'] = number
+        self.total = len(rows)
+        valid, seen_ids = [], set()
+        for row in rows:
+            image = row.get('image', '')
+            if not row.get('name') or not row.get('employee_id') or not image:
+                self._fail_row(row, 'Missing name, employee_id or image')
+            elif image.rsplit('.', 1)[-1].lower() not in IMAGE_EXTENSIONS:
+                self._fail_row(row, 'Unsupported image type')
+            elif row['employee_id'] in seen_ids:
+                self._fail_row(row, 'Duplicate employee_id in manifest')
+            else:
+                seen_ids.add(row['employee_id'])
+                valid.append(row)
+        enrolled = self.existing_ids(seen_ids) if seen_ids else set()
+        remaining = []
+        for row in valid:
+            if row['employee_id'] in enrolled:
+                self._fail_row(row, 'employee_id already enrolled')
+            else:
+                remaining.append(row)
+        return remaining
+
+    def _hash_images(self, rows):
+        loaded, seen_hashes = [], {}
+        for row in rows:
+            try:
+                digest = hashlib.sha256()
+                with self.source.open(row['image']) as f:
+                    for block in iter(lambda: f.read(HASH_BLOCK_BYTES), b''):
+                        digest.update(block)
+            except (OSError, KeyError):
+                self._fail_row(row, f"Image {row['image']} not found")
+                continue
+            row['sha256'] = digest.hexdigest()
+            if row['sha256'] in seen_hashes:
+                self._fail_row(row, f"Same image as row {seen_hashes[row['sha256']]}")
+                continue
+            seen_hashes[row['sha256']] = row['_row']
+            loaded.append(row)
+        enrolled = self.existing_hashes(set(seen_hashes)) if seen_hashes else set()
+        remaining = []
+        for row in loaded:
+            if row['sha256'] in enrolled:
+                self._fail_row(row, 'Image already enrolled')
+            else:
+                remaining.append(row)
+        return remaining
+
+    def _encode_and_commit(self, rows):
+        rows = iter(rows)
+        in_flight = collections.deque()
+        pending = []
+        # Never fork the threaded web process: a forked child can inherit locks held by other threads
+        context = multiprocessing.get_context(
+            'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+        with concurrent.futures.ProcessPoolExecutor(self.processes, mp_context=context,
+                                                    initializer=_init_worker) as pool:
+            while True:
+                while len(in_flight) < self.max_in_flight and self._submit_next(pool, rows, in_flight):
+                    pass
+                if not in_flight:
+                    break
+                row, future = in_flight.popleft()
+                _, encoding, error = future.result()
+                if error is not None:
+                    row.pop('data', None)
+                    self._fail_row(row, error)
+                    continue
+                row['encoding'] = encoding
+                pending.append(row)
+                if len(pending) >= self.chunk_rows:
+                    self._commit(pending)
+                    pending = []
+        if pending:
+            self._commit(pending)
+
+    def _submit_next(self, pool, rows, in_flight):
+        """Read the next image and queue its encode task; False once rows are exhausted"""
+        for row in rows:
+            try:
+                row['data'] = self.source.read(row['image'])
+            except (OSError, KeyError):
+                self._fail_row(row, f"Image {row['image']} not found")
+                continue
+            in_flight.append((row, pool.submit(self.encode, (row['_row'], row['data'], self.max_image_side))))
+            return True
+        return False
+
+    def _commit(self, rows):
+        failures = self.commit_chunk(rows)
+        for row in rows:
+            row.pop('data', None)
+            error = failures.get(row['_row'])
+            if error is not None:
+                self._fail_row(row, error)
+            else:
+                with self._lock:
+                    self.enrolled += 1
+                    self.processed += 1
+
+    def status(self):
+        with self._lock:
+            return {
+                'job_id': self.id,
+                'state': self.state,
+                'message': self.message,
+                'total': self.total,
+                'processed': self.processed,
+                'enrolled': self.enrolled,
+                'failed': len(self.errors),
+                'errors': list(self.errors),
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
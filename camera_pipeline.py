@@ -0,0 +1,257 @@
+"""
+Staged capture / recognize / encode pipeline for one camera stream.
+
+Each stage runs on its own thread and the stages are joined by bounded
+queues, so a slow detection pass never stalls capture: for live sources the
+capture stage only keeps the newest frame and counts the ones it replaces.
+Every frame carries a FrameTimings of the time it spent in and between the
+stages, for the slow frame log.
+"""
+import queue
+import threading
+import time
+import weakref
+
+_EOF = object()
+
+# Started pipelines of this process, looked up by name for profiling
+_running = weakref.WeakSet()
+_running_lock = threading.Lock()
+
+
+def running_pipelines():
+    with _running_lock:
+        return list(_running)
+
+
+class FrameTimings:
+    """Seconds one frame spent in camera.read(), waiting for and in recognize, and waiting for and in encode."""
+
+    __slots__ = ('captured_at', 'read', 'recognize_wait', 'recognize', 'encode_wait', 'encode', 'stage_end',
+                 'reported')
+
+    def __init__(self, captured_at, read):
+        self.captured_at = captured_at
+        self.read = read
+        self.recognize_wait = self.recognize = self.encode_wait = self.encode = 0.0
+        self.stage_end = captured_at + read
+        self.reported = False
+
+    def as_ms(self, total):
+        """Breakdown in milliseconds; 'deliver' is whatever of total came after the encode stage"""
+        stages = {name: getattr(self, name) for name in ('read', 'recognize_wait', 'recognize', 'encode_wait', 'encode')}
+        stages['deliver'] = max(0.0, total - (self.stage_end - self.captured_at))
+        return {name: round(seconds * 1000.0, 2) for name, seconds in stages.items()}
+
+
+class StageStats:
+    """Frames in / processed / dropped counters for one pipeline stage."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.frames_in = 0
+        self.processed = 0
+        self.dropped = 0
+
+    def add(self, frames_in=0, processed=0, dropped=0):
+        with self._lock:
+            self.frames_in += frames_in
+            self.processed += processed
+            self.dropped += dropped
+
+    def as_dict(self):
+        with self._lock:
+            return {'in': self.frames_in, 'processed': self.processed, 'dropped': self.dropped}
+
+
+def put_drop_oldest(q, item):
+    """Put into a bounded queue, evicting the oldest item when full. Returns the number dropped."""
+    dropped = 0
+    while True:
+        try:
+            q.put_nowait(item)
+            return dropped
+        except queue.Full:
+            try:
+                q.get_nowait()
+                dropped += 1
+            except queue.Empty:
+                pass
+
+
+class CameraPipeline:
+    """
+    Runs capture -> recognize -> annotate/encode on three threads.
+
+    :param camera: opened cv2.VideoCapture-like object (read()/release())
+    :param recognize: callable(frame) -> results, run on the recognition thread
+    :param encode: callable(frame, results) -> bytes, run on the encode thread
+    :param live: drop stale frames (cameras) instead of applying backpressure
+                 (uploaded videos, where every frame should be analysed)
+    :param queue_size: bound of each inter-stage queue
+    :param context: optional callable returning a context manager entered for
+                    the lifetime of each stage thread (e.g. app.app_context)
+    :param extra_stats: optional callable returning a dict reported under
+                        'recognition' next to the stage counters
+    :param observe: optional callable(stage, seconds) called with the time spent
+                    per frame in camera.read() and in the recognize and encode work
+    :param timed_encode: call encode(frame, results, timings) with the frame's
+                         FrameTimings, e.g. to attach them to the encoded frame
+    """
+
+    def __init__(self, camera, recognize, encode, live=True, queue_size=2, context=None, name='camera',
+                 extra_stats=None, observe=None, timed_encode=False):
+        self.camera = camera
+        self.recognize = recognize
+        self.encode = encode
+        self.live = live
+        self.context = context
+        self.name = name
+        self.extra_stats = extra_stats
+        self.observe = observe
+        self.timed_encode = timed_encode
+        # Set by profiling.capture_profile(): an object whose call(func, *args) profiles the stage work
+        self.profiler = None
+        self.capture_q = queue.Queue(maxsize=1 if live else queue_size)
+        self.recognized_q = queue.Queue(maxsize=queue_size)
+        self.output_q = queue.Queue(maxsize=queue_size)
+        self.stats = {stage: StageStats() for stage in ('capture', 'recognize', 'encode')}
+        self.error = None
+        self._stop = threading.Event()
+        self._threads = []
+
+    def start(self):
+        for stage, target, args in (
+            ('capture', self._capture_loop, ()),
+            ('recognize', self._stage_loop, ('recognize', self.capture_q, self.recognized_q, self._recognize)),
+            ('encode', self._stage_loop, ('encode', self.recognized_q, self.output_q, self._encode)),
+        ):
+            thread = threading.Thread(target=self._run, args=(target, args), name=f'{self.name}-{stage}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        with _running_lock:
+            _running.add(self)
+        return self
+
+    def stop(self):
+        with _running_lock:
+            _running.discard(self)
+        self._stop.set()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout=2)
+        self.camera.release()
+
+    @property
+    def stopped(self):
+        return self._stop.is_set()
+
+    def snapshot_stats(self):
+        result = {stage: stats.as_dict() for stage, stats in self.stats.items()}
+        if self.extra_stats is not None:
+            result['recognition'] = self.extra_stats()
+        return result
+
+    def frames(self, timeout=0.5):
+        """Yield encoded frames until the source ends, the pipeline stops or a stage fails."""
+        while not self._stop.is_set():
+            try:
+                item = self.output_q.get(timeout=timeout)
+            except queue.Empty:
+                continue
+            if item is _EOF:
+                break
+            yield item
+        if self.error is not None:
+            raise self.error
+
+    def _run(self, target, args):
+        try:
+            if self.context is not None:
+                with self.context():
+                    target(*args)
+            else:
+                target(*args)
+        except Exception as e:
+            self.error = e
+            self._stop.set()
+
+    def _put(self, stage, q, item):
+        if self.live:
+            dropped = put_drop_oldest(q, item)
+            if dropped:
+                self.stats[stage].add(dropped=dropped)
+            return
+        while not self._stop.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+
+    def _capture_loop(self):
+        stats = self.stats['capture']
+        observe = self.observe
+        while not self._stop.is_set():
+            profiler = self.profiler
+            started = time.perf_counter()
+            success, frame = self.camera.read() if profiler is None else profiler.call(self.camera.read)
+            if not success or frame is None:
+                break
+            read = time.perf_counter() - started
+            if observe is not None:
+                observe('capture', read)
+            stats.add(frames_in=1, processed=1)
+            self._put('capture', self.capture_q, (frame, FrameTimings(started, read)))
+        self._put_eof(self.capture_q)
+
+    def _stage_loop(self, stage, in_q, out_q, work):
+        stats = self.stats[stage]
+        observe = self.observe
+        while not self._stop.is_set():
+            try:
+                item = in_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if item is _EOF:
+                break
+            stats.add(frames_in=1)
+            profiler = self.profiler
+            started = time.perf_counter()
+            result = work(item) if profiler is None else profiler.call(work, item)
+            if observe is not None:
+                observe(stage, time.perf_counter() - started)
+            stats.add(processed=1)
+            self._put(stage, out_q, result)
+        self._put_eof(out_q)
+
+    def _put_eof(self, q):
+        # End-of-stream must never be dropped, so block for room
+        while not self._stop.is_set():
+            try:
+                q.put(_EOF, timeout=0.5)
+                return
+            except queue.Full:
+                if self.live:
+                    try:
+                        q.get_nowait()
+                    except queue.Empty:
+                        pass
+
+    def _recognize(self, item):
+        frame, timings = item
+        started = time.perf_counter()
+        timings.recognize_wait = started - timings.stage_end
+        results = self.recognize(frame)
+        timings.stage_end = time.perf_counter()
+        timings.recognize = timings.stage_end - started
+        return frame, results, timings
+
+    def _encode(self, item):
+        frame, results, timings = item
+        started = time.perf_counter()
+        timings.encode_wait = started - timings.stage_end
+        result = self.encode(frame, results, timings) if self.timed_encode else self.encode(frame, results)
+        timings.stage_end = time.perf_counter()
+        timings.encode = timings.stage_end - started
+        return result
@@ -0,0 +1,167 @@
+"""
+Shared camera sessions for the Criminal Face Detection system.
+
+One session per CameraFeed opens the source and runs recognition once, then
+broadcasts the encoded frames to every viewer. Sessions are ref-counted and
+torn down when the last viewer leaves.
+"""
+import threading
+
+
+class SourceUnavailable(Exception):
+    """Raised by a session factory when the camera or video cannot be opened."""
+
+
+class FrameBroadcaster:
+    """Latest-frame fan-out: each subscriber always gets the newest frame, never a backlog."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+        self._seq = 0
+        self.closed = False
+        self.error = None
+
+    @property
+    def seq(self):
+        return self._seq
+
+    def publish(self, frame):
+        with self._cond:
+            self._frame = frame
+            self._seq += 1
+            self._cond.notify_all()
+
+    def close(self, error=None):
+        with self._cond:
+            self.closed = True
+            self.error = error
+            self._cond.notify_all()
+
+    def wait_next(self, last_seq, timeout=1.0):
+        """Return (frame, seq) newer than last_seq, or (None, last_seq) on timeout/close."""
+        with self._cond:
+            if self._seq == last_seq and not self.closed:
+                self._cond.wait(timeout)
+            if self._seq != last_seq:
+                return self._frame, self._seq
+            return None, last_seq
+
+
+class CameraSession:
+    """A single running pipeline shared by all viewers of one source."""
+
+    def __init__(self, key, factory):
+        self.key = key
+        self.factory = factory
+        self.viewers = 0
+        self.pipeline = None
+        self.broadcaster = FrameBroadcaster()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._pump = None
+
+    def ensure_started(self):
+        """Start the pipeline on first use; concurrent viewers wait for the same start."""
+        with self._start_lock:
+            if self._started:
+                if self.broadcaster.closed and self.broadcaster.error is not None:
+                    raise self.broadcaster.error
+                return
+            self._started = True
+            try:
+                self.pipeline = self.factory()
+            except Exception as e:
+                self.broadcaster.close(e)
+                raise
+            pump = threading.Thread(target=self._pump_frames, name=f'session-{self.key}', daemon=True)
+            pump.start()
+            # Only publish a started thread, so a concurrent stop() never joins an unstarted one
+            self._pump = pump
+
+    def _pump_frames(self):
+        try:
+            for frame in self.pipeline.frames():
+                self.broadcaster.publish(frame)
+            self.broadcaster.close()
+        except Exception as e:
+            self.broadcaster.close(e)
+
+    def frames(self, timeout=1.0):
+        """Yield the newest frame each time one is published, until the source ends."""
+        seq = 0
+        while True:
+            frame, seq = self.broadcaster.wait_next(seq, timeout)
+            if frame is not None:
+                yield frame
+            elif self.broadcaster.closed:
+                break
+        if self.broadcaster.error is not None:
+            raise self.broadcaster.error
+
+    def stop(self):
+        if self.pipeline is not None:
+            self.pipeline.stop()
+        self.broadcaster.close()
+        if self._pump is not None and self._pump is not threading.current_thread():
+            self._pump.join(timeout=2)
+
+    def stats(self):
+        return {
+            'key': self.key,
+            'viewers': self.viewers,
+            'stages': self.pipeline.snapshot_stats() if self.pipeline is not None else None
+        }
+
+
+class CameraSessionRegistry:
+    """Ref-counted sessions keyed by CameraFeed.id (or any hashable source key)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def acquire(self, key, factory):
+        """
+        Join the session for key, creating and starting it if needed.
+        A key of None gives the caller a private, unregistered session.
+        """
+        with self._lock:
+            session = self._sessions.get(key) if key is not None else None
+            if session is None or session.broadcaster.closed:
+                session = CameraSession(key, factory)
+                if key is not None:
+                    self._sessions[key] = session
+            session.viewers += 1
+        try:
+            session.ensure_started()
+        except Exception:
+            self.release(session)
+            raise
+        return session
+
+    def release(self, session):
+        """Leave a session; the last viewer out stops the pipeline."""
+        with self._lock:
+            session.viewers -= 1
+            if session.viewers > 0:
+                return
+            if self._sessions.get(session.key) is session:
+                del self._sessions[session.key]
+        session.stop()
+
+    def terminate(self, key):
+        """Stop a session regardless of viewers, e.g. after its camera was edited or deleted."""
+        with self._lock:
+            session = self._sessions.pop(key, None)
+        if session is not None:
+            session.stop()
+
+    def get(self, key):
+        with self._lock:
+            return self._sessions.get(key)
+
+    def stats(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return [session.stats() for session in sessions]
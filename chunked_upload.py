@@ -0,0 +1,188 @@
+"""
+Resumable chunked uploads for the Criminal Face Detection system.
+
+Large videos are sent as init / PUT chunk at an offset / finalize instead of
+one multipart request. Chunks are copied from the request stream straight
+into a part file, so memory use does not grow with the file, and the part
+file's size on disk is the resume offset: a client that lost its connection
+asks for the offset and continues from there. Every chunk carries its
+SHA-256, checked while it is copied; a chunk that does not match or arrives
+short is cut off again, so the part file only ever holds verified bytes.
+Upload metadata is kept in a JSON file next to the part, so any server
+process can continue or finalize an upload. The guard against concurrent
+writes to one upload and the per-client limit are only enforced per process.
+"""
+import hashlib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+
+COPY_BLOCK = 1 << 20
+
+
+class UploadError(Exception):
+    """Raised for a rejected upload request; status is the HTTP status to answer with."""
+
+    def __init__(self, message, status=400, offset=None):
+        super().__init__(message)
+        self.status = status
+        self.offset = offset
+
+
+class ChunkedUploads:
+    """
+    :param folder: directory for part files and their metadata
+    :param max_bytes: largest accepted file
+    :param max_active_per_client: unfinished uploads one client may hold at a time
+    :param expire_seconds: unfinished uploads idle this long are deleted
+    """
+
+    def __init__(self, folder, max_bytes, max_active_per_client=2, expire_seconds=86400):
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_active_per_client = max_active_per_client
+        self.expire_seconds = expire_seconds
+        self._lock = threading.Lock()
+        self._writing = set()
+
+    def _paths(self, upload_id):
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadError('Unknown upload', 404)
+        return os.path.join(self.folder, f'{upload_id}.part'), os.path.join(self.folder, f'{upload_id}.json')
+
+    def _load(self, upload_id):
+        part_path, meta_path = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            raise UploadError('Unknown upload', 404)
+        meta['offset'] = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        return meta
+
+    def _uploads(self):
+        try:
+            names = os.listdir(self.folder)
+        except FileNotFoundError:
+            return []
+        uploads = []
+        for name in names:
+            if name.endswith('.json'):
+                try:
+                    uploads.append(self._load(name[:-5]))
+                except UploadError:
+                    pass
+        return uploads
+
+    def expire(self, now=None):
+        """Delete unfinished uploads nobody has written to for expire_seconds"""
+        now = time.time() if now is None else now
+        for meta in self._uploads():
+            part_path, _ = self._paths(meta['id'])
+            touched = os.path.getmtime(part_path) if os.path.exists(part_path) else meta['created_at']
+            if now - touched > self.expire_seconds:
+                self.abort(meta['id'])
+
+    def init(self, client, filename, size, sha256=None):
+        """Register a new upload; returns its metadata (id, filename, size, offset)"""
+        if size <= 0:
+            raise UploadError('size must be positive')
+        if size > self.max_bytes:
+            raise UploadError(f'File is larger than the {self.max_bytes} byte limit', 413)
+        self.expire()
+        os.makedirs(self.folder, exist_ok=True)
+        with self._lock:
+            active = sum(1 for meta in self._uploads() if meta['client'] == client)
+            if active >= self.max_active_per_client:
+                raise UploadError(f'At most {self.max_active_per_client} unfinished uploads per client', 429)
+            meta = {
+                'id': uuid.uuid4().hex,
+                'client': client,
+                'filename': filename,
+                'size': size,
+                'sha256': sha256.lower() if sha256 else None,
+                'created_at': time.time()
+            }
+            part_path, meta_path = self._paths(meta['id'])
+            open(part_path, 'wb').close()
+            with open(meta_path, 'w') as f:
+                json.dump(meta, f)
+        meta['offset'] = 0
+        return meta
+
+    def status(self, upload_id):
+        return self._load(upload_id)
+
+    def write(self, upload_id, offset, stream, length, sha256):
+        """
+        Copy `length` bytes from stream into the upload at offset and return the new offset.
+        Offsets below the current one rewrite from there (a resent chunk); offsets past it are
+        rejected with the current offset so the client can resume.
+        :param sha256: hex digest of the chunk; a mismatch or short chunk is discarded
+        """
+        meta = self._load(upload_id)
+        if offset > meta['offset']:
+            raise UploadError(f"Expected offset {meta['offset']}", 409, meta['offset'])
+        if length is None:
+            raise UploadError('Content-Length is required', 411)
+        if not sha256:
+            raise UploadError('The chunk sha256 (X-Chunk-SHA256 header) is required')
+        if offset + length > meta['size']:
+            raise UploadError('Chunk runs past the declared size', 413)
+        with self._lock:
+            if upload_id in self._writing:
+                raise UploadError('A chunk for this upload is already being written', 409, meta['offset'])
+            self._writing.add(upload_id)
+        part_path, _ = self._paths(upload_id)
+        try:
+            with open(part_path, 'r+b') as f:
+                f.seek(offset)
+                f.truncate()
+                digest = hashlib.sha256()
+                remaining = length
+                while remaining:
+                    block = stream.read(min(COPY_BLOCK, remaining))
+                    if not block:
+                        break
+                    f.write(block)
+                    digest.update(block)
+                    remaining -= len(block)
+                if remaining or digest.hexdigest() != sha256.lower():
+                    f.truncate(offset)
+                    raise UploadError('Chunk incomplete' if remaining else 'Chunk checksum mismatch, resend it',
+                                      400 if remaining else 422, offset)
+                return f.tell()
+        finally:
+            with self._lock:
+                self._writing.discard(upload_id)
+
+    def finalize(self, upload_id, destination, sha256=None):
+        """
+        Verify the finished upload and move it to destination. Chunks were verified as they
+        arrived; a whole-file sha256, if given here or at init, is checked as well, and a
+        mismatch discards the upload since the data on disk is not what was sent.
+        """
+        meta = self._load(upload_id)
+        if meta['offset'] != meta['size']:
+            raise UploadError(f"Upload incomplete: {meta['offset']} of {meta['size']} bytes", 409, meta['offset'])
+        expected = (sha256 or meta['sha256'] or '').lower()
+        part_path, meta_path = self._paths(upload_id)
+        if expected:
+            digest = hashlib.sha256()
+            with open(part_path, 'rb') as f:
+                for block in iter(lambda: f.read(COPY_BLOCK), b''):
+                    digest.update(block)
+            if digest.hexdigest() != expected:
+                self.abort(upload_id)
+                raise UploadError('Checksum mismatch, upload discarded', 422)
+        shutil.move(part_path, destination)
+        os.remove(meta_path)
+        return meta
+
+    def abort(self, upload_id):
+        for path in self._paths(upload_id):
+            if os.path.exists(path):
+                os.remove(path)
@@ -9,10 +9,75 @@ class Config:
     
     # Face recognition settings
     FACE_RECOGNITION_TOLERANCE = 0.5
+    GALLERY_SYNC_INTERVAL_SECONDS = 2  # How often streams pull gallery changes from other processes
+    FACE_MATCHER = 'exact'  # 'exact' brute force, or 'ivf' approximate index for very large galleries
+    FACE_MATCHER_IVF_NLIST = 0  # Number of k-means partitions, 0 = 4 * sqrt(N)
+    FACE_MATCHER_IVF_NPROBE = 8  # Partitions scanned per face
+    FACE_MATCHER_INDEX_PATH = os.path.join('instance', 'face_index.npz')
+    GALLERY_SNAPSHOT_PATH = os.path.join('instance', 'gallery_snapshot.bin')  # Memory-mapped by every process; empty disables
+    GALLERY_SNAPSHOT_REFRESH_CHANGES = 100  # Rewrite the snapshot once it is this many gallery changes behind
+
+    # Per-camera defaults (each can be overridden on the CameraFeed)
+    RECOGNIZE_EVERY_N_FRAMES = 5  # Full detection + encoding every N frames, tracking in between
+    RECOGNIZE_INTERVAL_MS = 0  # If > 0, recognize every T milliseconds instead of every N frames
+    DETECTION_SCALE = 1.0  # Detect faces on a frame resized by this factor (e.g. 0.5 is ~4x cheaper but misses small faces)
+    DETECTION_MODEL = 'hog'  # 'hog' (CPU) or 'cnn' (accurate, needs a GPU build of dlib)
+    DETECTION_UPSAMPLE = 1  # number_of_times_to_upsample passed to face_locations
+    MOTION_GATE_ENABLED = True  # Skip detection entirely on frames where nothing moved
+    MOTION_GATE_RESTRICT_REGION = False  # Detect only inside the motion box (stationary faces elsewhere are dropped)
+    MOTION_GATE_THRESHOLD = 0.002  # Fraction of thumbnail pixels that must change
+    MOTION_GATE_MAX_SKIP_SECONDS = 5  # Run detection at least this often even on a static scene
     
     # Camera settings
     MAX_CAMERA_RETRIES = 4
     CAMERA_TIMEOUT = 10
+    PIPELINE_QUEUE_SIZE = 2  # Bound of each queue between capture, recognition and encoding stages
+    MJPEG_QUALITY = 80  # JPEG quality of /live_detection when the viewer passes no ?quality=
+    MJPEG_MAX_WIDTH = 0  # Default ?max_width= for /live_detection, 0 = native resolution
+    MJPEG_MAX_FPS = 0  # Default ?fps= cap for /live_detection, 0 = every processed frame
+    ATTENDANCE_RELOG_SECONDS = 0  # 0 logs each employee once per day; set > 0 to log them again after this many seconds
+    ATTENDANCE_DEDUP_PER_CAMERA = False  # Dedup per (employee, camera) instead of per employee
+    ATTENDANCE_FLUSH_ROWS = 100  # Attendance rows inserted per write-behind batch
+    ATTENDANCE_FLUSH_INTERVAL_MS = 500  # Longest a detected attendance row waits before it is written
+    ATTENDANCE_QUEUE_SIZE = 10000  # Unwritten rows held in memory before new ones are dropped
+    EVENT_BUFFER_SIZE = 1000  # Events kept for Server-Sent Events Last-Event-ID resume
+    SUPPRESSED_EVENT_INTERVAL_SECONDS = 10  # Publish a cooldown-suppressed sighting at most this often per employee and camera
+    ENCODING_BATCH_MAX_SIZE = 16  # Faces encoded per shared dlib call across cameras (<= 1 disables batching)
+    ENCODING_BATCH_MAX_WAIT_MS = 5  # Longest a face waits for others to fill its batch
+    BULK_ENROLL_PROCESSES = 0  # Encoding processes per bulk enrollment job, 0 = one per CPU
+    BULK_ENROLL_CHUNK_ROWS = 200  # Employees committed per transaction during bulk enrollment
+    BULK_ENROLL_MAX_IMAGE_SIDE = 1024  # Bulk images are downscaled to this longest side before encoding
+    BULK_ENROLL_ROOT = os.environ.get('BULK_ENROLL_ROOT', '')  # Server-side directory bulk enrollment may read; empty disables paths
+    BULK_ENROLL_UPLOAD_FOLDER = os.path.join('instance', 'bulk_uploads')  # Uploaded archives, removed when their job ends
+    UPLOAD_CHUNK_FOLDER = os.path.join('instance', 'chunked_uploads')  # Unfinished chunked video uploads
+    JOB_STATUS_FOLDER = os.path.join('instance', 'job_status')  # Bulk enrollment / video analysis job status shared by all workers
+    JOB_STATUS_INTERVAL_SECONDS = 1  # How often a worker copies the status of its running jobs to JOB_STATUS_FOLDER
+    UPLOAD_CHUNK_SIZE = 8 << 20  # Chunk size suggested to clients, in bytes
+    UPLOAD_MAX_BYTES = 20 << 30  # Largest video accepted by the chunked upload
+    UPLOAD_MAX_ACTIVE_PER_CLIENT = 2  # Unfinished chunked uploads one client address may hold
+    UPLOAD_EXPIRE_SECONDS = 86400  # Unfinished uploads idle this long are deleted
+    VIDEO_ANALYSIS_PROCESSES = 0  # Worker processes per offline video analysis job, 0 = one per CPU
+    VIDEO_ANALYSIS_SAMPLE_FPS = 2  # Frames analyzed per second of footage
+    VIDEO_ANALYSIS_SEGMENT_SECONDS = 30  # Longest stretch of footage one worker analyzes at a time
+    THUMBNAIL_FOLDER = os.path.join('static', 'thumbnails')  # Content-hashed employee photo thumbnails
+    THUMBNAIL_SIZES = (96, 160, 320)  # Longest side in pixels, written at enrollment and on photo edits
+    THUMBNAIL_DEFAULT_SIZE = 160  # Size behind thumbnail_url in the JSON APIs (dashboards show 48-80 px)
+    THUMBNAIL_FORMAT = 'webp'  # 'webp' or 'jpg'; falls back to JPEG when Pillow lacks WebP
+    THUMBNAIL_QUALITY = 80
+    THUMBNAIL_MAX_AGE_SECONDS = 31536000  # Cache lifetime of thumbnails, whose URLs change with the photo
+
+    # Background recognition service (runs without any browser viewing the cameras)
+    RECOGNITION_SERVICE_ENABLED = os.environ.get('RECOGNITION_SERVICE_ENABLED', '').lower() == 'true'
+    RECOGNITION_WORKER_PROCESSES = int(os.environ.get('RECOGNITION_WORKER_PROCESSES', os.cpu_count() or 1))  # 0 = threads in the web process
+    RECOGNITION_RESTART_DELAY_SECONDS = 5
+    RECOGNITION_RECONCILE_SECONDS = 10  # Re-read camera feeds to pick up edits made by other processes
+
+    # Profiling and slow frame log
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', '').lower() == 'true'  # POST /admin/profile is refused otherwise
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')  # When set, required as the X-Profiling-Token header
+    PROFILING_MAX_SECONDS = 60
+    SLOW_FRAME_BUDGET_MS = 500  # Frames taking longer from capture to a viewer are logged; 0 disables
+    SLOW_FRAME_LOG_SIZE = 200  # Most recent slow frames kept for GET /slow_frames
 
 class DevelopmentConfig(Config):
     """Development configuration"""
@@ -0,0 +1,151 @@
+"""
+Batched face encoding for the Criminal Face Detection system.
+
+Every camera pipeline in a process hands its detected face locations to one
+shared BatchEncoder instead of calling face_recognition.face_encodings on its
+own. The encoder collects requests for up to max_wait_ms (or until max_batch
+faces are queued), encodes them with a single dlib call and routes each
+camera's encodings back to it.
+"""
+import queue
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+
+def encode_faces_batch(images, locations_list):
+    """
+    Encode the faces of several RGB images at once.
+    :param images: list of RGB frames
+    :param locations_list: per image, list of (top, right, bottom, left) boxes
+    :return: per image, list of 128-d encodings (same order as the boxes)
+    """
+    import dlib
+    from face_recognition import api
+
+    batch_images, batch_shapes = [], []
+    for image, locations in zip(images, locations_list):
+        if not locations:
+            continue
+        shapes = dlib.full_object_detections()
+        for landmarks in api._raw_face_landmarks(image, locations, model='small'):
+            shapes.append(landmarks)
+        batch_images.append(image)
+        batch_shapes.append(shapes)
+    descriptors = iter(api.face_encoder.compute_face_descriptor(batch_images, batch_shapes, 1) if batch_images else [])
+    return [[np.array(d) for d in next(descriptors)] if locations else [] for locations in locations_list]
+
+
+class _EncodeRequest:
+    def __init__(self, image, locations):
+        self.image = image
+        self.locations = locations
+        self.result = None
+        self.error = None
+        self.submitted = time.monotonic()
+        self.done = threading.Event()
+
+
+class BatchEncoder:
+    """
+    Shared encoding thread that batches face encodings across cameras.
+
+    :param encode_batch: callable(images, locations_list) -> encodings per image
+    :param max_batch: flush once this many faces are queued
+    :param max_wait_ms: flush at most this long after the first queued request
+    """
+
+    def __init__(self, encode_batch=encode_faces_batch, max_batch=16, max_wait_ms=5):
+        self.encode_batch = encode_batch
+        self.max_batch = max(1, int(max_batch))
+        self.max_wait = max(0, max_wait_ms) / 1000.0
+        self._q = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+        self._latencies = deque(maxlen=200)
+        self.batches = 0
+        self.requests = 0
+        self.faces = 0
+        self.encode_seconds = 0.0
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name='batch-encoder', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+
+    def encode(self, image, locations, timeout=10.0):
+        """Encode the faces at locations in one RGB image, waiting for the batch it lands in."""
+        if not locations:
+            return []
+        request = _EncodeRequest(image, list(locations))
+        self._q.put(request)
+        if not request.done.wait(timeout):
+            raise TimeoutError('Face encoding timed out')
+        if request.error is not None:
+            raise request.error
+        return request.result
+
+    def _collect(self):
+        try:
+            first = self._q.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch, faces = [first], len(first.locations)
+        deadline = first.submitted + self.max_wait
+        while faces < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                request = self._q.get(timeout=remaining) if remaining > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            batch.append(request)
+            faces += len(request.locations)
+        return batch
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+            started = time.monotonic()
+            try:
+                results = self.encode_batch([r.image for r in batch], [r.locations for r in batch])
+                for request, result in zip(batch, results):
+                    request.result = result
+            except Exception as e:
+                for request in batch:
+                    request.error = e
+            finished = time.monotonic()
+            with self._lock:
+                self.batches += 1
+                self.requests += len(batch)
+                self.faces += sum(len(r.locations) for r in batch)
+                self.encode_seconds += finished - started
+                self._latencies.extend(finished - r.submitted for r in batch)
+            for request in batch:
+                request.done.set()
+
+    def stats(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            p95 = latencies[int(len(latencies) * 0.95) - 1] if latencies else 0.0
+            return {
+                'max_batch': self.max_batch,
+                'max_wait_ms': round(self.max_wait * 1000.0, 1),
+                'batches': self.batches,
+                'requests': self.requests,
+                'faces': self.faces,
+                'avg_batch_faces': round(self.faces / self.batches, 2) if self.batches else 0.0,
+                'faces_per_second': round(self.faces / self.encode_seconds, 1) if self.encode_seconds else 0.0,
+                'avg_encode_ms': round(self.encode_seconds * 1000.0 / self.batches, 2) if self.batches else 0.0,
+                'p95_latency_ms': round(p95 * 1000.0, 2),
+                'queued': self._q.qsize()
+            }
@@ -0,0 +1,99 @@
+"""
+Compact face-encoding storage for the Criminal Face Detection system.
+
+Encodings are stored as a one-byte format version followed by 128
+little-endian float32 values (513 bytes) instead of a pickled float64 array.
+The whole gallery can also be written to a snapshot file holding one
+contiguous N x 128 float32 matrix plus an id table; worker processes open it
+with numpy.memmap so they all share the same physical pages.
+"""
+import json
+import os
+import struct
+
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+ENCODING_DIM = 128
+ENCODING_FORMAT_VERSION = 1
+ENCODING_DTYPE = np.dtype('<f4')
+ENCODING_BYTES = 1 + ENCODING_DIM * ENCODING_DTYPE.itemsize
+
+SNAPSHOT_MAGIC = b'FCGSNAP1'
+SNAPSHOT_ALIGN = 64
+
+
+def pack_encoding(encoding):
+    """Serialize one encoding as version byte + little-endian float32 values."""
+    vector = np.asarray(encoding, dtype=ENCODING_DTYPE).reshape(ENCODING_DIM)
+    return bytes([ENCODING_FORMAT_VERSION]) + vector.tobytes()
+
+
+def unpack_encoding(blob):
+    """Decode a stored encoding (read-only float32 view of the bytes)."""
+    if blob is None:
+        return None
+    blob = bytes(blob)
+    if len(blob) == ENCODING_BYTES and blob[0] == ENCODING_FORMAT_VERSION:
+        return np.frombuffer(blob, dtype=ENCODING_DTYPE, offset=1)
+    raise ValueError(f'Unknown face encoding format (version byte {blob[0]}, {len(blob)} bytes)')
+
+
+class Float32Encoding(TypeDecorator):
+    """Column type that stores numpy encodings as packed float32 bytes."""
+
+    impl = LargeBinary
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return pack_encoding(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return unpack_encoding(value)
+
+
+def write_gallery_snapshot(path, ids, names, encodings, version):
+    """
+    Atomically write a gallery snapshot: magic, header length, JSON header
+    (version, count, names), then aligned int64 ids and float32 N x 128 encodings.
+    """
+    ids = np.ascontiguousarray(ids, dtype='<i8')
+    encodings = np.ascontiguousarray(encodings, dtype=ENCODING_DTYPE).reshape(-1, ENCODING_DIM)
+    header = json.dumps({'version': version, 'count': len(ids), 'names': [str(n) for n in names]}).encode()
+    prefix = SNAPSHOT_MAGIC + struct.pack('<Q', len(header)) + header
+    padding = -len(prefix) % SNAPSHOT_ALIGN
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(prefix + b'\0' * padding)
+        f.write(ids.tobytes())
+        f.write(encodings.tobytes())
+    os.replace(tmp_path, path)
+
+
+def open_gallery_snapshot(path):
+    """
+    Memory-map a snapshot written by write_gallery_snapshot.
+    :return: (version, ids, names, encodings) with copy-on-write memmaps, or None
+             if the file is missing or not a snapshot
+    """
+    try:
+        with open(path, 'rb') as f:
+            if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+                return None
+            (header_len,) = struct.unpack('<Q', f.read(8))
+            header = json.loads(f.read(header_len))
+    except (OSError, ValueError, struct.error):
+        return None
+    count = header['count']
+    offset = len(SNAPSHOT_MAGIC) + 8 + header_len
+    offset += -offset % SNAPSHOT_ALIGN
+    if count == 0:
+        return header['version'], np.zeros(0, dtype='<i8'), [], np.zeros((0, ENCODING_DIM), dtype=ENCODING_DTYPE)
+    # mode 'c': pages stay shared between processes until a process patches a row
+    ids = np.memmap(path, dtype='<i8', mode='c', offset=offset, shape=(count,))
+    encodings = np.memmap(path, dtype=ENCODING_DTYPE, mode='c', offset=offset + count * 8,
+                          shape=(count, ENCODING_DIM))
+    return header['version'], ids, header['names'], encodings
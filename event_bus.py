@@ -0,0 +1,84 @@
+"""
+In-process event bus for the Criminal Face Detection system.
+
+The recognition path publishes events (new attendance, cooldown-suppressed
+sightings, camera up/down) into a fixed-size ring buffer with increasing ids.
+Server-Sent Events clients block on the bus and resume from their
+Last-Event-ID, so idle dashboards cost nothing and a reconnect only replays
+what was missed.
+"""
+import threading
+import time
+from collections import deque
+
+
+class Event:
+    def __init__(self, event_id, event_type, data):
+        self.id = event_id
+        self.type = event_type
+        self.data = data
+        self.time = time.time()
+
+
+class EventBus:
+    """
+    :param capacity: events kept for Last-Event-ID resume
+    """
+
+    def __init__(self, capacity=1000):
+        self._cond = threading.Condition()
+        self._events = deque(maxlen=capacity)
+        self._last_id = 0
+        self._forward = None
+        self._subscribers = []
+
+    @property
+    def last_id(self):
+        return self._last_id
+
+    def forward_to(self, forward):
+        """Send published events to forward(event_type, data) instead of the local buffer, e.g. from a worker process."""
+        self._forward = forward
+
+    def subscribe(self, callback):
+        """Call callback(event) for every event published into this bus, on the publishing thread."""
+        self._subscribers.append(callback)
+
+    def publish(self, event_type, data=None):
+        if self._forward is not None:
+            self._forward(event_type, data)
+            return None
+        with self._cond:
+            self._last_id += 1
+            event = Event(self._last_id, event_type, data)
+            self._events.append(event)
+            self._cond.notify_all()
+        for callback in self._subscribers:
+            try:
+                callback(event)
+            except Exception as e:
+                print(f"Error in {event_type} event subscriber: {e}")
+        return event.id
+
+    def since(self, last_id):
+        """
+        Return (events newer than last_id, missed) where missed is True when
+        some of those events already fell out of the ring buffer.
+        """
+        with self._cond:
+            return self._since_locked(last_id)
+
+    def _since_locked(self, last_id):
+        if last_id > self._last_id:
+            # The client saw ids from before a restart; everything buffered is new to it
+            return list(self._events), True
+        events = [event for event in self._events if event.id > last_id]
+        oldest = self._events[0].id if self._events else self._last_id + 1
+        return events, last_id < oldest - 1
+
+    def wait(self, last_id, timeout=15.0):
+        """Block until there are events newer than last_id or the timeout passes."""
+        with self._cond:
+            if last_id == self._last_id:
+                self._cond.wait(timeout)
+            return self._since_locked(last_id)
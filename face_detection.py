@@ -0,0 +1,64 @@
+"""
+Face detection helpers for the Criminal Face Detection system.
+
+Detection can run on a downscaled copy of the frame, with the boxes mapped
+back to full resolution, so the (much more expensive) HOG/CNN pass scales
+with the detection size while encodings are still computed from full-res
+pixels.
+"""
+import cv2
+import face_recognition
+
+DETECTION_MODELS = ('hog', 'cnn')
+MAX_UPSAMPLE = 3  # Each upsample doubles the frame side, so detection cost grows ~4x per step
+
+
+def scale_locations(locations, factor, shape=None):
+    """Scale (top, right, bottom, left) boxes by factor, clipped to an optional frame shape."""
+    scaled = []
+    for top, right, bottom, left in locations:
+        top, right, bottom, left = int(top * factor), int(right * factor), int(bottom * factor), int(left * factor)
+        if shape is not None:
+            height, width = shape[:2]
+            top, left = max(top, 0), max(left, 0)
+            bottom, right = min(bottom, height), min(right, width)
+        scaled.append((top, right, bottom, left))
+    return scaled
+
+
+def detect_faces(rgb_frame, scale=1.0, model='hog', upsample=1, region=None):
+    """
+    Find faces in an RGB frame, detecting on a frame resized by scale.
+    :param region: optional (top, right, bottom, left) box to restrict detection to
+    :return: face locations in full-resolution (top, right, bottom, left) coordinates
+    """
+    if region is not None:
+        top, right, bottom, left = region
+        locations = detect_faces(rgb_frame[top:bottom, left:right], scale, model, upsample)
+        return [(t + top, r + left, b + top, l + left) for t, r, b, l in locations]
+    if scale and 0 < scale < 1:
+        small = cv2.resize(rgb_frame, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        locations = face_recognition.face_locations(small, number_of_times_to_upsample=upsample, model=model)
+        return scale_locations(locations, 1.0 / scale, rgb_frame.shape)
+    return face_recognition.face_locations(rgb_frame, number_of_times_to_upsample=upsample, model=model)
+
+
+def parse_detection_scale(raw):
+    scale = float(raw)
+    if not 0 < scale <= 1:
+        raise ValueError('detection_scale must be in (0, 1]')
+    return scale
+
+
+def parse_detection_upsample(raw):
+    upsample = int(raw)
+    if not 0 <= upsample <= MAX_UPSAMPLE:
+        raise ValueError(f'detection_upsample must be between 0 and {MAX_UPSAMPLE}')
+    return upsample
+
+
+def parse_detection_model(raw):
+    model = raw.lower()
+    if model not in DETECTION_MODELS:
+        raise ValueError(f"detection_model must be one of {', '.join(DETECTION_MODELS)}")
+    return model
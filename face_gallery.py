@@ -0,0 +1,213 @@
+"""
+Shared face-encoding gallery for the Criminal Face Detection system.
+
+All enrolled encodings live in one contiguous float32 (N x 128) matrix with
+parallel id/name arrays, so a whole frame's faces are matched against every
+employee with a single matrix operation instead of per-face Python loops.
+"""
+import threading
+
+import numpy as np
+
+ENCODING_DIM = 128
+INITIAL_CAPACITY = 64
+
+
+class GallerySnapshot:
+    """View of the gallery used for one matching pass."""
+
+    def __init__(self, encodings, ids, names, sq_norms=None):
+        self.encodings = encodings
+        self.ids = ids
+        self.names = names
+        # Squared norms are reused by every query: |q - g|^2 = |q|^2 + |g|^2 - 2 q.g
+        self.sq_norms = sq_norms if sq_norms is not None else np.einsum('ij,ij->i', encodings, encodings)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def nearest(self, queries):
+        """
+        Return (best_index, best_distance) arrays for an (M x 128) query matrix.
+        Indices are -1 and distances inf when the gallery is empty.
+        """
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        if len(queries) == 0 or len(self) == 0:
+            return (np.full(len(queries), -1, dtype=np.int64),
+                    np.full(len(queries), np.inf, dtype=np.float32))
+        q_sq = np.einsum('ij,ij->i', queries, queries)
+        d2 = q_sq[:, None] + self.sq_norms[None, :] - 2.0 * (queries @ self.encodings.T)
+        best = np.argmin(d2, axis=1)
+        best_d2 = d2[np.arange(len(queries)), best]
+        return best, np.sqrt(np.maximum(best_d2, 0.0))
+
+
+class FaceGallery:
+    """
+    Process-wide store of enrolled face encodings.
+
+    Rows are patched in place by upsert()/remove(); ``version`` is the id of
+    the last applied gallery change so callers can tell whether their copy
+    is stale and fetch only newer changes. Matching is exact unless a matcher
+    backend (see face_matchers) is set, in which case it is kept in step with
+    every row change.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._reset(INITIAL_CAPACITY)
+        self.loaded = False
+        self.version = 0
+        self.matcher = None
+
+    def _reset(self, capacity):
+        self._encodings = np.zeros((capacity, ENCODING_DIM), dtype=np.float32)
+        self._sq_norms = np.zeros(capacity, dtype=np.float32)
+        self._ids = np.zeros(capacity, dtype=np.int64)
+        self._names = np.empty(capacity, dtype=object)
+        self._row_of = {}
+        self._count = 0
+
+    def __len__(self):
+        return self._count
+
+    def __contains__(self, pk):
+        return pk in self._row_of
+
+    def load(self, rows, version=0):
+        """
+        Replace the gallery contents.
+        :param rows: iterable of (employee_pk, name, encoding) tuples
+        :param version: change id the rows are consistent with
+        """
+        rows = list(rows)
+        with self._lock:
+            self._reset(max(INITIAL_CAPACITY, len(rows)))
+            for pk, name, encoding in rows:
+                self._upsert_locked(pk, name, encoding)
+            self.loaded = True
+            self.version = version
+        if self.matcher is not None:
+            self.matcher.attach(self)
+
+    def adopt(self, ids, names, encodings, version=0):
+        """
+        Use existing arrays as the gallery rows without copying them, e.g. a
+        memory-mapped snapshot shared with other processes. Patching a row only
+        un-shares that page; adding past the adopted size copies into new arrays.
+        """
+        encodings = encodings.reshape(-1, ENCODING_DIM)
+        with self._lock:
+            count = len(ids)
+            self._encodings = encodings
+            self._sq_norms = np.einsum('ij,ij->i', encodings, encodings).astype(np.float32)
+            self._ids = ids
+            self._names = np.empty(count, dtype=object)
+            self._names[:] = list(names)
+            self._row_of = {int(pk): row for row, pk in enumerate(ids.tolist())}
+            self._count = count
+            self.loaded = True
+            self.version = version
+        if self.matcher is not None:
+            self.matcher.attach(self)
+
+    def set_matcher(self, matcher):
+        """Route matching through a backend built over the current rows."""
+        if matcher is not None:
+            matcher.attach(self)
+        self.matcher = matcher
+
+    def invalidate(self):
+        """Force the next ensure-loaded check to rebuild the gallery."""
+        with self._lock:
+            self.loaded = False
+
+    def upsert(self, pk, name, encoding, version=None):
+        """Add one employee row, or replace it in place if already present."""
+        with self._lock:
+            self._upsert_locked(pk, name, encoding)
+            if version is not None:
+                self.version = max(self.version, version)
+        if self.matcher is not None:
+            self.matcher.add(pk, encoding)
+
+    def remove(self, pk, version=None):
+        """Remove one employee row by moving the last row into its slot."""
+        with self._lock:
+            row = self._row_of.pop(pk, None)
+            if row is not None:
+                last = self._count - 1
+                if row != last:
+                    self._encodings[row] = self._encodings[last]
+                    self._sq_norms[row] = self._sq_norms[last]
+                    self._ids[row] = self._ids[last]
+                    self._names[row] = self._names[last]
+                    self._row_of[int(self._ids[row])] = row
+                self._names[last] = None
+                self._count = last
+            if version is not None:
+                self.version = max(self.version, version)
+        if self.matcher is not None:
+            self.matcher.remove(pk)
+
+    def _upsert_locked(self, pk, name, encoding):
+        vector = np.asarray(encoding, dtype=np.float32).reshape(ENCODING_DIM)
+        row = self._row_of.get(pk)
+        if row is None:
+            if self._count == len(self._ids):
+                self._grow()
+            row = self._count
+            self._count += 1
+            self._row_of[pk] = row
+            self._ids[row] = pk
+        self._encodings[row] = vector
+        self._sq_norms[row] = vector @ vector
+        self._names[row] = name
+
+    def _grow(self):
+        # New arrays rather than resize() so snapshots taken earlier stay valid
+        capacity = max(INITIAL_CAPACITY, len(self._ids) * 2)
+        encodings = np.zeros((capacity, ENCODING_DIM), dtype=np.float32)
+        sq_norms = np.zeros(capacity, dtype=np.float32)
+        ids = np.zeros(capacity, dtype=np.int64)
+        names = np.empty(capacity, dtype=object)
+        encodings[:self._count] = self._encodings[:self._count]
+        sq_norms[:self._count] = self._sq_norms[:self._count]
+        ids[:self._count] = self._ids[:self._count]
+        names[:self._count] = self._names[:self._count]
+        self._encodings, self._sq_norms, self._ids, self._names = encodings, sq_norms, ids, names
+
+    def snapshot(self):
+        with self._lock:
+            n = self._count
+            return GallerySnapshot(self._encodings[:n], self._ids[:n], self._names[:n], self._sq_norms[:n])
+
+    def match(self, face_encodings, tolerance=0.5):
+        """
+        Match all faces of a frame in one batched operation.
+        :return: list of (employee_pk, name, distance); pk is None and name
+                 'Unknown' when the best distance exceeds the tolerance
+        """
+        if self.matcher is not None:
+            pks, distances = self.matcher.search(face_encodings)
+            names = [self.name_of(pk) for pk in pks.tolist()]
+        else:
+            snapshot = self.snapshot()
+            best, distances = snapshot.nearest(face_encodings)
+            pks = np.where(best >= 0, snapshot.ids[best] if len(snapshot) else -1, -1)
+            names = [snapshot.names[idx] if idx >= 0 else None for idx in best.tolist()]
+        results = []
+        for pk, name, distance in zip(pks.tolist(), names, distances.tolist()):
+            if name is not None and distance <= tolerance:
+                results.append((pk, name, distance))
+            else:
+                results.append((None, 'Unknown', distance))
+        return results
+
+    def name_of(self, pk):
+        row = self._row_of.get(pk)
+        return self._names[row] if row is not None else None
+
+
+# Shared by every stream in this process
+gallery = FaceGallery()
@@ -0,0 +1,241 @@
+"""
+Matcher backends for the shared face gallery.
+
+ExactMatcher scans every enrolled encoding. IVFMatcher partitions the 128-d
+embeddings with k-means and only scans the few partitions closest to each
+query, which keeps per-face matching fast for watch lists of 100k+ identities.
+Both expose search(queries) -> (employee_pks, distances) with pk -1 for no
+candidate.
+"""
+import os
+import threading
+
+import numpy as np
+
+from face_gallery import ENCODING_DIM
+
+INDEX_FORMAT_VERSION = 1
+
+
+class ExactMatcher:
+    """Brute-force nearest neighbour over the gallery matrix."""
+
+    name = 'exact'
+
+    def __init__(self):
+        self._gallery = None
+
+    def attach(self, gallery):
+        self._gallery = gallery
+
+    def add(self, pk, encoding):
+        pass  # Reads gallery rows directly, nothing to maintain
+
+    def remove(self, pk):
+        pass
+
+    def search(self, queries):
+        snapshot = self._gallery.snapshot()
+        best, distances = snapshot.nearest(queries)
+        if len(snapshot) == 0:
+            return best, distances
+        return snapshot.ids[best], distances
+
+
+class IVFMatcher:
+    """
+    Inverted-file index: k-means centroids plus one posting list per centroid.
+
+    Inserts go to the nearest existing centroid without retraining and deletes
+    drop the row from its list, so the index follows gallery edits in place.
+    """
+
+    name = 'ivf'
+
+    def __init__(self, nlist=0, nprobe=8, index_path=None, kmeans_iterations=10, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.index_path = index_path
+        self.kmeans_iterations = kmeans_iterations
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._centroids = np.empty((0, ENCODING_DIM), dtype=np.float32)
+        self._list_ids = []
+        self._list_vecs = []
+        self._list_of = {}
+        self.version = 0
+
+    def __len__(self):
+        return len(self._list_of)
+
+    def attach(self, gallery):
+        """Load the persisted index if present, reconcile it with the gallery, else train."""
+        snapshot = gallery.snapshot()
+        if self.index_path and os.path.exists(self.index_path):
+            try:
+                self.load(self.index_path)
+                if self.version != gallery.version or len(self) != len(snapshot):
+                    self._reconcile(snapshot.ids, snapshot.encodings)
+            except (OSError, ValueError, KeyError) as e:
+                print(f"Rebuilding face index, could not load {self.index_path}: {e}")
+                self.build(snapshot.ids, snapshot.encodings)
+        else:
+            self.build(snapshot.ids, snapshot.encodings)
+        self.version = gallery.version
+        if self.index_path:
+            self.save(self.index_path)
+
+    def build(self, ids, encodings):
+        """Train centroids with k-means and assign every row to a posting list."""
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        ids = np.asarray(ids, dtype=np.int64)
+        nlist = self.nlist or max(1, int(4 * np.sqrt(len(ids))))
+        nlist = min(nlist, max(1, len(ids)))
+        centroids = _kmeans(encodings, nlist, self.kmeans_iterations, self.seed)
+        with self._lock:
+            self._centroids = centroids
+            self._list_ids = [np.empty(0, dtype=np.int64) for _ in range(len(centroids))]
+            self._list_vecs = [np.empty((0, ENCODING_DIM), dtype=np.float32) for _ in range(len(centroids))]
+            self._list_of = {}
+            if len(ids):
+                assignment = _nearest_centroid(encodings, centroids)
+                for lst in range(len(centroids)):
+                    members = np.flatnonzero(assignment == lst)
+                    self._list_ids[lst] = ids[members]
+                    self._list_vecs[lst] = encodings[members]
+                    for pk in self._list_ids[lst].tolist():
+                        self._list_of[pk] = lst
+
+    def _reconcile(self, ids, encodings):
+        """Bring a loaded index in line with the current gallery rows."""
+        wanted = dict(zip(ids.tolist(), range(len(ids))))
+        for pk in [pk for pk in self._list_of if pk not in wanted]:
+            self.remove(pk)
+        for pk, row in wanted.items():
+            lst = self._list_of.get(pk)
+            if lst is not None:
+                pos = np.flatnonzero(self._list_ids[lst] == pk)[0]
+                if np.array_equal(self._list_vecs[lst][pos], encodings[row]):
+                    continue
+            self.add(pk, encodings[row])
+
+    def add(self, pk, encoding):
+        vector = np.asarray(encoding, dtype=np.float32).reshape(1, ENCODING_DIM)
+        with self._lock:
+            self._remove_locked(pk)
+            if len(self._centroids) == 0:
+                # First row of an empty index becomes its only centroid
+                self._centroids = vector.copy()
+                self._list_ids = [np.empty(0, dtype=np.int64)]
+                self._list_vecs = [np.empty((0, ENCODING_DIM), dtype=np.float32)]
+            lst = int(_nearest_centroid(vector, self._centroids)[0])
+            self._list_ids[lst] = np.append(self._list_ids[lst], np.int64(pk))
+            self._list_vecs[lst] = np.vstack([self._list_vecs[lst], vector])
+            self._list_of[pk] = lst
+
+    def remove(self, pk):
+        with self._lock:
+            self._remove_locked(pk)
+
+    def _remove_locked(self, pk):
+        lst = self._list_of.pop(pk, None)
+        if lst is not None:
+            keep = self._list_ids[lst] != pk
+            self._list_ids[lst] = self._list_ids[lst][keep]
+            self._list_vecs[lst] = self._list_vecs[lst][keep]
+
+    def search(self, queries, nprobe=None):
+        queries = np.asarray(queries, dtype=np.float32).reshape(-1, ENCODING_DIM)
+        pks = np.full(len(queries), -1, dtype=np.int64)
+        distances = np.full(len(queries), np.inf, dtype=np.float32)
+        with self._lock:
+            centroids, list_ids, list_vecs = self._centroids, list(self._list_ids), list(self._list_vecs)
+        if len(queries) == 0 or len(centroids) == 0:
+            return pks, distances
+        nprobe = min(nprobe or self.nprobe, len(centroids))
+        centroid_d2 = _squared_distances(queries, centroids)
+        probes = np.argpartition(centroid_d2, nprobe - 1, axis=1)[:, :nprobe]
+        for qi, probe in enumerate(probes):
+            cand_ids = np.concatenate([list_ids[lst] for lst in probe])
+            if len(cand_ids) == 0:
+                continue
+            cand_vecs = np.concatenate([list_vecs[lst] for lst in probe])
+            d2 = _squared_distances(queries[qi:qi + 1], cand_vecs)[0]
+            best = int(np.argmin(d2))
+            pks[qi] = cand_ids[best]
+            distances[qi] = np.sqrt(max(float(d2[best]), 0.0))
+        return pks, distances
+
+    def save(self, path):
+        """Persist centroids and posting lists to an .npz file."""
+        with self._lock:
+            sizes = np.array([len(ids) for ids in self._list_ids], dtype=np.int64)
+            ids = np.concatenate(self._list_ids) if self._list_ids else np.empty(0, dtype=np.int64)
+            vecs = np.concatenate(self._list_vecs) if self._list_vecs else np.empty((0, ENCODING_DIM), dtype=np.float32)
+            centroids = self._centroids
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f'{path}.{os.getpid()}.tmp'  # Other processes may be saving the same index
+        with open(tmp_path, 'wb') as f:
+            np.savez(f, format_version=INDEX_FORMAT_VERSION, version=self.version,
+                     centroids=centroids, list_sizes=sizes, ids=ids, vecs=vecs)
+        os.replace(tmp_path, path)
+
+    def load(self, path):
+        with np.load(path) as data:
+            if int(data['format_version']) != INDEX_FORMAT_VERSION:
+                raise ValueError(f"unsupported index format {int(data['format_version'])}")
+            centroids = data['centroids'].astype(np.float32)
+            offsets = np.concatenate([[0], np.cumsum(data['list_sizes'])])
+            ids, vecs = data['ids'], data['vecs'].astype(np.float32)
+            version = int(data['version'])
+        with self._lock:
+            self._centroids = centroids
+            self._list_ids = [ids[offsets[i]:offsets[i + 1]].copy() for i in range(len(centroids))]
+            self._list_vecs = [vecs[offsets[i]:offsets[i + 1]].copy() for i in range(len(centroids))]
+            self._list_of = {pk: lst for lst, lst_ids in enumerate(self._list_ids) for pk in lst_ids.tolist()}
+            self.version = version
+
+
+def create_matcher(kind='exact', **options):
+    """Build a matcher backend from its config name ('exact' or 'ivf')."""
+    if kind == 'exact':
+        return ExactMatcher()
+    if kind == 'ivf':
+        return IVFMatcher(**options)
+    raise ValueError(f"Unknown face matcher '{kind}'")
+
+
+def _squared_distances(a, b):
+    d2 = np.einsum('ij,ij->i', a, a)[:, None] + np.einsum('ij,ij->i', b, b)[None, :] - 2.0 * (a @ b.T)
+    return np.maximum(d2, 0.0)
+
+
+def _nearest_centroid(vectors, centroids, chunk=8192):
+    assignment = np.empty(len(vectors), dtype=np.int64)
+    for start in range(0, len(vectors), chunk):
+        assignment[start:start + chunk] = np.argmin(_squared_distances(vectors[start:start + chunk], centroids), axis=1)
+    return assignment
+
+
+def _kmeans(vectors, k, iterations, seed):
+    """Plain Lloyd's k-means on a bounded training sample."""
+    if len(vectors) == 0:
+        return np.empty((0, ENCODING_DIM), dtype=np.float32)
+    rng = np.random.default_rng(seed)
+    sample = vectors
+    if len(vectors) > 256 * k:
+        sample = vectors[rng.choice(len(vectors), 256 * k, replace=False)]
+    centroids = sample[rng.choice(len(sample), k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = _nearest_centroid(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, sample)
+        counts = np.bincount(assignment, minlength=k)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters from random sample points
+        if not filled.all():
+            centroids[~filled] = sample[rng.choice(len(sample), int((~filled).sum()), replace=False)]
+    return centroids.astype(np.float32)
@@ -0,0 +1,161 @@
+"""
+Face tracking between recognition passes for the Criminal Face Detection system.
+
+Full HOG detection plus 128-d encoding only runs every N frames (or every T
+milliseconds). In between, each recognized face box is carried forward by
+template matching in a small search window on a downscaled grayscale frame,
+keeping its last identity label. A recognition pass is forced early when a
+track is lost or motion appears outside the tracked boxes.
+"""
+import threading
+import time
+from collections import deque
+
+import cv2
+import numpy as np
+
+TRACK_SCALE = 0.5  # Tracking runs on a half-size grayscale frame
+MOTION_THUMB_SIZE = (64, 36)
+MOTION_PIXEL_DELTA = 25  # Thumbnail pixel change (0-255) that counts as motion
+
+
+class FaceTrack:
+    def __init__(self, box, name, confidence, template):
+        self.box = box  # (top, right, bottom, left) at full resolution
+        self.name = name
+        self.confidence = confidence
+        self.template = template
+
+
+class FaceTracker:
+    """
+    Decides per frame whether to run recognition or carry the last results forward.
+
+    :param every_n_frames: recognize at least every N frames (1 = every frame)
+    :param interval_ms: if > 0, recognize every T milliseconds instead of every N frames
+    :param match_threshold: normalized correlation below which a track counts as lost
+    :param motion_threshold: fraction of thumbnail pixels outside tracked boxes
+                             that must change to force a new recognition pass
+    """
+
+    def __init__(self, every_n_frames=5, interval_ms=0, match_threshold=0.5, motion_threshold=0.01):
+        self.every_n_frames = max(1, int(every_n_frames or 1))
+        self.interval_ms = int(interval_ms or 0)
+        self.match_threshold = match_threshold
+        self.motion_threshold = motion_threshold
+        self.tracks = []
+        self._frames_since = 0
+        self._last_pass = 0.0
+        self._prev_thumb = None
+        self._lock = threading.Lock()
+        self._pass_times = deque(maxlen=30)
+        self.recognition_passes = 0
+        self.tracked_frames = 0
+        self.forced_passes = 0
+
+    def update(self, frame, recognize):
+        """
+        Return detections [((top, right, bottom, left), name, confidence), ...] for a
+        BGR frame, calling recognize(frame) only when a full pass is due.
+        """
+        now = time.monotonic()
+        gray = cv2.cvtColor(cv2.resize(frame, None, fx=TRACK_SCALE, fy=TRACK_SCALE), cv2.COLOR_BGR2GRAY)
+        forced = self._new_motion(gray)
+        due = self._due(now)
+        if not due and not forced:
+            lost = self._track(gray)
+            if not lost:
+                with self._lock:
+                    self.tracked_frames += 1
+                return self._detections()
+            forced = True
+
+        detections = recognize(frame)
+        self._reset(gray, detections)
+        self._frames_since = 0
+        self._last_pass = now
+        with self._lock:
+            self.recognition_passes += 1
+            if forced and not due:
+                self.forced_passes += 1
+            self._pass_times.append(now)
+        return detections
+
+    def _due(self, now):
+        self._frames_since += 1
+        if self._last_pass == 0.0:
+            return True
+        if self.interval_ms > 0:
+            return (now - self._last_pass) * 1000.0 >= self.interval_ms
+        return self._frames_since >= self.every_n_frames
+
+    def _reset(self, gray, detections):
+        tracks = []
+        for box, name, confidence in detections:
+            top, right, bottom, left = _scale_box(box, TRACK_SCALE)
+            template = gray[max(top, 0):bottom, max(left, 0):right]
+            if template.size and min(template.shape) >= 4:
+                tracks.append(FaceTrack(box, name, confidence, template.copy()))
+        self.tracks = tracks
+
+    def _track(self, gray):
+        """Move each track to its best template match; return True if any track was lost."""
+        height, width = gray.shape[:2]
+        for track in self.tracks:
+            top, right, bottom, left = _scale_box(track.box, TRACK_SCALE)
+            th, tw = track.template.shape[:2]
+            margin_y, margin_x = th // 2 + 2, tw // 2 + 2
+            y0, x0 = max(top - margin_y, 0), max(left - margin_x, 0)
+            y1, x1 = min(bottom + margin_y, height), min(right + margin_x, width)
+            window = gray[y0:y1, x0:x1]
+            if window.shape[0] < th or window.shape[1] < tw:
+                return True
+            scores = cv2.matchTemplate(window, track.template, cv2.TM_CCOEFF_NORMED)
+            _, best, _, (bx, by) = cv2.minMaxLoc(scores)
+            if best < self.match_threshold:
+                return True
+            new_top, new_left = int((y0 + by) / TRACK_SCALE), int((x0 + bx) / TRACK_SCALE)
+            old_top, old_right, old_bottom, old_left = track.box
+            track.box = (new_top, new_left + (old_right - old_left), new_top + (old_bottom - old_top), new_left)
+        return False
+
+    def _new_motion(self, gray):
+        """True when the scene changed outside the tracked boxes since the previous frame."""
+        thumb = cv2.resize(gray, MOTION_THUMB_SIZE, interpolation=cv2.INTER_AREA).astype(np.int16)
+        prev, self._prev_thumb = self._prev_thumb, thumb
+        if prev is None or self.motion_threshold is None:
+            return False
+        diff = np.abs(thumb - prev)
+        sx = MOTION_THUMB_SIZE[0] / (gray.shape[1] / TRACK_SCALE)
+        sy = MOTION_THUMB_SIZE[1] / (gray.shape[0] / TRACK_SCALE)
+        mask = np.ones(diff.shape, dtype=bool)
+        for track in self.tracks:
+            top, right, bottom, left = track.box
+            mask[max(int(top * sy) - 1, 0):int(bottom * sy) + 2, max(int(left * sx) - 1, 0):int(right * sx) + 2] = False
+        return bool(mask.any()) and float(np.mean(diff[mask] > MOTION_PIXEL_DELTA)) > self.motion_threshold
+
+    def _detections(self):
+        return [(track.box, track.name, track.confidence) for track in self.tracks]
+
+    def last_detections(self):
+        """Current tracks without running tracking, for frames known to be unchanged."""
+        return self._detections()
+
+    def stats(self):
+        with self._lock:
+            times = list(self._pass_times)
+            fps = (len(times) - 1) / (times[-1] - times[0]) if len(times) > 1 and times[-1] > times[0] else 0.0
+            return {
+                'every_n_frames': self.every_n_frames,
+                'interval_ms': self.interval_ms,
+                'recognition_passes': self.recognition_passes,
+                'forced_passes': self.forced_passes,
+                'tracked_frames': self.tracked_frames,
+                'active_tracks': len(self.tracks),
+                'recognition_fps': round(fps, 2)
+            }
+
+
+def _scale_box(box, scale):
+    top, right, bottom, left = box
+    return int(top * scale), int(right * scale), int(bottom * scale), int(left * scale)
@@ -0,0 +1,235 @@
+"""
+In-process metrics for the Criminal Face Detection system, exported in the
+Prometheus text format.
+
+Metrics are created once at import time and their labelled children once
+per camera, so recording in the frame loop is a lock and a few integer
+adds: histogram buckets are a preallocated list indexed with bisect, and
+callers keep the child objects instead of looking labels up per frame.
+Worker processes send snapshot() to the parent, which merges them into
+its own output with render(snapshots).
+"""
+import bisect
+import math
+import threading
+
+# Seconds; spans a cvtColor (sub-millisecond) up to full-frame HOG at 1080p
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+
+class _CounterChild:
+    __slots__ = ('value', '_lock')
+
+    def __init__(self):
+        self.value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1):
+        with self._lock:
+            self.value += amount
+
+    def read(self):
+        return self.value
+
+    def reset(self):
+        with self._lock:
+            self.value = 0
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount=1):
+        with self._lock:
+            self.value -= amount
+
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramChild:
+    __slots__ = ('bounds', 'counts', 'sum', '_lock')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.counts[index] += 1
+            self.sum += value
+
+    def read(self):
+        with self._lock:
+            return list(self.counts), self.sum
+
+    def reset(self):
+        with self._lock:
+            self.counts = [0] * (len(self.bounds) + 1)
+            self.sum = 0.0
+
+
+class Metric:
+    """
+    One named metric; labels(*values) returns the child to record on.
+    Children are created on first use of a label combination and kept.
+    """
+
+    kind = None
+    child_class = None
+    child_args = ()  # Passed to child_class for every new child
+
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+        if not self.labelnames:
+            self.labels()  # Exported as 0 before the first recording
+
+    def _new_child(self):
+        return self.child_class(*self.child_args)
+
+    def labels(self, *values):
+        if len(values) != len(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}')
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def snapshot(self):
+        with self._lock:
+            children = list(self._children.items())
+        return {key: child.read() for key, child in children}
+
+    def reset(self):
+        with self._lock:
+            children = list(self._children.values())
+        for child in children:
+            child.reset()
+
+
+class Counter(Metric):
+    kind = 'counter'
+    child_class = _CounterChild
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    child_class = _GaugeChild
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+    child_class = _HistogramChild
+
+    def __init__(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        self.child_args = (self.buckets,)
+        super().__init__(name, help_text, labelnames)
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        if math.isinf(value):
+            return '+Inf' if value > 0 else '-Inf'
+        return repr(value)
+    return str(value)
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics = []
+
+    def _register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, help_text, labelnames=()):
+        return self._register(Counter(name, help_text, labelnames))
+
+    def gauge(self, name, help_text, labelnames=()):
+        return self._register(Gauge(name, help_text, labelnames))
+
+    def histogram(self, name, help_text, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(name, help_text, labelnames, buckets))
+
+    def snapshot(self):
+        """Picklable {metric name: {label values: value or (bucket counts, sum)}}"""
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def reset(self):
+        """Zero every value, e.g. in a forked worker that must only report its own work"""
+        for metric in self._metrics:
+            metric.reset()
+
+    def fold(self, total, snapshot):
+        """
+        Add a snapshot's counters and histograms into a running total snapshot, e.g. the
+        last report of a worker that exited. Gauges describe a live process and are dropped.
+        """
+        total = dict(total or {})
+        for metric in self._metrics:
+            if metric.kind == 'gauge' or metric.name not in snapshot:
+                continue
+            merged = dict(total.get(metric.name, {}))
+            for key, value in snapshot[metric.name].items():
+                current = merged.get(key)
+                if current is None:
+                    merged[key] = value
+                elif metric.kind == 'histogram':
+                    merged[key] = ([a + b for a, b in zip(current[0], value[0])], current[1] + value[1])
+                else:
+                    merged[key] = current + value
+            total[metric.name] = merged
+        return total
+
+    def render(self, snapshots=()):
+        """Prometheus text exposition of this process's values plus the given worker snapshots"""
+        lines = []
+        for metric in self._metrics:
+            merged = metric.snapshot()
+            for snapshot in snapshots:
+                for key, value in snapshot.get(metric.name, {}).items():
+                    current = merged.get(key)
+                    if current is None:
+                        merged[key] = value
+                    elif metric.kind == 'histogram':
+                        merged[key] = ([a + b for a, b in zip(current[0], value[0])], current[1] + value[1])
+                    else:
+                        merged[key] = current + value
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for key in sorted(merged):
+                value = merged[key]
+                if metric.kind != 'histogram':
+                    lines.append(f'{metric.name}{_format_labels(metric.labelnames, key)} {_format_value(value)}')
+                    continue
+                counts, total = value
+                cumulative = 0
+                for bound, count in zip(metric.buckets + (float('inf'),), counts):
+                    cumulative += count
+                    le = ('le', _format_value(float(bound)))
+                    lines.append(f'{metric.name}_bucket{_format_labels(metric.labelnames, key, le)} {cumulative}')
+                labels = _format_labels(metric.labelnames, key)
+                lines.append(f'{metric.name}_sum{labels} {_format_value(float(total))}')
+                lines.append(f'{metric.name}_count{labels} {cumulative}')
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,74 @@
+"""baseline schema
+
+Databases created before migrations were introduced already have these
+tables (created by db.create_all()), so each one is only created if missing.
+
+Revision ID: 3f1c2a9b7d10
+Revises: 
+Create Date: 2026-10-18 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c2a9b7d10'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    existing = set(sa.inspect(op.get_bind()).get_table_names())
+
+    if 'employee' not in existing:
+        op.create_table('employee',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('employee_id', sa.String(length=50), nullable=False),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('image_filename', sa.String(length=200), nullable=False),
+        sa.Column('face_encoding', sa.PickleType(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('employee_id')
+        )
+    if 'camera_feed' not in existing:
+        op.create_table('camera_feed',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('camera_url', sa.String(length=500), nullable=False),
+        sa.Column('camera_type', sa.String(length=50), nullable=False),
+        sa.Column('location', sa.String(length=200), nullable=True),
+        sa.Column('description', sa.Text(), nullable=True),
+        sa.Column('is_active', sa.Boolean(), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'attendance_log' not in existing:
+        op.create_table('attendance_log',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('timestamp', sa.DateTime(), nullable=True),
+        sa.Column('employee_name', sa.String(length=100), nullable=False),
+        sa.Column('attendance_type', sa.String(length=20), nullable=False),
+        sa.Column('camera_feed_id', sa.Integer(), nullable=True),
+        sa.Column('camera_feed_name', sa.String(length=100), nullable=True),
+        sa.Column('confidence_score', sa.Float(), nullable=True),
+        sa.ForeignKeyConstraint(['camera_feed_id'], ['camera_feed.id'], ),
+        sa.PrimaryKeyConstraint('id')
+        )
+    if 'gallery_change' not in existing:
+        op.create_table('gallery_change',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('employee_pk', sa.Integer(), nullable=False),
+        sa.Column('op', sa.String(length=10), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+
+
+def downgrade():
+    op.drop_table('gallery_change')
+    op.drop_table('attendance_log')
+    op.drop_table('camera_feed')
+    op.drop_table('employee')
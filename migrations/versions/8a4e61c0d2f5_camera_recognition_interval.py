@@ -0,0 +1,28 @@
+"""per-camera recognition interval
+
+Revision ID: 8a4e61c0d2f5
+Revises: 3f1c2a9b7d10
+Create Date: 2026-10-18 11:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e61c0d2f5'
+down_revision = '3f1c2a9b7d10'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('camera_feed', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('recognize_every_n_frames', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('recognize_interval_ms', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('camera_feed', schema=None) as batch_op:
+        batch_op.drop_column('recognize_interval_ms')
+        batch_op.drop_column('recognize_every_n_frames')
@@ -0,0 +1,83 @@
+"""store employee face encodings as packed float32
+
+Rewrites pickled float64 arrays as a format-version byte followed by 128
+little-endian float32 values, in id-ordered chunks. The column stays a
+binary column, so no DDL is needed.
+
+Revision ID: a9c3e7f15d28
+Revises: f2a8d4c61b07
+Create Date: 2026-10-18 15:00:00.000000
+
+"""
+import pickle
+
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a9c3e7f15d28'
+down_revision = 'f2a8d4c61b07'
+branch_labels = None
+depends_on = None
+
+CHUNK_ROWS = 1000
+ENCODING_FORMAT_VERSION = 1
+ENCODING_BYTES = 1 + 128 * 4
+
+employee = sa.table(
+    'employee',
+    sa.column('id', sa.Integer),
+    sa.column('face_encoding', sa.LargeBinary),
+)
+
+
+def is_packed(blob):
+    return len(blob) == ENCODING_BYTES and blob[0] == ENCODING_FORMAT_VERSION
+
+
+def to_packed(blob):
+    if is_packed(blob):
+        return None
+    # Pickles written by this application's own PickleType column
+    vector = np.asarray(pickle.loads(blob), dtype='<f4').reshape(128)
+    return bytes([ENCODING_FORMAT_VERSION]) + vector.tobytes()
+
+
+def to_pickled(blob):
+    if not is_packed(blob):
+        return None
+    return pickle.dumps(np.frombuffer(blob, dtype='<f4', offset=1).astype(np.float64))
+
+
+def convert(transform):
+    bind = op.get_bind()
+    update = employee.update().where(employee.c.id == sa.bindparam('row_id')).values(
+        face_encoding=sa.bindparam('row_encoding'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(employee.c.id, employee.c.face_encoding)
+            .where(employee.c.id > last_id)
+            .order_by(employee.c.id)
+            .limit(CHUNK_ROWS)
+        ).fetchall()
+        if not rows:
+            break
+        changed = []
+        for row_id, blob in rows:
+            converted = transform(bytes(blob))
+            if converted is not None:
+                changed.append({'row_id': row_id, 'row_encoding': converted})
+        if changed:
+            bind.execute(update, changed)
+        last_id = rows[-1][0]
+
+
+def upgrade():
+    convert(to_packed)
+
+
+def downgrade():
+    convert(to_pickled)
@@ -0,0 +1,57 @@
+"""employee image content hash for bulk enrollment dedup
+
+Adds an indexed sha256 column and fills it for employees whose image is
+still in static/uploads; images that are missing stay NULL.
+
+Revision ID: b4d1f6a2c839
+Revises: a9c3e7f15d28
+Create Date: 2026-10-18 16:00:00.000000
+
+"""
+import hashlib
+import os
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b4d1f6a2c839'
+down_revision = 'a9c3e7f15d28'
+branch_labels = None
+depends_on = None
+
+UPLOAD_FOLDER = os.path.join('static', 'uploads')
+
+employee = sa.table(
+    'employee',
+    sa.column('id', sa.Integer),
+    sa.column('image_filename', sa.String),
+    sa.column('image_sha256', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('employee', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_sha256', sa.String(length=64), nullable=True))
+        batch_op.create_index('ix_employee_image_sha256', ['image_sha256'], unique=False)
+
+    bind = op.get_bind()
+    changed = []
+    for row_id, filename in bind.execute(sa.select(employee.c.id, employee.c.image_filename)):
+        path = os.path.join(UPLOAD_FOLDER, filename or '')
+        if filename and os.path.isfile(path):
+            with open(path, 'rb') as f:
+                changed.append({'row_id': row_id, 'row_hash': hashlib.sha256(f.read()).hexdigest()})
+    if changed:
+        bind.execute(
+            employee.update().where(employee.c.id == sa.bindparam('row_id')).values(
+                image_sha256=sa.bindparam('row_hash')),
+            changed
+        )
+
+
+def downgrade():
+    with op.batch_alter_table('employee', schema=None) as batch_op:
+        batch_op.drop_index('ix_employee_image_sha256')
+        batch_op.drop_column('image_sha256')
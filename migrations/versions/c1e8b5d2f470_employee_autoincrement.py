@@ -0,0 +1,49 @@
+"""never reuse employee ids
+
+SQLite hands the highest rowid out again once that employee is deleted, so a
+new enrollment inherited the deleted employee's attendance rows. The
+employee table is rebuilt with AUTOINCREMENT, and attendance rows pointing
+at employees that no longer exist are detached first.
+
+Revision ID: c1e8b5d2f470
+Revises: b4d1f6a2c839
+Create Date: 2026-10-18 18:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c1e8b5d2f470'
+down_revision = 'b4d1f6a2c839'
+branch_labels = None
+depends_on = None
+
+attendance_log = sa.table(
+    'attendance_log',
+    sa.column('employee_pk', sa.Integer),
+)
+employee = sa.table(
+    'employee',
+    sa.column('id', sa.Integer),
+)
+
+
+def upgrade():
+    op.execute(attendance_log.update()
+               .where(attendance_log.c.employee_pk.is_not(None))
+               .where(attendance_log.c.employee_pk.not_in(sa.select(employee.c.id)))
+               .values(employee_pk=None))
+    if op.get_bind().dialect.name != 'sqlite':
+        return  # Other databases never reuse sequence/identity values
+    # Copying the rows with their ids seeds sqlite_sequence with the current maximum
+    with op.batch_alter_table('employee', recreate='always', table_kwargs={'sqlite_autoincrement': True}):
+        pass
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    with op.batch_alter_table('employee', recreate='always', table_kwargs={'sqlite_autoincrement': False}):
+        pass
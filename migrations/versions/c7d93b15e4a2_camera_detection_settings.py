@@ -0,0 +1,30 @@
+"""per-camera detection scale, model and upsample
+
+Revision ID: c7d93b15e4a2
+Revises: 8a4e61c0d2f5
+Create Date: 2026-10-18 12:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c7d93b15e4a2'
+down_revision = '8a4e61c0d2f5'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('camera_feed', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('detection_scale', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('detection_model', sa.String(length=10), nullable=True))
+        batch_op.add_column(sa.Column('detection_upsample', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('camera_feed', schema=None) as batch_op:
+        batch_op.drop_column('detection_upsample')
+        batch_op.drop_column('detection_model')
+        batch_op.drop_column('detection_scale')
@@ -0,0 +1,28 @@
+"""per-camera motion gate settings
+
+Revision ID: e5b27f9a61c3
+Revises: c7d93b15e4a2
+Create Date: 2026-10-18 13:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b27f9a61c3'
+down_revision = 'c7d93b15e4a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('camera_feed', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('motion_gate_enabled', sa.Boolean(), nullable=True))
+        batch_op.add_column(sa.Column('motion_gate_restrict_region', sa.Boolean(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('camera_feed', schema=None) as batch_op:
+        batch_op.drop_column('motion_gate_restrict_region')
+        batch_op.drop_column('motion_gate_enabled')
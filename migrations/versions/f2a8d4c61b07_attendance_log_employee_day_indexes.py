@@ -0,0 +1,94 @@
+"""attendance log employee foreign key, day column and indexes
+
+Existing rows are backfilled in id-ordered chunks, each committed on its own,
+so the migration neither holds the whole table in memory nor keeps the
+database locked for the whole backfill; the indexes are built after it.
+
+Revision ID: f2a8d4c61b07
+Revises: e5b27f9a61c3
+Create Date: 2026-10-18 14:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a8d4c61b07'
+down_revision = 'e5b27f9a61c3'
+branch_labels = None
+depends_on = None
+
+BACKFILL_CHUNK_ROWS = 5000
+
+attendance_log = sa.table(
+    'attendance_log',
+    sa.column('id', sa.Integer),
+    sa.column('timestamp', sa.DateTime),
+    sa.column('employee_name', sa.String),
+    sa.column('employee_pk', sa.Integer),
+    sa.column('day', sa.Date),
+)
+employee = sa.table(
+    'employee',
+    sa.column('id', sa.Integer),
+    sa.column('name', sa.String),
+)
+
+
+def upgrade():
+    with op.batch_alter_table('attendance_log', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('employee_pk', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('day', sa.Date(), nullable=True))
+        batch_op.create_foreign_key('fk_attendance_log_employee_pk', 'employee', ['employee_pk'], ['id'],
+                                    ondelete='SET NULL')
+
+    # Commits the schema change above; every backfill chunk then runs in its own transaction
+    with op.get_context().autocommit_block():
+        backfill()
+
+    with op.batch_alter_table('attendance_log', schema=None) as batch_op:
+        batch_op.create_index('ix_attendance_log_day_employee_pk', ['day', 'employee_pk'], unique=False)
+        batch_op.create_index('ix_attendance_log_timestamp', ['timestamp'], unique=False)
+        batch_op.create_index('ix_attendance_log_camera_feed_id_timestamp', ['camera_feed_id', 'timestamp'], unique=False)
+
+
+def backfill():
+    """Set day and employee_pk on existing rows, matching names the way the UI did (trimmed, case-insensitive)."""
+    bind = op.get_bind()
+    employee_pks = {}
+    for pk, name in bind.execute(sa.select(employee.c.id, employee.c.name).order_by(employee.c.id)):
+        employee_pks.setdefault((name or '').strip().lower(), pk)
+
+    update = attendance_log.update().where(attendance_log.c.id == sa.bindparam('row_id')).values(
+        day=sa.bindparam('row_day'), employee_pk=sa.bindparam('row_employee_pk'))
+    last_id = 0
+    while True:
+        rows = bind.execute(
+            sa.select(attendance_log.c.id, attendance_log.c.timestamp, attendance_log.c.employee_name)
+            .where(attendance_log.c.id > last_id)
+            .order_by(attendance_log.c.id)
+            .limit(BACKFILL_CHUNK_ROWS)
+        ).fetchall()
+        if not rows:
+            break
+        bind.exec_driver_sql('BEGIN')
+        bind.execute(update, [
+            {
+                'row_id': row_id,
+                'row_day': timestamp.date() if timestamp is not None else None,
+                'row_employee_pk': employee_pks.get((name or '').strip().lower())
+            } for row_id, timestamp, name in rows
+        ])
+        bind.exec_driver_sql('COMMIT')
+        last_id = rows[-1][0]
+
+
+def downgrade():
+    with op.batch_alter_table('attendance_log', schema=None) as batch_op:
+        batch_op.drop_index('ix_attendance_log_camera_feed_id_timestamp')
+        batch_op.drop_index('ix_attendance_log_timestamp')
+        batch_op.drop_index('ix_attendance_log_day_employee_pk')
+        batch_op.drop_constraint('fk_attendance_log_employee_pk', type_='foreignkey')
+        batch_op.drop_column('day')
+        batch_op.drop_column('employee_pk')
@@ -0,0 +1,83 @@
+"""
+Shared MJPEG frame encoding for the Criminal Face Detection system.
+
+A camera's annotated frame is handed to every viewer as one EncodedFrame.
+Each viewer asks it for the (max_width, quality) variant it negotiated; a
+variant is resized and JPEG-encoded at most once per frame, by the first
+viewer that asks, and the bytes are shared with everyone else.
+"""
+import threading
+import time
+
+import cv2
+
+DEFAULT_QUALITY = 80
+MIN_QUALITY = 10
+MAX_QUALITY = 95
+QUALITY_STEP = 5
+MIN_WIDTH = 64
+WIDTH_STEP = 32
+
+
+def mjpeg_part(frame, quality=DEFAULT_QUALITY):
+    """Encode a BGR frame as one part of a multipart/x-mixed-replace response"""
+    ret, buffer = cv2.imencode('.jpg', frame, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    frame_bytes = buffer.tobytes()
+    return b'--frame\r\n' b'Content-Type: image/jpeg\r\n\r\n' + frame_bytes + b'\r\n'
+
+
+def stream_variant(max_width=None, quality=None, default_quality=DEFAULT_QUALITY):
+    """
+    Normalize viewer parameters to a variant key (max_width or None, quality).
+    Values are snapped to coarse steps so similar requests share one encoding.
+    """
+    if quality is None:
+        quality = default_quality
+    quality = min(MAX_QUALITY, max(MIN_QUALITY, int(round(quality / QUALITY_STEP)) * QUALITY_STEP))
+    if max_width is not None:
+        max_width = max(MIN_WIDTH, int(max_width) - int(max_width) % WIDTH_STEP)
+    return max_width, quality
+
+
+class EncodedFrame:
+    """
+    An annotated BGR frame and its MJPEG parts, encoded on demand per variant.
+    :param on_encode: optional callable(seconds) called after each resize + JPEG encode
+    :param timings: optional camera_pipeline.FrameTimings of the frame
+    """
+
+    __slots__ = ('image', 'on_encode', 'timings', '_lock', '_locks', '_parts')
+
+    def __init__(self, image, on_encode=None, timings=None):
+        self.image = image
+        self.on_encode = on_encode
+        self.timings = timings
+        self._lock = threading.Lock()
+        self._locks = {}
+        self._parts = {}
+
+    def part(self, variant=(None, DEFAULT_QUALITY)):
+        """The MJPEG part for a stream_variant() key"""
+        max_width, quality = variant
+        width = self.image.shape[1]
+        if max_width is not None and max_width >= width:
+            max_width = None  # Never upscale; shares the native-size encoding
+        key = (max_width, quality)
+        part = self._parts.get(key)
+        if part is not None:
+            return part
+        with self._lock:
+            lock = self._locks.setdefault(key, threading.Lock())
+        # Viewers of the same variant wait here for one encode instead of each doing it
+        with lock:
+            part = self._parts.get(key)
+            if part is None:
+                started = time.perf_counter()
+                image = self.image
+                if max_width is not None:
+                    height = max(1, round(image.shape[0] * max_width / width))
+                    image = cv2.resize(image, (max_width, height), interpolation=cv2.INTER_AREA)
+                part = self._parts[key] = mjpeg_part(image, quality)
+                if self.on_encode is not None:
+                    self.on_encode(time.perf_counter() - started)
+        return part
@@ -0,0 +1,85 @@
+"""
+Motion gate for the Criminal Face Detection system.
+
+A cheap pre-stage that compares a small blurred grayscale thumbnail of each
+frame against a running-average background and lets a frame through to face
+detection only when enough of it changed. It also reports the bounding box
+of the motion so detection can optionally be restricted to that region.
+"""
+import threading
+import time
+
+import cv2
+import numpy as np
+
+THUMB_WIDTH = 160
+PIXEL_DELTA = 25  # Thumbnail pixel change (0-255) that counts as motion
+BACKGROUND_RATE = 0.05  # Running-average weight of each new frame
+REGION_PADDING = 0.15  # Grow the motion box by this fraction on each side
+
+
+class MotionGate:
+    """
+    :param threshold: fraction of thumbnail pixels that must change to count as motion
+    :param max_skip_seconds: let a frame through at least this often even when static,
+                             so slow changes are never missed for long
+    """
+
+    def __init__(self, threshold=0.002, max_skip_seconds=5.0):
+        self.threshold = threshold
+        self.max_skip_seconds = max_skip_seconds
+        self._background = None
+        self._last_pass = 0.0
+        self._lock = threading.Lock()
+        self.frames_checked = 0
+        self.frames_skipped = 0
+
+    def check(self, frame):
+        """
+        :return: (moved, region) where region is the padded full-resolution
+                 (top, right, bottom, left) box around the motion, or None
+        """
+        height, width = frame.shape[:2]
+        scale = THUMB_WIDTH / float(width)
+        thumb = cv2.resize(frame, (THUMB_WIDTH, max(1, int(height * scale))), interpolation=cv2.INTER_AREA)
+        thumb = cv2.GaussianBlur(cv2.cvtColor(thumb, cv2.COLOR_BGR2GRAY), (5, 5), 0).astype(np.float32)
+
+        now = time.monotonic()
+        if self._background is None or self._background.shape != thumb.shape:
+            self._background = thumb
+            self._count(skipped=False, now=now)
+            return True, None
+
+        changed = cv2.absdiff(thumb, self._background) > PIXEL_DELTA
+        cv2.accumulateWeighted(thumb, self._background, BACKGROUND_RATE)
+        moved = float(changed.mean()) > self.threshold
+        if not moved:
+            if self.max_skip_seconds and now - self._last_pass >= self.max_skip_seconds:
+                self._count(skipped=False, now=now)
+                return True, None
+            self._count(skipped=True, now=now)
+            return False, None
+
+        self._count(skipped=False, now=now)
+        x, y, w, h = cv2.boundingRect(changed.astype(np.uint8))
+        pad_x, pad_y = int(w * REGION_PADDING) + 2, int(h * REGION_PADDING) + 2
+        top = max(int((y - pad_y) / scale), 0)
+        left = max(int((x - pad_x) / scale), 0)
+        bottom = min(int((y + h + pad_y) / scale), height)
+        right = min(int((x + w + pad_x) / scale), width)
+        return True, (top, right, bottom, left)
+
+    def _count(self, skipped, now):
+        with self._lock:
+            self.frames_checked += 1
+            if skipped:
+                self.frames_skipped += 1
+            else:
+                self._last_pass = now
+
+    def stats(self):
+        with self._lock:
+            return {
+                'motion_gate_frames_checked': self.frames_checked,
+                'motion_gate_frames_skipped': self.frames_skipped
+            }
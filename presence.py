@@ -0,0 +1,167 @@
+"""
+In-memory presence table for the Criminal Face Detection system.
+
+Keeps, per employee, the attendances and sightings seen within the presence
+window and a running count of present employees. Attendance and suppressed
+sighting events update it as they happen, rows written by other processes are caught up by log id, and
+entries are expired oldest first from a heap, so a status read only pays
+for what changed; the rendered payload is cached per version for ETags.
+"""
+import bisect
+import heapq
+import itertools
+import threading
+import time
+from datetime import timedelta
+
+
+class PresenceTable:
+    """
+    :param window_seconds: an employee is present while they have an attendance this recent
+    """
+
+    def __init__(self, window_seconds=30):
+        self.window = timedelta(seconds=window_seconds)
+        self._lock = threading.Lock()
+        self._employees = {}
+        self._order = []
+        self._recent = {}
+        self._timeline = []  # Heap of (timestamp, log id, employee pk)
+        self._ids = set()
+        self.present = 0
+        self.version = 0
+        self.updated_at = None
+        self.employees_version = None
+        self.loaded = False
+        self.synced_log_id = 0  # Highest attendance log id read from the database
+        self._sighting_ids = itertools.count(-1, -1)  # Sightings have no log id; negative ids never collide
+        self._cache = None
+        # Distinguishes versions of this table from those of an earlier process
+        self._epoch = f'{int(time.time() * 1000):x}'
+
+    @property
+    def etag(self):
+        return f'{self._epoch}-{self.employees_version}-{self.version}'
+
+    def _changed(self, now):
+        self.version += 1
+        self.updated_at = now
+
+    def set_employees(self, employees, version, now):
+        """
+        Replace the employee list.
+        :param employees: ordered dicts with id, name, employee_id, image_url and thumbnail_url
+        """
+        with self._lock:
+            self._employees = {e['id']: e for e in employees}
+            self._order = [e['id'] for e in employees]
+            self.present = sum(1 for pk in self._order if self._recent.get(pk))
+            self.employees_version = version
+            self._changed(now)
+
+    def load(self, attendances, last_log_id, now):
+        """
+        Replace the recent attendances, e.g. from the database at startup.
+        :param attendances: (log id, employee pk, timestamp, attendance dict) tuples
+        :param last_log_id: highest log id the attendances were read up to
+        """
+        with self._lock:
+            self._recent = {}
+            self._timeline = []
+            self._ids = set()
+            for log_id, pk, timestamp, attendance in attendances:
+                self._add_locked(log_id, pk, timestamp, attendance, now)
+            self.present = sum(1 for pk in self._order if self._recent.get(pk))
+            self.synced_log_id = last_log_id
+            self.loaded = True
+            self._changed(now)
+
+    def catch_up(self, attendances, last_log_id, now):
+        """Add rows read from the database since synced_log_id; rows already recorded from events are skipped."""
+        with self._lock:
+            added = False
+            for log_id, pk, timestamp, attendance in attendances:
+                added = self._record_locked(log_id, pk, timestamp, attendance, now) or added
+            self.synced_log_id = max(self.synced_log_id, last_log_id)
+            if added:
+                self._changed(now)
+
+    def record(self, log_id, pk, timestamp, attendance, now):
+        """Add one attendance (dict with timestamp, attendance_type, camera_feed_name)."""
+        with self._lock:
+            if self._record_locked(log_id, pk, timestamp, attendance, now):
+                self._changed(now)
+
+    def record_sighting(self, pk, timestamp, attendance, now):
+        """Add a sighting that wrote no attendance row, e.g. one suppressed as already logged today."""
+        with self._lock:
+            if self._record_locked(next(self._sighting_ids), pk, timestamp, attendance, now):
+                self._changed(now)
+
+    def _record_locked(self, log_id, pk, timestamp, attendance, now):
+        added = self._add_locked(log_id, pk, timestamp, attendance, now)
+        if added and len(self._recent[pk]) == 1 and pk in self._employees:
+            self.present += 1
+        return added
+
+    def _add_locked(self, log_id, pk, timestamp, attendance, now):
+        """Insert an attendance in timestamp order; False for duplicates and times outside the window."""
+        if pk is None or log_id in self._ids or not now - self.window <= timestamp <= now:
+            return False
+        bisect.insort(self._recent.setdefault(pk, []), (timestamp, log_id, attendance), key=lambda e: e[:2])
+        heapq.heappush(self._timeline, (timestamp, log_id, pk))
+        self._ids.add(log_id)
+        return True
+
+    def expire(self, now):
+        """Drop attendances older than the window; only touches the expired entries."""
+        cutoff = now - self.window
+        with self._lock:
+            changed = False
+            while self._timeline and self._timeline[0][0] < cutoff:
+                _, log_id, pk = heapq.heappop(self._timeline)
+                self._ids.discard(log_id)
+                entries = self._recent.get(pk)
+                if entries and entries[0][1] == log_id:
+                    del entries[0]
+                    changed = True
+                if entries is not None and not entries:
+                    del self._recent[pk]
+                    if pk in self._employees:
+                        self.present -= 1
+            if changed:
+                self._changed(now)
+
+    def snapshot(self):
+        """Return (version, payload) for the current state, rebuilding the payload only after a change."""
+        with self._lock:
+            if self._cache is not None and self._cache[0] == self.version:
+                return self._cache
+            total = len(self._order)
+            employees = []
+            for pk in self._order:
+                employee = self._employees[pk]
+                recent = [attendance for _, _, attendance in self._recent.get(pk, ())]
+                employees.append({
+                    'id': employee['id'],
+                    'name': employee['name'],
+                    'employee_id': employee['employee_id'],
+                    'image_url': employee['image_url'],
+                    'thumbnail_url': employee['thumbnail_url'],
+                    'status': 'present' if recent else 'absent',
+                    'attendance_count': len(recent),
+                    'last_detected': recent[-1]['timestamp'] if recent else None,
+                    'recent_attendances': recent
+                })
+            payload = {
+                'employees': employees,
+                'summary': {
+                    'total': total,
+                    'present': self.present,
+                    'absent': total - self.present,
+                    'attendance_rate': round(self.present / total * 100) if total else 0,
+                    'last_updated': self.updated_at.strftime('%Y-%m-%d %H:%M:%S') if self.updated_at else None
+                }
+            }
+            self._cache = (self.version, payload)
+            return self._cache
@@ -0,0 +1,171 @@
+"""
+On-demand profiling of live recognition for the Criminal Face Detection system.
+
+Two modes, both bounded to a number of seconds:
+
+- sample: a background thread snapshots the stacks of the selected threads
+  every few milliseconds and returns them as collapsed stacks (one
+  "thread;outer;...;inner count" line per stack), the input format of
+  flamegraph.pl and speedscope. Works on any thread and costs the profiled
+  threads nothing.
+- cprofile: the selected camera pipelines run their per-frame stage work
+  under one cProfile.Profile per stage thread; the profiles are merged and
+  returned in the pstats file format (load with pstats.Stats(path)).
+  Only pipeline stage calls are profiled, never request handlers or other
+  threads; use sample for those.
+
+A camera is selected by its pipeline name (camera-<id>); without a name every
+thread (sample) or every pipeline (cprofile) of the process is profiled.
+
+Python 3.12+ runs cProfile on sys.monitoring, which allows one active profiler
+per process: there a cprofile capture profiles a single stage thread, and when
+another profiler is already active the capture falls back to sampling. Either
+limit is reported as a note next to the result.
+"""
+import collections
+import cProfile
+import marshal
+import os
+import pstats
+import sys
+import threading
+import time
+
+from camera_pipeline import running_pipelines
+
+MODES = ('sample', 'cprofile')
+SINGLE_PROFILER = sys.version_info >= (3, 12)
+
+
+class ThreadProfiles:
+    """
+    cProfile capture shared by cooperating threads: call() runs a function under
+    the calling thread's own profiler until the capture's deadline has passed.
+    With single_thread only the first thread to call is profiled.
+    """
+
+    def __init__(self, seconds, single_thread=SINGLE_PROFILER):
+        self.deadline = time.monotonic() + seconds
+        self.single_thread = single_thread
+        self.thread_names = []
+        self.unprofiled = 0  # Calls that ran bare because another profiler was active
+        self._profiles = {}
+        self._lock = threading.Lock()
+
+    def call(self, func, *args):
+        if time.monotonic() >= self.deadline:
+            return func(*args)
+        ident = threading.get_ident()
+        profile = self._profiles.get(ident)
+        if profile is None:
+            with self._lock:
+                if ident not in self._profiles and not (self.single_thread and self._profiles):
+                    self._profiles[ident] = cProfile.Profile()
+                    self.thread_names.append(threading.current_thread().name)
+                profile = self._profiles.get(ident)
+            if profile is None:
+                return func(*args)
+        try:
+            profile.enable()
+        except ValueError:
+            with self._lock:
+                self.unprofiled += 1
+            return func(*args)
+        try:
+            return func(*args)
+        finally:
+            profile.disable()
+
+    def dump(self):
+        """Merged profiles as the contents of a pstats file"""
+        stats = None
+        with self._lock:
+            profiles = list(self._profiles.values())
+        for profile in profiles:
+            if stats is None:
+                stats = pstats.Stats(profile)
+            else:
+                stats.add(profile)
+        return marshal.dumps(stats.stats if stats is not None else {})
+
+    def note(self):
+        """What this capture left out, or None"""
+        notes = []
+        if self.single_thread and self.thread_names:
+            notes.append(f'Python 3.12+ allows one cProfile per process: only {self.thread_names[0]} was profiled')
+        if self.unprofiled:
+            notes.append(f'{self.unprofiled} stage calls ran unprofiled while another profiler was active')
+        return '; '.join(notes) or None
+
+
+def cprofile_available():
+    """False when another profiler already holds this process's only profiler slot (Python 3.12+)"""
+    if not SINGLE_PROFILER:
+        return True
+    profile = cProfile.Profile()
+    try:
+        profile.enable()
+    except ValueError:
+        return False
+    profile.disable()
+    return True
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+
+
+def sample_stacks(seconds, interval=0.005, thread_prefix=None):
+    """
+    Sample the stacks of every other thread (or those whose name starts with
+    thread_prefix) and return them in collapsed stack format.
+    """
+    counts = collections.Counter()
+    me = threading.get_ident()
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            name = names.get(ident, str(ident))
+            if ident == me or (thread_prefix and not name.startswith(thread_prefix)):
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(name)
+            counts[';'.join(reversed(stack))] += 1
+        time.sleep(interval)
+    return ''.join(f'{stack} {count}\n' for stack, count in counts.most_common())
+
+
+def capture_profile(mode, seconds, pipeline_name=None, interval=0.005):
+    """
+    Profile this process, or one camera pipeline of it, for `seconds`.
+    :param mode: 'sample' or 'cprofile'
+    :param pipeline_name: CameraPipeline name (camera-<id>); None profiles every thread
+                          (sample) or every pipeline's stage calls (cprofile) of the process
+    :return: (file contents, file extension, note on what the capture left out or None)
+    """
+    if mode not in MODES:
+        raise ValueError(f"mode must be one of {', '.join(MODES)}")
+    pipelines = [p for p in running_pipelines() if pipeline_name is None or p.name == pipeline_name]
+    if pipeline_name is not None and not pipelines:
+        raise LookupError(f'{pipeline_name} is not running in this process')
+    note = None
+    if mode == 'cprofile' and not cprofile_available():
+        mode, note = 'sample', 'Another profiler is active in this process; captured a sampling profile instead'
+    if mode == 'sample':
+        prefix = f'{pipeline_name}-' if pipeline_name is not None else None
+        return sample_stacks(seconds, interval, prefix).encode(), 'collapsed', note
+    profiles = ThreadProfiles(seconds)
+    for pipeline in pipelines:
+        pipeline.profiler = profiles
+    try:
+        time.sleep(seconds)
+    finally:
+        for pipeline in pipelines:
+            if pipeline.profiler is profiles:
+                pipeline.profiler = None
+    return profiles.dump(), 'pstats', profiles.note()
@@ -0,0 +1,568 @@
+"""
+Headless background recognition for the Criminal Face Detection system.
+
+The supervisor keeps one recognition session running for every active
+CameraFeed whether or not anyone is watching, restarts sessions whose source
+drops, and follows camera add/edit/delete through reconcile(). Cameras can be
+spread over a pool of worker processes so recognition uses every core; the
+MJPEG endpoint then only subscribes to frames forwarded from the worker,
+which encodes each stream variant being watched once for all viewers.
+
+Worker processes are started with forkserver (or spawn), never forked from
+the threaded web process: a forked child can inherit locks held by other
+threads. Everything sent to a worker is pickled, so the callables must be
+module-level functions; the worker imports their module and builds its own
+app, database engine and gallery from it.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import uuid
+
+from camera_sessions import CameraSessionRegistry, FrameBroadcaster
+
+
+class CameraWorkerHost:
+    """
+    Keeps headless sessions alive for a set of cameras in the current process.
+
+    Holding one reference per camera in the registry is what keeps the
+    pipeline running with no viewers attached.
+    """
+
+    def __init__(self, registry, start_camera, restart_delay=5.0, on_status=None):
+        self.registry = registry
+        self.start_camera = start_camera
+        self.restart_delay = restart_delay
+        self.on_status = on_status or (lambda feed_id, state, message=None: None)
+        self._lock = threading.Lock()
+        self._sessions = {}
+        self._retry_at = {}
+
+    def start(self, feed_id):
+        with self._lock:
+            if feed_id in self._sessions:
+                return
+            self._retry_at[feed_id] = 0.0
+        self._try_start(feed_id)
+
+    def _try_start(self, feed_id):
+        try:
+            session = self.registry.acquire(feed_id, lambda: self.start_camera(feed_id))
+        except Exception as e:
+            with self._lock:
+                if feed_id in self._retry_at:
+                    self._retry_at[feed_id] = time.monotonic() + self.restart_delay
+            self.on_status(feed_id, 'down', str(e))
+            return
+        with self._lock:
+            wanted = feed_id in self._retry_at
+            if wanted:
+                self._sessions[feed_id] = session
+        if wanted:
+            self.on_status(feed_id, 'up')
+        else:
+            # Stopped while the source was opening
+            self.registry.release(session)
+
+    def stop(self, feed_id):
+        with self._lock:
+            self._retry_at.pop(feed_id, None)
+            session = self._sessions.pop(feed_id, None)
+        if session is not None:
+            self.registry.release(session)
+            self.on_status(feed_id, 'stopped')
+
+    def stop_all(self):
+        for feed_id in list(self._retry_at):
+            self.stop(feed_id)
+
+    def check(self):
+        """Release sessions whose source ended and retry cameras that are down."""
+        now = time.monotonic()
+        with self._lock:
+            dead = [(fid, s) for fid, s in self._sessions.items() if s.broadcaster.closed]
+            for feed_id, _ in dead:
+                del self._sessions[feed_id]
+                self._retry_at[feed_id] = now + self.restart_delay
+            due = [fid for fid, at in self._retry_at.items() if fid not in self._sessions and at <= now]
+        for feed_id, session in dead:
+            error = session.broadcaster.error
+            self.registry.release(session)
+            self.on_status(feed_id, 'down', str(error) if error else 'stream ended')
+        for feed_id in due:
+            self._try_start(feed_id)
+
+    def session(self, feed_id):
+        with self._lock:
+            return self._sessions.get(feed_id)
+
+    def feed_ids(self):
+        with self._lock:
+            return list(self._retry_at)
+
+
+class _LatestFrames:
+    """
+    Child-side mailbox holding only the newest frame per camera. A sender thread
+    moves frames to the bounded frame queue as the parent takes them, so a slow
+    parent makes the worker skip frames instead of queueing them without limit.
+    """
+
+    def __init__(self, frame_q):
+        self._frame_q = frame_q
+        self._cond = threading.Condition()
+        self._latest = {}
+        threading.Thread(target=self._send, name='frame-sender', daemon=True).start()
+
+    def put(self, feed_id, parts):
+        with self._cond:
+            self._latest.pop(feed_id, None)  # Replace the unsent frame and queue this camera last
+            self._latest[feed_id] = parts
+            self._cond.notify()
+
+    def _send(self):
+        while True:
+            with self._cond:
+                while not self._latest:
+                    self._cond.wait()
+                feed_id = next(iter(self._latest))
+                parts = self._latest.pop(feed_id)
+            self._frame_q.put((feed_id, parts))  # Blocks while the parent is behind
+
+
+def _forward_frames(host, feed_id, latest, watching, variants):
+    """
+    Child-side: forward a camera's newest frames to the parent while it has viewers,
+    as {variant: MJPEG part} for the variants (see mjpeg.stream_variant) being watched.
+    """
+    while watching.get(feed_id) is variants and variants:
+        session = host.session(feed_id)
+        if session is None:
+            time.sleep(0.5)
+            continue
+        try:
+            for frame in session.frames(timeout=0.5):
+                if watching.get(feed_id) is not variants or not variants:
+                    return
+                latest.put(feed_id, {variant: frame.part(variant) for variant in list(variants)})
+        except Exception:
+            time.sleep(0.5)
+
+
+def _worker_process_main(start_camera, child_init, child_exit, control_q, result_q, frame_q, restart_delay,
+                         check_interval, child_metrics=None, child_profile=None):
+    """Entry point of a recognition worker process."""
+    events = child_init() if child_init is not None else None
+    if events is not None:
+        # Events published in this process are relayed to the parent's bus
+        events.forward_to(lambda event_type, data: result_q.put(('event', event_type, data)))
+
+    def on_status(feed_id, state, message=None):
+        result_q.put(('status', feed_id, state, message))
+
+    host = CameraWorkerHost(CameraSessionRegistry(), start_camera, restart_delay, on_status)
+    latest = _LatestFrames(frame_q)
+    watching = {}
+    while True:
+        try:
+            command = control_q.get(timeout=check_interval)
+        except queue.Empty:
+            host.check()
+            if child_metrics is not None:
+                result_q.put(('metrics', os.getpid(), child_metrics()))
+            continue
+        op, feed_id = command[0], command[1] if len(command) > 1 else None
+        if op == 'start':
+            threading.Thread(target=host.start, args=(feed_id,), daemon=True).start()
+        elif op == 'stop':
+            watching.pop(feed_id, None)
+            host.stop(feed_id)
+        elif op == 'watch':
+            variants = watching.get(feed_id)
+            if variants is not None:
+                variants.add(command[2])
+            else:
+                variants = watching[feed_id] = {command[2]}
+                threading.Thread(target=_forward_frames, args=(host, feed_id, latest, watching, variants),
+                                 daemon=True).start()
+        elif op == 'unwatch':
+            variants = watching.get(feed_id)
+            if variants is not None:
+                variants.discard(command[2])
+                if not variants:
+                    del watching[feed_id]
+        elif op == 'profile' and child_profile is not None:
+            threading.Thread(target=_run_profile, args=(child_profile, feed_id, command[2], command[3], result_q),
+                             daemon=True).start()
+        elif op == 'shutdown':
+            host.stop_all()
+            if child_exit is not None:
+                child_exit()
+            return
+
+
+def _run_profile(child_profile, feed_id, request_id, args, result_q):
+    try:
+        result_q.put(('profile', request_id, child_profile(feed_id, *args), None))
+    except LookupError as e:
+        result_q.put(('profile', request_id, None, (LookupError, str(e))))
+    except Exception as e:
+        result_q.put(('profile', request_id, None, (RuntimeError, str(e))))
+
+
+class _WorkerProcess:
+    def __init__(self, index, ctx, start_camera, child_init, child_exit, restart_delay, check_interval,
+                 child_metrics=None, child_profile=None):
+        self.index = index
+        self.ctx = ctx
+        self.start_camera = start_camera
+        self.child_init = child_init
+        self.child_exit = child_exit
+        self.restart_delay = restart_delay
+        self.check_interval = check_interval
+        self.child_metrics = child_metrics
+        self.child_profile = child_profile
+        self.control_q = None
+        self.process = None
+        self.feed_ids = set()
+
+    def spawn(self, result_q, frame_q):
+        self.control_q = self.ctx.Queue()
+        self.process = self.ctx.Process(
+            target=_worker_process_main,
+            args=(self.start_camera, self.child_init, self.child_exit, self.control_q, result_q, frame_q,
+                  self.restart_delay, self.check_interval, self.child_metrics, self.child_profile),
+            name=f'recognition-worker-{self.index}',
+            daemon=True
+        )
+        self.process.start()
+
+
+class _RemoteViewer:
+    """Parent-side subscription to frames forwarded by a worker process."""
+
+    def __init__(self):
+        self.broadcaster = FrameBroadcaster()
+        self.viewers = 0
+        self.variants = {}
+
+    def frames(self, variant, timeout=1.0):
+        seq = 0
+        while not self.broadcaster.closed:
+            parts, seq = self.broadcaster.wait_next(seq, timeout)
+            part = parts.get(variant) if parts is not None else None
+            if part is not None:
+                yield part
+
+
+class RecognitionSupervisor:
+    """
+    Runs recognition for every active camera without any HTTP client attached.
+
+    :param start_camera: callable(feed_id) -> started pipeline, used in whichever
+                         process hosts the camera. This and the other child_*
+                         callables are pickled to worker processes, so they must be
+                         module-level functions
+    :param list_feeds: callable() -> {feed_id: signature} of cameras that should
+                       run; a changed signature restarts that camera
+    :param processes: worker processes to spread cameras over; 0 runs them as
+                      threads in this process, sharing its session registry
+    :param registry: session registry used in thread mode, so viewers join the
+                     running session instead of opening the camera again
+    :param child_init: callable run first in each worker process (e.g. to load the
+                       gallery); may return the worker's event_bus.EventBus, whose
+                       events are then relayed to the parent's events
+    :param child_exit: callable run in each worker process on shutdown (e.g. to
+                       flush buffered writes)
+    :param events: optional event_bus.EventBus; camera state changes are published
+                   to it and worker processes relay their own events into it
+    :param child_metrics: callable run in each worker process every check_interval,
+                          returning a picklable metrics snapshot relayed to the parent
+    :param fold_metrics: callable(total, snapshot) returning the running total with the
+                         last snapshot of an exited worker added (metrics.MetricsRegistry.fold);
+                         without it an exited worker's metrics are dropped
+    :param child_profile: callable(feed_id, *args) run in the worker hosting a camera
+                          by profile(), returning a picklable result
+    :param reconcile_interval: also re-read list_feeds() this often, to follow
+                               camera edits made by other processes
+    """
+
+    def __init__(self, start_camera, list_feeds, processes=0, registry=None, child_init=None, child_exit=None,
+                 events=None, restart_delay=5.0, check_interval=1.0, reconcile_interval=10.0, child_metrics=None,
+                 child_profile=None, fold_metrics=None):
+        self.start_camera = start_camera
+        self.events = events
+        self.list_feeds = list_feeds
+        self.check_interval = check_interval
+        self.restart_delay = restart_delay
+        self.reconcile_interval = reconcile_interval
+        self._lock = threading.Lock()
+        self._signatures = {}
+        self._status = {}
+        self._viewers = {}
+        self.fold_metrics = fold_metrics
+        self._worker_metrics = {}
+        self._retired_metrics = None
+        self._profiles = {}
+        self._stop = threading.Event()
+        self._workers = []
+        self._result_q = None
+        self._frame_q = None
+        self._host = None
+        if processes:
+            ctx = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+            self._result_q = ctx.Queue()
+            # Bounded: workers keep only their newest frame per camera while this is full
+            self._frame_q = ctx.Queue(maxsize=2 * processes)
+            self._workers = [_WorkerProcess(i, ctx, start_camera, child_init, child_exit, restart_delay,
+                                           check_interval, child_metrics, child_profile)
+                             for i in range(processes)]
+        else:
+            self.registry = registry or CameraSessionRegistry()
+            self._host = CameraWorkerHost(self.registry, start_camera, restart_delay, self._record_status)
+
+    @property
+    def uses_processes(self):
+        return bool(self._workers)
+
+    def start(self):
+        for worker in self._workers:
+            worker.spawn(self._result_q, self._frame_q)
+        if self._result_q is not None:
+            threading.Thread(target=self._pump_results, name='recognition-results', daemon=True).start()
+            threading.Thread(target=self._pump_frames, name='recognition-frames', daemon=True).start()
+        threading.Thread(target=self._monitor, name='recognition-supervisor', daemon=True).start()
+        self.reconcile()
+        return self
+
+    def shutdown(self):
+        self._stop.set()
+        if self._host is not None:
+            self._host.stop_all()
+        for worker in self._workers:
+            worker.control_q.put(('shutdown',))
+        for worker in self._workers:
+            if worker.process.is_alive():
+                worker.process.join(timeout=5)
+
+    def reconcile(self):
+        """Start, stop or restart cameras so the running set matches list_feeds()."""
+        desired = self.list_feeds()
+        with self._lock:
+            current = dict(self._signatures)
+            self._signatures = dict(desired)
+            removed_viewers = [self._viewers.pop(fid) for fid in list(self._viewers) if fid not in desired]
+        for viewer in removed_viewers:
+            viewer.broadcaster.close()
+        for feed_id, signature in current.items():
+            if desired.get(feed_id) != signature:
+                self._stop_camera(feed_id)
+        for feed_id, signature in desired.items():
+            if current.get(feed_id) != signature:
+                self._start_camera(feed_id)
+
+    def _start_camera(self, feed_id):
+        if self._host is not None:
+            threading.Thread(target=self._host.start, args=(feed_id,), daemon=True).start()
+            return
+        worker = min(self._workers, key=lambda w: len(w.feed_ids))
+        worker.feed_ids.add(feed_id)
+        worker.control_q.put(('start', feed_id))
+        with self._lock:
+            viewer = self._viewers.get(feed_id)
+            for variant in (viewer.variants if viewer is not None else ()):
+                worker.control_q.put(('watch', feed_id, variant))
+
+    def _stop_camera(self, feed_id):
+        if self._host is not None:
+            self._host.stop(feed_id)
+            # Viewers may still hold the old session; close it so it reopens with the new settings
+            self.registry.terminate(feed_id)
+            return
+        for worker in self._workers:
+            if feed_id in worker.feed_ids:
+                worker.feed_ids.discard(feed_id)
+                worker.control_q.put(('stop', feed_id))
+        with self._lock:
+            self._status[feed_id] = {'state': 'stopped', 'message': None, 'since': time.time()}
+
+    def owns(self, feed_id):
+        with self._lock:
+            return feed_id in self._signatures
+
+    def watch(self, feed_id, variant):
+        """
+        Subscribe to a worker-process camera in one stream variant; returns an object
+        with frames(variant). Only meaningful when uses_processes, thread-mode viewers
+        join the shared registry.
+        """
+        with self._lock:
+            viewer = self._viewers.get(feed_id)
+            if viewer is None:
+                viewer = self._viewers[feed_id] = _RemoteViewer()
+            viewer.viewers += 1
+            viewer.variants[variant] = viewer.variants.get(variant, 0) + 1
+            first = viewer.variants[variant] == 1
+        if first:
+            for worker in self._workers:
+                if feed_id in worker.feed_ids:
+                    worker.control_q.put(('watch', feed_id, variant))
+        return viewer
+
+    def unwatch(self, feed_id, viewer, variant):
+        with self._lock:
+            viewer.viewers -= 1
+            viewer.variants[variant] -= 1
+            last_of_variant = viewer.variants[variant] == 0
+            if last_of_variant:
+                del viewer.variants[variant]
+            last = viewer.viewers == 0
+            # A viewer closed by _close_viewer already unwatched its variants
+            attached = self._viewers.get(feed_id) is viewer
+            if last and attached:
+                del self._viewers[feed_id]
+        if last:
+            viewer.broadcaster.close()
+        if last_of_variant and attached:
+            for worker in self._workers:
+                if feed_id in worker.feed_ids:
+                    worker.control_q.put(('unwatch', feed_id, variant))
+
+    def _close_viewer(self, feed_id, message, worker_alive=True):
+        """End the MJPEG responses relaying a camera that went down, instead of leaving them waiting for frames"""
+        with self._lock:
+            viewer = self._viewers.pop(feed_id, None)
+        if viewer is None:
+            return
+        viewer.broadcaster.close(message)
+        if worker_alive:
+            for worker in self._workers:
+                if feed_id in worker.feed_ids:
+                    for variant in list(viewer.variants):
+                        worker.control_q.put(('unwatch', feed_id, variant))
+
+    def _record_status(self, feed_id, state, message=None):
+        with self._lock:
+            previous = self._status.get(feed_id, {}).get('state')
+            self._status[feed_id] = {'state': state, 'message': message, 'since': time.time()}
+        if state == 'down':
+            print(f"Recognition for camera {feed_id} down: {message}")
+            self._close_viewer(feed_id, message)
+        if self.events is not None and state != previous:
+            self.events.publish('camera_status', {'camera_feed_id': feed_id, 'state': state, 'message': message})
+
+    def _pump_results(self):
+        while not self._stop.is_set():
+            try:
+                message = self._result_q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            if message[0] == 'status':
+                self._record_status(*message[1:])
+            elif message[0] == 'event' and self.events is not None:
+                self.events.publish(message[1], message[2])
+            elif message[0] == 'profile':
+                with self._lock:
+                    pending = self._profiles.get(message[1])
+                if pending is not None:
+                    pending['result'], pending['error'] = message[2], message[3]
+                    pending['done'].set()
+            elif message[0] == 'metrics':
+                with self._lock:
+                    # A late report of an exited worker was already folded into the retired total
+                    if any(w.process is not None and w.process.pid == message[1] for w in self._workers):
+                        self._worker_metrics[message[1]] = message[2]
+
+    def _pump_frames(self):
+        while not self._stop.is_set():
+            try:
+                feed_id, frame = self._frame_q.get(timeout=1.0)
+            except queue.Empty:
+                continue
+            with self._lock:
+                viewer = self._viewers.get(feed_id)
+            if viewer is not None:
+                viewer.broadcaster.publish(frame)
+
+    def _monitor(self):
+        last_reconcile = time.monotonic()
+        while not self._stop.wait(self.check_interval):
+            if self.reconcile_interval and time.monotonic() - last_reconcile >= self.reconcile_interval:
+                last_reconcile = time.monotonic()
+                try:
+                    self.reconcile()
+                except Exception as e:
+                    print(f"Error reconciling camera feeds: {e}")
+            if self._host is not None:
+                self._host.check()
+            for worker in self._workers:
+                if not worker.process.is_alive() and not self._stop.is_set():
+                    print(f"Recognition worker {worker.index} exited, restarting")
+                    self._retire_metrics(worker.process.pid)
+                    for feed_id in worker.feed_ids:
+                        self._close_viewer(feed_id, 'recognition worker exited', worker_alive=False)
+                    worker.spawn(self._result_q, self._frame_q)
+                    for feed_id in worker.feed_ids:
+                        worker.control_q.put(('start', feed_id))
+
+    def _retire_metrics(self, pid):
+        with self._lock:
+            snapshot = self._worker_metrics.pop(pid, None)
+            if snapshot is not None and self.fold_metrics is not None:
+                self._retired_metrics = self.fold_metrics(self._retired_metrics, snapshot)
+
+    def profile(self, feed_id, args, timeout):
+        """
+        Run child_profile(feed_id, *args) in the worker process hosting the camera and
+        return its result. Raises LookupError when no worker runs the camera, RuntimeError
+        for other errors in the worker and TimeoutError when no answer comes within timeout.
+        """
+        worker = next((w for w in self._workers if feed_id in w.feed_ids), None)
+        if worker is None:
+            raise LookupError(f'Camera {feed_id} is not running in a worker process')
+        request_id = uuid.uuid4().hex
+        pending = {'done': threading.Event(), 'result': None, 'error': None}
+        with self._lock:
+            self._profiles[request_id] = pending
+        try:
+            worker.control_q.put(('profile', feed_id, request_id, tuple(args)))
+            if not pending['done'].wait(timeout):
+                raise TimeoutError(f'No profile from the worker of camera {feed_id}')
+        finally:
+            with self._lock:
+                self._profiles.pop(request_id, None)
+        if pending['error'] is not None:
+            error_type, message = pending['error']
+            raise error_type(message)
+        return pending['result']
+
+    def worker_metrics(self):
+        """
+        Latest metrics snapshot of every live worker process, plus the folded total of
+        exited ones (see metrics.MetricsRegistry.render)
+        """
+        with self._lock:
+            snapshots = list(self._worker_metrics.values())
+            if self._retired_metrics is not None:
+                snapshots.append(self._retired_metrics)
+            return snapshots
+
+    def status(self):
+        with self._lock:
+            cameras = {feed_id: dict(self._status.get(feed_id, {'state': 'starting'})) for feed_id in self._signatures}
+            viewers = {feed_id: v.viewers for feed_id, v in self._viewers.items()}
+        for feed_id, info in cameras.items():
+            info['remote_viewers'] = viewers.get(feed_id, 0)
+            for worker in self._workers:
+                if feed_id in worker.feed_ids:
+                    info['worker'] = worker.index
+        return {
+            'mode': 'processes' if self._workers else 'threads',
+            'workers': [{'index': w.index, 'alive': w.process is not None and w.process.is_alive(),
+                         'cameras': sorted(w.feed_ids)} for w in self._workers],
+            'cameras': cameras
+        }
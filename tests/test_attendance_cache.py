@@ -0,0 +1,56 @@
+"""
+Tests for the in-memory attendance dedup cache.
+"""
+from datetime import datetime, timedelta
+
+from attendance_cache import AttendanceDedup
+
+NOON = datetime(2026, 10, 18, 12, 0, 0)
+
+def test_once_per_day_by_default():
+    dedup = AttendanceDedup()
+    assert dedup.claim(7, 1, NOON)
+    assert not dedup.claim(7, 2, NOON + timedelta(hours=6))
+    assert dedup.claim(8, 1, NOON)  # Keyed by employee pk, not by name
+
+def test_opt_in_relog_and_warm_start():
+    dedup = AttendanceDedup(relog_seconds=30)
+    dedup.warm([(1, 1, NOON - timedelta(seconds=10)), (2, 2, NOON - timedelta(days=1))], NOON)
+    assert not dedup.claim(1, 3, NOON)
+    assert dedup.claim(2, 2, NOON)
+    assert not dedup.claim(2, 2, NOON + timedelta(seconds=29))
+    assert dedup.claim(2, 2, NOON + timedelta(seconds=31))
+    assert dedup.stats()['hits'] == 2
+
+def test_once_per_day_per_camera_with_midnight_rollover():
+    dedup = AttendanceDedup(relog_seconds=0, per_camera=True)
+    assert dedup.claim(1, 1, NOON)
+    assert dedup.claim(1, 2, NOON)
+    assert not dedup.claim(1, 1, NOON + timedelta(hours=11))
+    assert dedup.claim(1, 1, NOON + timedelta(hours=12))
+    dedup.release(1, 1)
+    assert dedup.claim(1, 1, NOON + timedelta(hours=12, seconds=1))
+
+def test_misses_check_the_database_and_hits_do_not():
+    logged = {(5, NOON.date()): NOON - timedelta(hours=1)}  # Written by another process
+    lookups = []
+    def lookup(employee_pk, camera_feed_id, day):
+        lookups.append(employee_pk)
+        return logged.get((employee_pk, day))
+    dedup = AttendanceDedup(lookup=lookup)
+    assert not dedup.claim(5, 1, NOON)
+    assert dedup.claim(6, 1, NOON)
+    assert not dedup.claim(5, 2, NOON) and not dedup.claim(6, 2, NOON)
+    assert lookups == [5, 6] and dedup.stats()['lookups'] == 2
+
+def test_rollover_warms_the_new_day_from_the_loader():
+    tomorrow = NOON + timedelta(days=1)
+    loaded = []
+    def loader(day):
+        loaded.append(day)
+        return [(3, 1, tomorrow - timedelta(hours=2))]
+    dedup = AttendanceDedup(loader=loader)
+    assert dedup.claim(3, 1, NOON)
+    assert not dedup.claim(3, 1, tomorrow)
+    assert loaded == [NOON.date(), tomorrow.date()]
+    assert dedup.claim(4, 1, tomorrow)
@@ -0,0 +1,33 @@
+"""
+Tests for the write-behind attendance writer.
+"""
+import threading
+
+from attendance_writer import AttendanceWriter
+
+def test_rows_are_batched_and_flushed_on_stop():
+    batches = []
+    flushed = threading.Event()
+    def flush_rows(rows):
+        batches.append(list(rows))
+        flushed.set()
+    writer = AttendanceWriter(flush_rows, max_batch=3, flush_interval_ms=10000).start()
+    for i in range(4):
+        assert writer.submit({'employee_name': f'e{i}'})
+    assert flushed.wait(2)
+    writer.stop()
+    assert [len(b) for b in batches] == [3, 1]
+    stats = writer.stats()
+    assert stats['written'] == 4 and stats['batches'] == 2 and stats['queue_depth'] == 0
+
+def test_failed_and_dropped_rows_are_reported():
+    failed = []
+    def flush_rows(rows):
+        raise RuntimeError('database is locked')
+    writer = AttendanceWriter(flush_rows, max_queue=1, on_failure=failed.extend)
+    assert writer.submit({'employee_name': 'a'})
+    assert not writer.submit({'employee_name': 'b'})
+    writer.start()
+    writer.stop()
+    assert [r['employee_name'] for r in failed] == ['b', 'a']
+    assert writer.stats()['dropped'] == 1 and writer.stats()['failed'] == 1
@@ -0,0 +1,109 @@
+"""
+Tests for bulk employee enrollment jobs.
+"""
+import zipfile
+
+import numpy as np
+
+from bulk_enrollment import BulkEnrollmentJob, DirectorySource, ZipSource, parse_manifest
+
+def fake_encode(task):
+    """Pool worker stand-in: images starting with b'none' have no face, b'two' have two"""
+    row_number, data, _ = task
+    if data.startswith(b'none'):
+        return row_number, None, 'No face detected in image'
+    if data.startswith(b'two'):
+        return row_number, None, '2 faces detected in image'
+    return row_number, np.full(128, len(data), dtype=np.float32), None
+
+def build_zip(path, manifest, images):
+    with zipfile.ZipFile(path, 'w') as z:
+        z.writestr('batch/manifest.csv', manifest)
+        for name, data in images.items():
+            z.writestr(f'batch/{name}', data)
+
+def run_job(source, enrolled_ids=(), enrolled_hashes=(), chunk_rows=2):
+    chunks = []
+    def commit_chunk(rows):
+        chunks.append([row['employee_id'] for row in rows])
+        return {row['_row']: 'UNIQUE constraint failed' for row in rows if row['employee_id'] == 'E-race'}
+    job = BulkEnrollmentJob(
+        source,
+        existing_ids=lambda ids: ids & set(enrolled_ids),
+        existing_hashes=lambda hashes: hashes & set(enrolled_hashes),
+        commit_chunk=commit_chunk,
+        processes=2,
+        chunk_rows=chunk_rows,
+        encode=fake_encode
+    )
+    job.run()
+    return job, chunks
+
+def test_manifest_requires_columns():
+    assert parse_manifest('Name,Employee_ID,Image\na,1,a.jpg\n') == [{'name': 'a', 'employee_id': '1', 'image': 'a.jpg'}]
+    try:
+        parse_manifest('name,image\n')
+        assert False, 'missing employee_id column accepted'
+    except ValueError as e:
+        assert 'employee_id' in str(e)
+
+def test_zip_job_reports_per_row_errors_and_commits_in_chunks(tmp_path):
+    manifest = ('name,employee_id,image,description\n'
+                'Ann,E1,ann.jpg,\n'
+                'Bob,E2,bob.jpg,\n'
+                'Cat,E3,cat.jpg,\n'
+                'Dup,E1,dup.jpg,\n'
+                'Copy,E4,copy.jpg,\n'
+                'Nobody,E5,none.jpg,\n'
+                'Pair,E6,two.jpg,\n'
+                'Old,E7,old.jpg,\n'
+                'Lost,E8,lost.jpg,\n'
+                'Race,E-race,race.jpg,\n'
+                'Doc,E9,doc.pdf,\n')
+    images = {'ann.jpg': b'ann', 'bob.jpg': b'bobby', 'cat.jpg': b'cat!', 'dup.jpg': b'dup', 'copy.jpg': b'ann',
+              'none.jpg': b'none', 'two.jpg': b'two', 'old.jpg': b'old', 'race.jpg': b'race'}
+    archive = tmp_path / 'batch.zip'
+    build_zip(archive, manifest, images)
+
+    job, chunks = run_job(ZipSource(str(archive), delete=True), enrolled_ids={'E7'})
+
+    status = job.status()
+    assert status['state'] == 'completed', status['message']
+    assert status['total'] == 11 and status['processed'] == 11
+    assert status['enrolled'] == 3
+    errors = {e['row']: e['error'] for e in status['errors']}
+    assert errors == {
+        5: 'Duplicate employee_id in manifest',
+        6: 'Same image as row 2',
+        7: 'No face detected in image',
+        8: '2 faces detected in image',
+        9: 'employee_id already enrolled',
+        10: 'Image lost.jpg not found',
+        11: 'UNIQUE constraint failed',
+        12: 'Unsupported image type',
+    }
+    assert [len(c) for c in chunks] == [2, 2]
+    assert not archive.exists()
+
+def test_directory_job_skips_enrolled_hashes_and_escapes(tmp_path):
+    import hashlib
+    (tmp_path / 'a.jpg').write_bytes(b'aaa')
+    (tmp_path / 'b.jpg').write_bytes(b'bbb')
+    (tmp_path.parent / 'secret.jpg').write_bytes(b'secret')
+    manifest = 'name,employee_id,image\nA,1,a.jpg\nB,2,b.jpg\nX,3,../secret.jpg\n'
+
+    job, chunks = run_job(DirectorySource(str(tmp_path), manifest),
+                          enrolled_hashes={hashlib.sha256(b'bbb').hexdigest()}, chunk_rows=10)
+
+    status = job.status()
+    assert status['enrolled'] == 1 and chunks == [['1']]
+    assert {e['row']: e['error'] for e in status['errors']} == {
+        3: 'Image already enrolled', 4: 'Image ../secret.jpg not found'}
+
+def test_missing_manifest_fails_job(tmp_path):
+    archive = tmp_path / 'empty.zip'
+    with zipfile.ZipFile(archive, 'w') as z:
+        z.writestr('a.jpg', b'a')
+    job, _ = run_job(ZipSource(str(archive)))
+    assert job.status()['state'] == 'failed'
+    assert 'manifest.csv' in job.status()['message']
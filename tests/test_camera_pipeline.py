@@ -0,0 +1,75 @@
+"""
+Tests for the staged capture / recognize / encode pipeline.
+"""
+import time
+import pytest
+from camera_pipeline import CameraPipeline
+
+class FakeCamera:
+    def __init__(self, frames, delay=0.0):
+        self.remaining = frames
+        self.delay = delay
+        self.released = False
+
+    def read(self):
+        time.sleep(self.delay)
+        if self.remaining == 0:
+            return False, None
+        self.remaining -= 1
+        return True, self.remaining
+
+    def release(self):
+        self.released = True
+
+def test_file_source_processes_every_frame_in_order():
+    camera = FakeCamera(20)
+    pipeline = CameraPipeline(camera, recognize=lambda f: f * 2, encode=lambda f, r: (f, r), live=False).start()
+    frames = list(pipeline.frames())
+    pipeline.stop()
+    assert frames == [(f, f * 2) for f in range(19, -1, -1)]
+    assert pipeline.snapshot_stats()['encode'] == {'in': 20, 'processed': 20, 'dropped': 0}
+    assert camera.released
+
+def test_live_source_drops_stale_frames_behind_slow_recognition():
+    def slow_recognize(frame):
+        time.sleep(0.02)
+        return None
+    pipeline = CameraPipeline(FakeCamera(100, delay=0.001), recognize=slow_recognize,
+                              encode=lambda f, r: f, live=True).start()
+    frames = list(pipeline.frames())
+    pipeline.stop()
+    stats = pipeline.snapshot_stats()
+    assert stats['capture']['in'] == 100
+    assert stats['capture']['dropped'] > 0
+    assert len(frames) == stats['encode']['processed'] < 100
+
+def test_stage_error_is_raised_from_frames():
+    def broken(frame):
+        raise RuntimeError('detector failed')
+    pipeline = CameraPipeline(FakeCamera(5), recognize=broken, encode=lambda f, r: f, live=False).start()
+    with pytest.raises(RuntimeError, match='detector failed'):
+        list(pipeline.frames())
+    pipeline.stop()
+
+def test_observe_reports_every_stage_per_frame():
+    seen = []
+    pipeline = CameraPipeline(FakeCamera(5), recognize=lambda f: f, encode=lambda f, r: f, live=False,
+                              observe=lambda stage, seconds: seen.append((stage, seconds >= 0))).start()
+    list(pipeline.frames())
+    pipeline.stop()
+    assert sorted(seen) == sorted([(stage, True) for stage in ('capture', 'recognize', 'encode') for _ in range(5)])
+
+def test_frame_timings_are_passed_to_encode():
+    def slow_recognize(frame):
+        time.sleep(0.01)
+        return None
+    pipeline = CameraPipeline(FakeCamera(3), recognize=slow_recognize, encode=lambda f, r, timings: timings,
+                              live=False, timed_encode=True).start()
+    timings = list(pipeline.frames())
+    pipeline.stop()
+    assert len(timings) == 3
+    for t in timings:
+        assert t.recognize >= 0.01
+        breakdown = t.as_ms(t.stage_end - t.captured_at + 0.005)
+        assert set(breakdown) == {'read', 'recognize_wait', 'recognize', 'encode_wait', 'encode', 'deliver'}
+        assert breakdown['deliver'] == pytest.approx(5, abs=0.01)
@@ -0,0 +1,57 @@
+"""
+Tests for shared, ref-counted camera sessions.
+"""
+import threading
+import pytest
+from camera_sessions import CameraSessionRegistry, SourceUnavailable
+
+class FakePipeline:
+    def __init__(self, count):
+        self.count = count
+        self.stopped = threading.Event()
+        self.release = threading.Event()
+
+    def frames(self):
+        self.release.wait(2)
+        for i in range(self.count):
+            yield i
+        self.stopped.wait(2)
+
+    def stop(self):
+        self.stopped.set()
+
+    def snapshot_stats(self):
+        return {}
+
+def test_viewers_share_one_pipeline_until_last_leaves():
+    started = []
+    def factory():
+        started.append(FakePipeline(3))
+        return started[-1]
+    registry = CameraSessionRegistry()
+    first = registry.acquire(7, factory)
+    second = registry.acquire(7, factory)
+    assert first is second and len(started) == 1
+    assert registry.stats()[0]['viewers'] == 2
+    registry.release(first)
+    assert not started[0].stopped.is_set()
+    registry.release(second)
+    assert started[0].stopped.is_set()
+    assert registry.get(7) is None
+
+def test_viewer_receives_latest_frame():
+    pipeline = FakePipeline(3)
+    registry = CameraSessionRegistry()
+    session = registry.acquire(1, lambda: pipeline)
+    pipeline.release.set()
+    frames = session.frames(timeout=0.2)
+    assert next(frames) in (0, 1, 2)
+    registry.release(session)
+
+def test_factory_failure_is_reported_and_not_cached():
+    def factory():
+        raise SourceUnavailable('Camera not available')
+    registry = CameraSessionRegistry()
+    with pytest.raises(SourceUnavailable):
+        registry.acquire(3, factory)
+    assert registry.get(3) is None
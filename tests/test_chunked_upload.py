@@ -0,0 +1,93 @@
+"""
+Tests for resumable chunked uploads.
+"""
+import hashlib
+import io
+
+import pytest
+
+from chunked_upload import ChunkedUploads, UploadError
+
+DATA = bytes(range(256)) * 40
+
+def _uploads(tmp_path, **kwargs):
+    return ChunkedUploads(str(tmp_path / 'chunks'), max_bytes=len(DATA), **kwargs)
+
+def _put(uploads, upload_id, offset, data, sha256=None):
+    return uploads.write(upload_id, offset, io.BytesIO(data), len(data), sha256 or hashlib.sha256(data).hexdigest())
+
+def test_chunks_resume_and_finalize(tmp_path):
+    uploads = _uploads(tmp_path)
+    meta = uploads.init('10.0.0.1', 'clip.mp4', len(DATA), hashlib.sha256(DATA).hexdigest())
+    assert _put(uploads, meta['id'], 0, DATA[:4000]) == 4000
+    with pytest.raises(UploadError) as error:
+        _put(uploads, meta['id'], 8000, DATA[8000:])
+    assert error.value.status == 409 and error.value.offset == 4000
+    # A resent chunk rewrites from its offset
+    assert _put(uploads, meta['id'], 2000, DATA[2000:6000]) == 6000
+    assert uploads.status(meta['id'])['offset'] == 6000
+    with pytest.raises(UploadError) as error:
+        uploads.finalize(meta['id'], str(tmp_path / 'clip.mp4'))
+    assert error.value.status == 409
+    _put(uploads, meta['id'], 6000, DATA[6000:])
+    uploads.finalize(meta['id'], str(tmp_path / 'clip.mp4'))
+    assert (tmp_path / 'clip.mp4').read_bytes() == DATA
+    assert not list((tmp_path / 'chunks').iterdir())
+
+def test_bad_or_short_chunks_are_cut_off(tmp_path):
+    uploads = _uploads(tmp_path)
+    meta = uploads.init('10.0.0.1', 'clip.mp4', len(DATA))
+    _put(uploads, meta['id'], 0, DATA[:1000])
+    with pytest.raises(UploadError) as error:
+        _put(uploads, meta['id'], 1000, DATA[1000:2000], sha256='0' * 64)
+    assert error.value.status == 422 and error.value.offset == 1000
+    with pytest.raises(UploadError) as error:
+        uploads.write(meta['id'], 1000, io.BytesIO(DATA[1000:1500]), 1000, hashlib.sha256(DATA[1000:2000]).hexdigest())
+    assert error.value.status == 400 and uploads.status(meta['id'])['offset'] == 1000
+    with pytest.raises(UploadError) as error:
+        uploads.write(meta['id'], 1000, io.BytesIO(DATA[1000:2000]), 1000, None)
+    assert error.value.status == 400
+
+def test_checksum_mismatch_discards_upload(tmp_path):
+    uploads = _uploads(tmp_path)
+    meta = uploads.init('10.0.0.1', 'clip.mp4', len(DATA))
+    _put(uploads, meta['id'], 0, DATA)
+    with pytest.raises(UploadError) as error:
+        uploads.finalize(meta['id'], str(tmp_path / 'clip.mp4'), sha256='0' * 64)
+    assert error.value.status == 422
+    assert not (tmp_path / 'clip.mp4').exists()
+    with pytest.raises(UploadError) as error:
+        uploads.status(meta['id'])
+    assert error.value.status == 404
+
+def test_size_and_client_limits(tmp_path):
+    uploads = _uploads(tmp_path, max_active_per_client=1)
+    with pytest.raises(UploadError) as error:
+        uploads.init('10.0.0.1', 'big.mp4', len(DATA) + 1)
+    assert error.value.status == 413
+    meta = uploads.init('10.0.0.1', 'clip.mp4', 100)
+    with pytest.raises(UploadError) as error:
+        _put(uploads, meta['id'], 0, DATA[:101])
+    assert error.value.status == 413
+    with pytest.raises(UploadError) as error:
+        uploads.init('10.0.0.1', 'other.mp4', 100)
+    assert error.value.status == 429
+    uploads.init('10.0.0.2', 'other.mp4', 100)
+    uploads.abort(meta['id'])
+    uploads.init('10.0.0.1', 'other.mp4', 100)
+
+def test_idle_uploads_expire(tmp_path):
+    uploads = _uploads(tmp_path, expire_seconds=60)
+    meta = uploads.init('10.0.0.1', 'clip.mp4', 100)
+    uploads.expire(now=meta['created_at'] + 30)
+    assert uploads.status(meta['id'])['offset'] == 0
+    uploads.expire(now=meta['created_at'] + 3600)
+    with pytest.raises(UploadError):
+        uploads.status(meta['id'])
+
+def test_unknown_ids_are_rejected(tmp_path):
+    uploads = _uploads(tmp_path)
+    for upload_id in ('', '../secrets', 'abc123'):
+        with pytest.raises(UploadError) as error:
+            uploads.status(upload_id)
+        assert error.value.status == 404
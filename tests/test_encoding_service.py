@@ -0,0 +1,28 @@
+"""
+Tests for batching face encodings across cameras.
+"""
+import threading
+
+import numpy as np
+from encoding_service import BatchEncoder
+
+def test_concurrent_requests_share_a_batch_and_get_their_own_results():
+    calls = []
+    def encode_batch(images, locations_list):
+        calls.append(len(images))
+        return [[np.full(128, image[0, 0], dtype=np.float32) for _ in locations] for image, locations in zip(images, locations_list)]
+    encoder = BatchEncoder(encode_batch, max_batch=8, max_wait_ms=200).start()
+    results = {}
+    def camera(value, faces):
+        image = np.full((4, 4), value, dtype=np.float32)
+        results[value] = encoder.encode(image, [(0, 1, 1, 0)] * faces)
+    threads = [threading.Thread(target=camera, args=(value, value)) for value in (1, 2, 3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    encoder.stop()
+    assert calls == [3]
+    assert [len(results[v]) for v in (1, 2, 3)] == [1, 2, 3] and results[3][0][0] == 3
+    stats = encoder.stats()
+    assert stats['batches'] == 1 and stats['faces'] == 6 and encoder.encode(None, []) == []
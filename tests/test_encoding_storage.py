@@ -0,0 +1,31 @@
+"""
+Tests for packed float32 encodings and the memory-mapped gallery snapshot.
+"""
+import numpy as np
+import pytest
+
+from encoding_storage import pack_encoding, unpack_encoding, write_gallery_snapshot, open_gallery_snapshot, ENCODING_BYTES
+from face_gallery import FaceGallery
+
+def test_pack_roundtrip_and_unknown_format():
+    encoding = np.linspace(-1, 1, 128)
+    blob = pack_encoding(encoding)
+    assert len(blob) == ENCODING_BYTES and blob[0] == 1
+    assert np.allclose(unpack_encoding(blob), encoding, atol=1e-6)
+    with pytest.raises(ValueError):
+        unpack_encoding(b'\x80' + bytes(512))
+
+def test_snapshot_is_adopted_and_patched_copy_on_write(tmp_path):
+    rng = np.random.default_rng(0)
+    encodings = rng.normal(size=(3, 128)).astype(np.float32)
+    path = str(tmp_path / 'gallery.bin')
+    write_gallery_snapshot(path, [10, 11, 12], ['a', 'b', 'c'], encodings, version=7)
+    version, ids, names, mapped = open_gallery_snapshot(path)
+    gallery = FaceGallery()
+    gallery.adopt(ids, names, mapped, version=version)
+    assert gallery.version == 7 and gallery.match(encodings[1:2])[0][:2] == (11, 'b')
+    gallery.remove(10)
+    gallery.upsert(13, 'd', encodings[0])
+    assert gallery.match(encodings[0:1])[0][:2] == (13, 'd') and len(gallery) == 3
+    assert open_gallery_snapshot(path)[1].tolist() == [10, 11, 12]
+    assert open_gallery_snapshot(str(tmp_path / 'missing.bin')) is None
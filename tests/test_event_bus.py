@@ -0,0 +1,26 @@
+"""
+Tests for the in-process event bus behind the SSE endpoint.
+"""
+import threading
+
+from event_bus import EventBus
+
+def test_resume_from_last_id_and_detect_missed_events():
+    bus = EventBus(capacity=3)
+    for i in range(5):
+        bus.publish('attendance', {'n': i})
+    events, missed = bus.since(3)
+    assert [e.id for e in events] == [4, 5] and not missed
+    events, missed = bus.since(1)
+    assert [e.id for e in events] == [3, 4, 5] and missed
+    events, missed = bus.since(99)
+    assert missed and len(events) == 3
+
+def test_wait_wakes_on_publish_and_forwarding_skips_buffer():
+    bus = EventBus()
+    threading.Timer(0.05, bus.publish, args=('camera_status', {'state': 'up'})).start()
+    events, _ = bus.wait(0, timeout=2)
+    assert [(e.type, e.data['state']) for e in events] == [('camera_status', 'up')]
+    forwarded = []
+    bus.forward_to(lambda event_type, data: forwarded.append(event_type))
+    assert bus.publish('attendance') is None and forwarded == ['attendance'] and bus.last_id == 1
@@ -0,0 +1,52 @@
+"""
+Tests for the downscaled face detection helpers.
+"""
+import numpy as np
+import pytest
+
+import face_detection
+from face_detection import detect_faces, parse_detection_scale, parse_detection_upsample, scale_locations
+
+def fake_locations(boxes):
+    calls = []
+
+    def face_locations(image, number_of_times_to_upsample=1, model='hog'):
+        calls.append((image.shape, number_of_times_to_upsample, model))
+        return boxes
+    return face_locations, calls
+
+def test_scale_locations_scales_and_clamps_to_frame():
+    assert scale_locations([(10, 30, 20, 5)], 2) == [(20, 60, 40, 10)]
+    assert scale_locations([(-1, 60, 55, -3)], 2, (100, 80, 3)) == [(0, 80, 100, 0)]
+
+def test_detect_faces_maps_downscaled_boxes_to_full_resolution(monkeypatch):
+    face_locations, calls = fake_locations([(10, 40, 30, 20), (40, 80, 60, 70)])
+    monkeypatch.setattr(face_detection.face_recognition, 'face_locations', face_locations)
+    frame = np.zeros((100, 160, 3), dtype=np.uint8)
+    locations = detect_faces(frame, scale=0.5, model='cnn', upsample=2)
+    assert calls == [((50, 80, 3), 2, 'cnn')]
+    assert locations == [(20, 80, 60, 40), (80, 160, 100, 140)]  # Second box clamped to the frame
+
+def test_detect_faces_at_native_scale_passes_the_frame_through(monkeypatch):
+    face_locations, calls = fake_locations([(1, 2, 3, 0)])
+    monkeypatch.setattr(face_detection.face_recognition, 'face_locations', face_locations)
+    assert detect_faces(np.zeros((40, 60, 3), dtype=np.uint8)) == [(1, 2, 3, 0)]
+    assert calls == [((40, 60, 3), 1, 'hog')]
+
+def test_detect_faces_offsets_boxes_found_in_a_region(monkeypatch):
+    face_locations, calls = fake_locations([(5, 20, 15, 10)])
+    monkeypatch.setattr(face_detection.face_recognition, 'face_locations', face_locations)
+    frame = np.zeros((200, 200, 3), dtype=np.uint8)
+    locations = detect_faces(frame, scale=0.5, region=(40, 150, 120, 50))
+    assert calls == [((40, 50, 3), 1, 'hog')]
+    assert locations == [(50, 90, 70, 70)]
+
+def test_detection_settings_are_range_checked():
+    assert parse_detection_scale('0.5') == 0.5
+    assert parse_detection_upsample('3') == 3
+    for raw in ('0', '1.5'):
+        with pytest.raises(ValueError):
+            parse_detection_scale(raw)
+    for raw in ('-1', '4'):
+        with pytest.raises(ValueError):
+            parse_detection_upsample(raw)
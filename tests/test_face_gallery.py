@@ -0,0 +1,44 @@
+"""
+Tests for the shared face-encoding gallery.
+"""
+import numpy as np
+from face_gallery import FaceGallery
+
+def _random_encodings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return rng.normal(0, 0.1, size=(n, 128))
+
+def test_match_empty_gallery():
+    gallery = FaceGallery()
+    results = gallery.match(_random_encodings(2))
+    assert [r[:2] for r in results] == [(None, 'Unknown'), (None, 'Unknown')]
+
+def test_match_returns_nearest_within_tolerance():
+    known = _random_encodings(50)
+    gallery = FaceGallery()
+    gallery.load((i + 1, f'emp{i}', enc) for i, enc in enumerate(known))
+    queries = np.vstack([known[7] + 0.001, known[42]])
+    results = gallery.match(queries, tolerance=0.5)
+    assert [r[:2] for r in results] == [(8, 'emp7'), (43, 'emp42')]
+    expected = np.linalg.norm(known[7] - queries[0])
+    assert abs(results[0][2] - expected) < 1e-3
+
+def test_match_rejects_faces_beyond_tolerance():
+    known = _random_encodings(3)
+    gallery = FaceGallery()
+    gallery.load((i, f'emp{i}', enc) for i, enc in enumerate(known))
+    (pk, name, distance), = gallery.match([known[0] + 1.0], tolerance=0.5)
+    assert pk is None and name == 'Unknown' and distance > 0.5
+
+def test_upsert_and_remove_patch_rows_in_place():
+    known = _random_encodings(100)
+    gallery = FaceGallery()
+    gallery.load(((i, f'emp{i}', enc) for i, enc in enumerate(known[:70])), version=3)
+    for i in range(70, 100):
+        gallery.upsert(i, f'emp{i}', known[i], version=3 + i)
+    gallery.remove(5, version=200)
+    gallery.upsert(6, 'renamed', known[6], version=201)
+    assert len(gallery) == 99 and 5 not in gallery
+    assert gallery.version == 201
+    results = gallery.match(known[[5, 6, 99]], tolerance=0.01)
+    assert [r[:2] for r in results] == [(None, 'Unknown'), (6, 'renamed'), (99, 'emp99')]
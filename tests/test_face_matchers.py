@@ -0,0 +1,49 @@
+"""
+Tests for the exact and IVF face matcher backends.
+"""
+import numpy as np
+import pytest
+from face_gallery import FaceGallery
+from face_matchers import ExactMatcher, IVFMatcher, create_matcher
+
+def _gallery(n, seed=0):
+    rng = np.random.default_rng(seed)
+    known = rng.normal(0, 0.09, size=(n, 128)).astype(np.float32)
+    gallery = FaceGallery()
+    gallery.load(((i + 1, f'emp{i}', enc) for i, enc in enumerate(known)), version=1)
+    return gallery, known
+
+def test_ivf_with_all_partitions_probed_matches_exact():
+    gallery, known = _gallery(500)
+    exact, ivf = ExactMatcher(), IVFMatcher(nlist=16)
+    exact.attach(gallery)
+    ivf.attach(gallery)
+    probes = known[::25] + 0.01
+    exact_pks, exact_d = exact.search(probes)
+    ivf_pks, ivf_d = ivf.search(probes, nprobe=16)
+    assert np.array_equal(exact_pks, ivf_pks)
+    assert np.allclose(exact_d, ivf_d, atol=1e-4)
+
+def test_ivf_follows_gallery_inserts_and_deletes():
+    gallery, known = _gallery(200)
+    gallery.set_matcher(IVFMatcher(nlist=8, nprobe=8))
+    extra = np.full(128, 0.2, dtype=np.float32)
+    gallery.upsert(999, 'newcomer', extra, version=2)
+    gallery.remove(1, version=3)
+    results = gallery.match([extra, known[0]], tolerance=0.01)
+    assert [r[:2] for r in results] == [(999, 'newcomer'), (None, 'Unknown')]
+
+def test_ivf_index_persists_and_reconciles(tmp_path):
+    path = str(tmp_path / 'index.npz')
+    gallery, known = _gallery(300)
+    IVFMatcher(nlist=8, index_path=path).attach(gallery)
+    gallery.remove(5, version=2)
+    reloaded = IVFMatcher(nlist=8, nprobe=8, index_path=path)
+    reloaded.attach(gallery)
+    assert len(reloaded) == 299
+    pks, _ = reloaded.search(known[[5, 6]])
+    assert pks[1] == 7 and pks[0] != 5
+
+def test_create_matcher_rejects_unknown_kind():
+    with pytest.raises(ValueError):
+        create_matcher('lsh')
@@ -0,0 +1,34 @@
+"""
+Tests for tracking faces between recognition passes.
+"""
+import numpy as np
+from face_tracking import FaceTracker
+
+def _frame(x, y, seed=1):
+    rng = np.random.default_rng(seed)
+    frame = np.full((240, 320, 3), 90, dtype=np.uint8)
+    frame[y:y + 60, x:x + 60] = rng.integers(0, 255, size=(60, 60, 3), dtype=np.uint8)
+    return frame
+
+def test_tracks_between_passes_and_recognizes_every_n_frames():
+    calls = []
+    def recognize(frame):
+        calls.append(frame)
+        return [((50, 110, 110, 50), 'alice', 0.8)]
+    tracker = FaceTracker(every_n_frames=4, motion_threshold=None)
+    results = [tracker.update(_frame(50 + i, 50), recognize) for i in range(8)]
+    assert len(calls) == 2
+    (top, right, bottom, left), name, _ = results[2][0]
+    assert name == 'alice' and abs(left - 52) <= 2 and right - left == 60
+    assert tracker.stats()['tracked_frames'] == 6
+
+def test_lost_track_forces_recognition():
+    calls = []
+    def recognize(frame):
+        calls.append(frame)
+        return [((50, 110, 110, 50), 'alice', 0.8)] if len(calls) == 1 else []
+    tracker = FaceTracker(every_n_frames=100, motion_threshold=None)
+    tracker.update(_frame(50, 50), recognize)
+    blank = np.full((240, 320, 3), 90, dtype=np.uint8)
+    assert tracker.update(blank, recognize) == []
+    assert len(calls) == 2 and tracker.stats()['forced_passes'] == 1
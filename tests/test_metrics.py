@@ -0,0 +1,80 @@
+"""
+Tests for the in-process metrics registry and its Prometheus text output.
+"""
+import pickle
+
+import pytest
+
+from metrics import MetricsRegistry
+
+def _registry():
+    registry = MetricsRegistry()
+    frames = registry.counter('frames_total', 'Frames read', ('camera',))
+    latency = registry.histogram('stage_seconds', 'Stage latency', ('camera', 'stage'), buckets=(0.01, 0.1))
+    viewers = registry.gauge('viewers', 'Connected viewers')
+    return registry, frames, latency, viewers
+
+def test_render_counters_gauges_and_cumulative_buckets():
+    registry, frames, latency, viewers = _registry()
+    frames.labels(1).inc()
+    frames.labels('1').inc(2)
+    child = latency.labels(1, 'detect')
+    for seconds in (0.005, 0.05, 0.05, 3.0):
+        child.observe(seconds)
+    viewers.labels().inc()
+    text = registry.render()
+    assert '# TYPE frames_total counter\nframes_total{camera="1"} 3\n' in text
+    assert 'stage_seconds_bucket{camera="1",stage="detect",le="0.01"} 1\n' in text
+    assert 'stage_seconds_bucket{camera="1",stage="detect",le="0.1"} 3\n' in text
+    assert 'stage_seconds_bucket{camera="1",stage="detect",le="+Inf"} 4\n' in text
+    assert 'stage_seconds_count{camera="1",stage="detect"} 4\n' in text
+    assert 'stage_seconds_sum{camera="1",stage="detect"} 3.105' in text
+    assert '# TYPE viewers gauge\nviewers 1\n' in text
+
+def test_labels_are_checked_and_children_kept():
+    registry, frames, latency, viewers = _registry()
+    assert frames.labels(1) is frames.labels('1')
+    with pytest.raises(ValueError):
+        latency.labels(1)
+
+def test_worker_snapshots_are_merged_and_reset_zeroes():
+    registry, frames, latency, viewers = _registry()
+    worker, worker_frames, worker_latency, _ = _registry()
+    frames.labels(1).inc()
+    worker_frames.labels(1).inc(4)
+    worker_frames.labels(2).inc()
+    worker_latency.labels(2, 'match').observe(0.5)
+    snapshot = pickle.loads(pickle.dumps(worker.snapshot()))
+    text = registry.render([snapshot])
+    assert 'frames_total{camera="1"} 5\n' in text
+    assert 'frames_total{camera="2"} 1\n' in text
+    assert 'stage_seconds_count{camera="2",stage="match"} 1\n' in text
+
+    worker.reset()
+    assert 'frames_total{camera="1"} 0\n' in worker.render()
+
+def test_exited_worker_snapshots_fold_into_a_running_total():
+    registry, frames, latency, viewers = _registry()
+    worker, worker_frames, worker_latency, worker_viewers = _registry()
+    worker_frames.labels(1).inc(2)
+    worker_latency.labels(1, 'detect').observe(0.05)
+    worker_viewers.labels().inc()
+    total = registry.fold(None, worker.snapshot())
+    total = registry.fold(total, worker.snapshot())
+    assert 'viewers' not in total
+    text = registry.render([total])
+    assert 'frames_total{camera="1"} 4\n' in text
+    assert 'stage_seconds_count{camera="1",stage="detect"} 2\n' in text
+    assert 'viewers 0\n' in text
+
+def test_label_values_are_escaped():
+    registry, frames, _, _ = _registry()
+    frames.labels('a"b\\c').inc()
+    assert 'frames_total{camera="a\\"b\\\\c"} 1\n' in registry.render()
+
+def test_unlabelled_metrics_are_exported_before_first_use():
+    registry = MetricsRegistry()
+    registry.histogram('commit_seconds', 'Commit latency', buckets=(0.1,))
+    text = registry.render()
+    assert 'commit_seconds_bucket{le="+Inf"} 0\n' in text
+    assert 'commit_seconds_count 0\n' in text
@@ -0,0 +1,44 @@
+"""
+Tests for shared per-variant MJPEG encoding.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+import mjpeg
+from mjpeg import EncodedFrame, stream_variant
+
+def _jpeg_size(part):
+    data = part.split(b'\r\n\r\n', 1)[1][:-2]
+    image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    return image.shape[1], image.shape[0]
+
+def test_variants_are_snapped_and_clamped():
+    assert stream_variant() == (None, 80)
+    assert stream_variant(650, 73) == (640, 75)
+    assert stream_variant(10, 500) == (64, 95)
+    assert stream_variant(None, None, default_quality=60) == (None, 60)
+
+def test_each_variant_is_encoded_once_and_never_upscaled(monkeypatch):
+    calls = []
+    real_part = mjpeg.mjpeg_part
+    def counting_part(image, quality):
+        calls.append((image.shape[1], quality))
+        return real_part(image, quality)
+    monkeypatch.setattr(mjpeg, 'mjpeg_part', counting_part)
+
+    frame = EncodedFrame(np.zeros((720, 1280, 3), np.uint8))
+    small = stream_variant(640, 60)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(frame.part(small))) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert all(r is results[0] for r in results)
+    assert _jpeg_size(results[0]) == (640, 360)
+
+    assert frame.part(stream_variant(1920, 60)) is frame.part(stream_variant(None, 60))
+    assert _jpeg_size(frame.part(stream_variant(None, 60))) == (1280, 720)
+    assert calls == [(640, 60), (1280, 60)]
@@ -0,0 +1,28 @@
+"""
+Tests for skipping detection on static frames.
+"""
+import time
+
+import numpy as np
+from motion_gate import MotionGate
+
+def _frame(x=None):
+    frame = np.full((240, 320, 3), 90, dtype=np.uint8)
+    if x is not None:
+        frame[100:160, x:x + 40] = 250
+    return frame
+
+def test_static_frames_are_skipped_and_motion_passes_with_region():
+    gate = MotionGate(threshold=0.002, max_skip_seconds=0)
+    assert gate.check(_frame())[0]
+    assert [gate.check(_frame())[0] for _ in range(3)] == [False, False, False]
+    moved, region = gate.check(_frame(200))
+    top, right, bottom, left = region
+    assert moved and top <= 100 and bottom >= 160 and left <= 200 and right >= 240
+    assert gate.stats() == {'motion_gate_frames_checked': 5, 'motion_gate_frames_skipped': 3}
+
+def test_static_scene_still_passes_after_max_skip():
+    gate = MotionGate(max_skip_seconds=0.001)
+    gate.check(_frame())
+    time.sleep(0.01)
+    assert gate.check(_frame()) == (True, None)
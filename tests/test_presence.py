@@ -0,0 +1,58 @@
+"""
+Tests for the incrementally maintained presence table.
+"""
+from datetime import datetime, timedelta
+
+from presence import PresenceTable
+
+NOW = datetime(2026, 10, 18, 12, 0, 0)
+
+def _employee(pk):
+    return {'id': pk, 'name': f'E{pk}', 'employee_id': f'ID{pk}', 'image_url': f'/static/uploads/{pk}.jpg',
+            'thumbnail_url': f'/thumbnails/{pk}_160.webp'}
+
+def test_presence_follows_events_and_expiry():
+    table = PresenceTable(window_seconds=30)
+    table.set_employees([_employee(1), _employee(2)], version=1, now=NOW)
+    table.load([(1, 1, NOW - timedelta(seconds=20), {'timestamp': 'a'})], 1, NOW)
+    table.record(2, 2, NOW, {'timestamp': 'b'}, NOW)
+    table.record(3, 2, NOW - timedelta(minutes=5), {'timestamp': 'old'}, NOW)
+    table.record(4, 1, NOW + timedelta(minutes=5), {'timestamp': 'future'}, NOW)
+    version, payload = table.snapshot()
+    assert payload['summary']['present'] == 2 and [e['attendance_count'] for e in payload['employees']] == [1, 1]
+    assert table.snapshot()[0] == version
+    table.expire(NOW + timedelta(seconds=15))
+    _, payload = table.snapshot()
+    assert payload['summary'] == dict(payload['summary'], present=1, absent=1, attendance_rate=50)
+    assert [e['status'] for e in payload['employees']] == ['absent', 'present']
+
+def test_catch_up_skips_recorded_rows_and_expires_out_of_order_arrivals():
+    table = PresenceTable(window_seconds=30)
+    table.set_employees([_employee(1), _employee(2)], version=1, now=NOW)
+    table.load([], 0, NOW)
+    table.record(2, 1, NOW, {'timestamp': 'mine'}, NOW)
+    # Another worker wrote id 1 (earlier) while this process wrote id 2
+    table.catch_up([(1, 2, NOW - timedelta(seconds=25), {'timestamp': 'theirs'}),
+                    (2, 1, NOW, {'timestamp': 'mine'})], 2, NOW)
+    _, payload = table.snapshot()
+    assert table.synced_log_id == 2 and [e['attendance_count'] for e in payload['employees']] == [1, 1]
+    table.expire(NOW + timedelta(seconds=10))
+    _, payload = table.snapshot()
+    assert [e['status'] for e in payload['employees']] == ['present', 'absent'] and payload['summary']['present'] == 1
+
+def test_suppressed_sightings_keep_an_employee_present():
+    table = PresenceTable(window_seconds=30)
+    table.set_employees([_employee(1)], version=1, now=NOW)
+    table.load([], 0, NOW)
+    table.record(1, 1, NOW, {'timestamp': 'logged'}, NOW)
+    # Already logged today: later sightings write no row but still count as seen
+    later = NOW + timedelta(seconds=25)
+    table.record_sighting(1, later, {'timestamp': 'seen'}, later)
+    table.record_sighting(1, later + timedelta(seconds=1), {'timestamp': 'seen again'}, later + timedelta(seconds=1))
+    table.expire(NOW + timedelta(seconds=45))
+    _, payload = table.snapshot()
+    employee = payload['employees'][0]
+    assert employee['status'] == 'present' and employee['attendance_count'] == 2
+    assert employee['last_detected'] == 'seen again'
+    table.expire(NOW + timedelta(seconds=60))
+    assert table.snapshot()[1]['summary']['present'] == 0
@@ -0,0 +1,93 @@
+"""
+Tests for on-demand profiling of camera pipelines.
+"""
+import pstats
+import threading
+import time
+
+import pytest
+
+import profiling
+from camera_pipeline import CameraPipeline
+from profiling import ThreadProfiles, capture_profile, sample_stacks
+
+class EndlessCamera:
+    def read(self):
+        time.sleep(0.002)
+        return True, 0
+
+    def release(self):
+        pass
+
+def busy_recognize(frame):
+    return sum(range(2000))
+
+def test_sample_stacks_only_covers_selected_threads():
+    stop = threading.Event()
+    thread = threading.Thread(target=lambda: stop.wait(5), name='camera-7-recognize')
+    thread.start()
+    try:
+        text = sample_stacks(0.05, interval=0.005, thread_prefix='camera-7-')
+    finally:
+        stop.set()
+        thread.join()
+    lines = text.splitlines()
+    assert lines and all(line.startswith('camera-7-recognize;') for line in lines)
+    assert all(int(line.rsplit(' ', 1)[1]) > 0 for line in lines)
+
+def test_thread_profiles_merge_into_pstats(tmp_path):
+    profiles = ThreadProfiles(5, single_thread=False)
+    threads = [threading.Thread(target=profiles.call, args=(busy_recognize, None)) for _ in range(2)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    path = tmp_path / 'out.pstats'
+    path.write_bytes(profiles.dump())
+    stats = pstats.Stats(str(path))
+    assert any(func[2] == 'busy_recognize' and stat[0] == 2 for func, stat in stats.stats.items())
+
+def test_cprofile_capture_of_a_running_pipeline(tmp_path):
+    pipeline = CameraPipeline(EndlessCamera(), recognize=busy_recognize, encode=lambda f, r: r,
+                              name='camera-3').start()
+    try:
+        data, extension, note = capture_profile('cprofile', 0.2, 'camera-3')
+    finally:
+        pipeline.stop()
+    assert extension == 'pstats' and pipeline.profiler is None
+    assert note is None or 'camera-3-' in note
+    path = tmp_path / 'out.pstats'
+    path.write_bytes(data)
+    assert any(func[2] == 'busy_recognize' for func in pstats.Stats(str(path)).stats)
+
+def test_single_thread_capture_profiles_only_the_first_caller(tmp_path):
+    profiles = ThreadProfiles(5, single_thread=True)
+    profiles.call(busy_recognize, None)
+    thread = threading.Thread(target=profiles.call, args=(busy_recognize, None), name='camera-1-encode')
+    thread.start()
+    thread.join()
+    path = tmp_path / 'out.pstats'
+    path.write_bytes(profiles.dump())
+    assert any(func[2] == 'busy_recognize' and stat[0] == 1 for func, stat in pstats.Stats(str(path)).stats.items())
+    assert 'only MainThread was profiled' in profiles.note()
+
+def test_calls_run_bare_while_another_profiler_is_active(monkeypatch):
+    class TakenProfile:
+        def enable(self):
+            raise ValueError('Another profiling tool is already active')
+
+    monkeypatch.setattr(profiling.cProfile, 'Profile', TakenProfile)
+    profiles = ThreadProfiles(5, single_thread=False)
+    assert profiles.call(busy_recognize, None) == sum(range(2000))
+    assert profiles.unprofiled == 1 and 'ran unprofiled' in profiles.note()
+
+def test_cprofile_falls_back_to_sampling_when_unavailable(monkeypatch):
+    monkeypatch.setattr(profiling, 'cprofile_available', lambda: False)
+    data, extension, note = capture_profile('cprofile', 0.02)
+    assert extension == 'collapsed' and 'sampling profile instead' in note
+
+def test_unknown_pipeline_and_mode_are_rejected():
+    with pytest.raises(LookupError):
+        capture_profile('sample', 0.01, 'camera-404')
+    with pytest.raises(ValueError):
+        capture_profile('perf', 0.01)
@@ -0,0 +1,92 @@
+"""
+Tests for the headless recognition supervisor in thread mode, and the
+frame mailbox of its worker processes.
+"""
+import queue
+import threading
+import time
+from camera_sessions import CameraSessionRegistry
+from metrics import MetricsRegistry
+from recognition_service import RecognitionSupervisor, _LatestFrames
+
+class IdlePipeline:
+    def __init__(self, feed_id):
+        self.feed_id = feed_id
+        self.stopped = threading.Event()
+
+    def frames(self):
+        self.stopped.wait(5)
+        return iter(())
+
+    def stop(self):
+        self.stopped.set()
+
+    def snapshot_stats(self):
+        return {}
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+def test_supervisor_follows_camera_changes_without_viewers():
+    started = []
+    def start_camera(feed_id):
+        started.append(IdlePipeline(feed_id))
+        return started[-1]
+    feeds = {1: ('rtsp://a', 'rtsp'), 2: ('rtsp://b', 'rtsp')}
+    registry = CameraSessionRegistry()
+    supervisor = RecognitionSupervisor(start_camera, lambda: dict(feeds), processes=0,
+                                       registry=registry, reconcile_interval=0).start()
+    try:
+        assert _wait_for(lambda: registry.get(1) is not None and registry.get(2) is not None)
+        first = registry.get(1).pipeline
+
+        feeds[1] = ('rtsp://moved', 'rtsp')
+        del feeds[2]
+        supervisor.reconcile()
+        assert first.stopped.is_set()
+        assert _wait_for(lambda: registry.get(1) is not None and registry.get(1).pipeline is not first)
+        assert registry.get(2) is None
+        assert _wait_for(lambda: supervisor.status()['cameras'][1]['state'] == 'up')
+    finally:
+        supervisor.shutdown()
+
+def test_worker_forwards_only_the_newest_frame_per_camera():
+    frame_q = queue.Queue(maxsize=1)
+    frame_q.put('busy')  # The parent is behind
+    latest = _LatestFrames(frame_q)
+    latest.put(1, 'a')
+    assert _wait_for(lambda: not latest._latest)  # Sender holds 'a', blocked on the full queue
+    latest.put(1, 'b')
+    latest.put(2, 'x')
+    latest.put(1, 'c')
+    received = [frame_q.get(timeout=1) for _ in range(4)]
+    assert received == ['busy', (1, 'a'), (2, 'x'), (1, 'c')]
+
+def test_remote_viewers_end_when_their_camera_goes_down():
+    supervisor = RecognitionSupervisor(lambda feed_id: None, dict, processes=0)
+    viewer = supervisor.watch(3, 'full')
+    relayed = []
+    thread = threading.Thread(target=lambda: relayed.extend(viewer.frames('full', timeout=0.05)))
+    thread.start()
+    supervisor._record_status(3, 'down', 'camera unplugged')
+    thread.join(2)
+    assert not thread.is_alive() and viewer.broadcaster.error == 'camera unplugged'
+    supervisor.unwatch(3, viewer, 'full')
+    # The next viewer waits for the restarted camera on a fresh subscription
+    assert supervisor.watch(3, 'full') is not viewer
+
+def test_exited_worker_metrics_fold_into_one_total():
+    registry = MetricsRegistry()
+    frames = registry.counter('frames_total', 'Frames read')
+    frames.labels().inc(3)
+    supervisor = RecognitionSupervisor(lambda feed_id: None, dict, processes=0, fold_metrics=registry.fold)
+    for pid in (101, 102):
+        supervisor._worker_metrics[pid] = registry.snapshot()
+        supervisor._retire_metrics(pid)
+    assert supervisor._worker_metrics == {}
+    assert supervisor.worker_metrics() == [{'frames_total': {(): 6}}]
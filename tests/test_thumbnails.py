@@ -0,0 +1,35 @@
+"""
+Tests for content-hashed employee photo thumbnails.
+"""
+import io
+
+from PIL import Image
+
+from thumbnails import parse_thumbnail_name, remove_thumbnails, thumbnail_name, write_thumbnails
+
+HASH = 'ab' * 32
+
+def _photo(width=640, height=480):
+    data = io.BytesIO()
+    Image.new('RGB', (width, height), 'red').save(data, format='JPEG')
+    data.seek(0)
+    return data
+
+def test_names_round_trip():
+    name = thumbnail_name(HASH, 160, 'webp')
+    assert name == f'{HASH[:20]}_160.webp'
+    assert parse_thumbnail_name(name) == (HASH[:20], 160, 'webp')
+    assert parse_thumbnail_name('../etc/passwd') is None
+    assert parse_thumbnail_name(f'{HASH[:20]}_160.png') is None
+
+def test_thumbnails_are_written_once_per_size(tmp_path):
+    names = write_thumbnails(_photo(), str(tmp_path), HASH, (96, 160), 'jpg')
+    assert names == [thumbnail_name(HASH, 96, 'jpg'), thumbnail_name(HASH, 160, 'jpg')]
+    with Image.open(tmp_path / names[1]) as image:
+        assert image.size == (160, 120) and image.format == 'JPEG'
+    mtime = (tmp_path / names[0]).stat().st_mtime_ns
+    write_thumbnails(_photo(), str(tmp_path), HASH, (96, 160), 'jpg')
+    assert (tmp_path / names[0]).stat().st_mtime_ns == mtime
+
+    remove_thumbnails(str(tmp_path), HASH, (96, 160), 'jpg')
+    assert not list(tmp_path.iterdir())
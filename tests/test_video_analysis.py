@@ -0,0 +1,76 @@
+"""
+Tests for offline, segment-parallel video analysis.
+"""
+import cv2
+import numpy as np
+
+import video_analysis
+from face_gallery import FaceGallery
+from video_analysis import VideoAnalysisJob, merge_sightings, segment_ranges
+
+def _write_video(path, frames=24, fps=8):
+    """Frame i is a flat image of brightness 10 * i, so a worker can tell which frame it decoded"""
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*'MJPG'), fps, (64, 48))
+    for i in range(frames):
+        writer.write(np.full((48, 64, 3), 10 * i, np.uint8))
+    writer.release()
+
+def _gallery():
+    gallery = FaceGallery()
+    gallery.load([(7, 'Ann', np.full(128, 0.1))])
+    return gallery.snapshot()
+
+def fake_detect(rgb_frame, **kwargs):
+    index = int(round(rgb_frame.mean() / 10))
+    return [(0, 10, 10, 0)] if index % 4 == 0 else []
+
+def fake_encodings(rgb_frame, locations):
+    return [np.full(128, 0.1)]
+
+def fake_analyze(task):
+    """Pool worker stand-in: workers are not forked, so the fakes are installed in the worker itself"""
+    video_analysis.detect_faces = fake_detect
+    video_analysis.face_recognition.face_encodings = fake_encodings
+    return video_analysis.analyze_segment(task)
+
+def test_segments_cover_every_frame_once():
+    assert segment_ranges(10, 3) == [(0, 3), (3, 7), (7, 10)]
+    assert segment_ranges(2, 8) == [(0, 1), (1, 2)]
+
+def test_sightings_merge_across_segments_and_split_on_gaps():
+    sightings = [(0, 7, 'Ann', 0.4), (10, 7, 'Ann', 0.3), (11, 8, 'Bob', 0.2), (40, 7, 'Ann', 0.35)]
+    appearances = merge_sightings(sightings, fps=10, gap_seconds=2)
+    assert [(a['employee_name'], a['first_seen'], a['last_seen'], a['sightings'], a['best_distance'])
+            for a in appearances] == [('Ann', 0.0, 1.0, 2, 0.3), ('Bob', 1.1, 1.1, 1, 0.2), ('Ann', 4.0, 4.0, 1, 0.35)]
+
+def test_segment_worker_seeks_and_samples(tmp_path, monkeypatch):
+    path = tmp_path / 'clip.avi'
+    _write_video(path)
+    monkeypatch.setattr(video_analysis, 'detect_faces', fake_detect)
+    monkeypatch.setattr(video_analysis.face_recognition, 'face_encodings', fake_encodings)
+    video_analysis._init_worker(_gallery())
+
+    result = video_analysis.analyze_segment((str(path), 8, 20, 2, {}, 0.5))
+    assert result['frames_read'] == 12 and result['frames_analyzed'] == 6
+    assert [s[0] for s in result['sightings']] == [8, 12, 16]
+    assert all(s[1:3] == (7, 'Ann') for s in result['sightings'])
+
+def test_job_runs_segments_in_a_pool_and_stores_merged_appearances(tmp_path):
+    path = tmp_path / 'clip.avi'
+    _write_video(path)
+    stored = []
+    def store(appearances):
+        stored.extend(appearances)
+        return len(appearances)
+    job = VideoAnalysisJob(str(path), _gallery(), store, processes=2, sample_fps=4, segment_seconds=1,
+                           merge_gap_seconds=0.6, analyze=fake_analyze)
+    job.run()
+
+    status = job.status()
+    assert status['state'] == 'completed', status['message']
+    assert status['segments_total'] == status['segments_done'] == 3
+    assert status['progress'] == 1.0 and status['frames_read'] == 24
+    assert status['frames_analyzed'] == 12 and status['analyzed_fps'] > 0
+    # Every 4th frame at 8 fps is 0.5 s apart, so all sightings are one appearance
+    assert [(a['employee_pk'], a['first_seen'], a['last_seen'], a['sightings']) for a in stored] == [(7, 0.0, 2.5, 6)]
+    assert status['rows_written'] == 1 and status['appearances'][0]['confidence'] == 1.0
@@ -0,0 +1,63 @@
+"""
+Employee photo thumbnails for the Criminal Face Detection system.
+
+Thumbnails are written at a few fixed sizes when a photo is enrolled or
+changed. Their file names are built from the content hash of the original
+photo and the size, so a name always refers to the same bytes and can be
+cached by browsers indefinitely; a new photo gets new names.
+"""
+import os
+import re
+
+from PIL import Image, ImageOps, features
+
+HASH_CHARS = 20
+THUMBNAIL_NAME = re.compile(r'^([0-9a-f]{%d})_(\d+)\.(webp|jpg)$' % HASH_CHARS)
+
+
+def thumbnail_extension(preferred):
+    """'webp' when requested and Pillow can write it, otherwise 'jpg'"""
+    if preferred == 'webp' and features.check('webp'):
+        return 'webp'
+    return 'jpg'
+
+
+def thumbnail_name(image_hash, size, ext):
+    return f'{image_hash[:HASH_CHARS]}_{size}.{ext}'
+
+
+def parse_thumbnail_name(filename):
+    """Return (hash prefix, size, ext) for a thumbnail file name, or None"""
+    match = THUMBNAIL_NAME.match(filename)
+    if match is None:
+        return None
+    return match.group(1), int(match.group(2)), match.group(3)
+
+
+def write_thumbnails(source, folder, image_hash, sizes, ext, quality=80):
+    """
+    Write the thumbnails of one photo that do not exist yet.
+    :param source: path or file object of the original photo
+    :return: file names of all thumbnails for the photo
+    """
+    names = {size: thumbnail_name(image_hash, size, ext) for size in sizes}
+    missing = [size for size in sorted(sizes, reverse=True) if not os.path.exists(os.path.join(folder, names[size]))]
+    if missing:
+        os.makedirs(folder, exist_ok=True)
+        with Image.open(source) as original:
+            image = ImageOps.exif_transpose(original).convert('RGB')
+        for size in missing:
+            # Largest first, so each smaller size is resampled from the previous one
+            image.thumbnail((size, size), Image.LANCZOS)
+            path = os.path.join(folder, names[size])
+            tmp_path = f'{path}.{os.getpid()}.tmp'
+            image.save(tmp_path, format='WEBP' if ext == 'webp' else 'JPEG', quality=quality)
+            os.replace(tmp_path, path)
+    return [names[size] for size in sizes]
+
+
+def remove_thumbnails(folder, image_hash, sizes, ext):
+    for size in sizes:
+        path = os.path.join(folder, thumbnail_name(image_hash, size, ext))
+        if os.path.exists(path):
+            os.remove(path)
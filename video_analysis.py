@@ -0,0 +1,247 @@
+"""
+Offline analysis of uploaded videos for the Criminal Face Detection system.
+
+Instead of replaying a file at playback speed, a job splits it into time
+segments that a process pool analyzes in parallel. Each worker seeks to its
+segment with CAP_PROP_POS_FRAMES, decodes only the sampled frames, and
+matches faces against a copy of the gallery taken when the job started.
+Sightings from all segments are then merged into one appearance per
+employee visit, with offsets into the video.
+"""
+import concurrent.futures
+import math
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+
+import cv2
+import face_recognition
+import numpy as np
+
+from face_detection import detect_faces
+
+# Gallery snapshot of the job this worker process serves
+_worker_gallery = None
+
+
+def _init_worker(snapshot):
+    global _worker_gallery
+    _worker_gallery = snapshot
+
+
+def probe_video(path):
+    """Return (fps, frame_count) from the container header without decoding frames"""
+    capture = cv2.VideoCapture(path)
+    try:
+        if not capture.isOpened():
+            raise ValueError('Video cannot be opened')
+        fps = capture.get(cv2.CAP_PROP_FPS) or 25.0
+        frame_count = int(capture.get(cv2.CAP_PROP_FRAME_COUNT))
+    finally:
+        capture.release()
+    if frame_count <= 0:
+        raise ValueError('Video has no frames')
+    return fps, frame_count
+
+
+def segment_ranges(frame_count, segments):
+    """Split [0, frame_count) into up to `segments` contiguous (start, end) frame ranges"""
+    segments = max(1, min(segments, frame_count))
+    bounds = np.linspace(0, frame_count, segments + 1).round().astype(int)
+    return [(int(start), int(end)) for start, end in zip(bounds[:-1], bounds[1:]) if end > start]
+
+
+def analyze_segment(task):
+    """
+    Process-pool worker: recognize faces in every `step`-th frame (counted from the
+    start of the video, so sampling is even across segment boundaries) of one segment.
+    :param task: (path, start_frame, end_frame, step, detection kwargs, tolerance)
+    :return: dict with the segment bounds, frame counts, seconds spent and
+             sightings as (frame_index, employee_pk, name, distance)
+    """
+    path, start, end, step, detection, tolerance = task
+    began = time.perf_counter()
+    capture = cv2.VideoCapture(path)
+    capture.set(cv2.CAP_PROP_POS_FRAMES, start)
+    sightings = []
+    read = analyzed = 0
+    try:
+        for index in range(start, end):
+            if index % step:
+                # Skipped frames are only grabbed, never converted
+                if not capture.grab():
+                    break
+                read += 1
+                continue
+            ok, frame = capture.read()
+            if not ok or frame is None:
+                break
+            read += 1
+            analyzed += 1
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+            locations = detect_faces(rgb_frame, **detection)
+            if not locations:
+                continue
+            encodings = face_recognition.face_encodings(rgb_frame, locations)
+            best, distances = _worker_gallery.nearest(encodings)
+            for idx, distance in zip(best.tolist(), distances.tolist()):
+                if idx >= 0 and distance <= tolerance:
+                    sightings.append((index, int(_worker_gallery.ids[idx]), _worker_gallery.names[idx], distance))
+    finally:
+        capture.release()
+    return {
+        'start': start,
+        'end': end,
+        'frames_read': read,
+        'frames_analyzed': analyzed,
+        'seconds': time.perf_counter() - began,
+        'sightings': sightings
+    }
+
+
+def merge_sightings(sightings, fps, gap_seconds):
+    """
+    Merge sightings into appearances: an employee's sightings less than
+    gap_seconds apart (also across segment boundaries) are one appearance.
+    :return: appearances ordered by first_seen, offsets in seconds
+    """
+    appearances = []
+    current = {}
+    for index, pk, name, distance in sorted(sightings, key=lambda s: (s[1], s[0])):
+        offset = index / fps
+        appearance = current.get(pk)
+        if appearance is None or offset - appearance['last_seen'] > gap_seconds:
+            appearance = current[pk] = {
+                'employee_pk': pk,
+                'employee_name': name,
+                'first_seen': offset,
+                'last_seen': offset,
+                'sightings': 0,
+                'best_distance': distance
+            }
+            appearances.append(appearance)
+        appearance['last_seen'] = offset
+        appearance['sightings'] += 1
+        appearance['best_distance'] = min(appearance['best_distance'], distance)
+    appearances.sort(key=lambda a: (a['first_seen'], a['employee_pk']))
+    return appearances
+
+
+class VideoAnalysisJob:
+    """
+    :param path: video file to analyze
+    :param gallery: GallerySnapshot to match against
+    :param store: callable(appearances) -> number of attendance rows written
+    :param processes: size of the process pool
+    :param sample_fps: frames analyzed per second of video
+    :param segment_seconds: longest segment handed to one worker
+    :param detection: keyword arguments for detect_faces()
+    :param merge_gap_seconds: sightings of an employee closer than this are one appearance
+    :param analyze: picklable segment worker, see analyze_segment
+    """
+
+    def __init__(self, path, gallery, store, processes=None, sample_fps=2.0, segment_seconds=30,
+                 detection=None, tolerance=0.5, merge_gap_seconds=30, analyze=analyze_segment):
+        self.id = uuid.uuid4().hex
+        self.path = path
+        self.gallery = gallery
+        self.store = store
+        self.processes = processes or os.cpu_count() or 1
+        self.sample_fps = sample_fps
+        self.segment_seconds = segment_seconds
+        self.detection = detection or {}
+        self.tolerance = tolerance
+        self.merge_gap_seconds = merge_gap_seconds
+        self.analyze = analyze
+        self._lock = threading.Lock()
+        self.state = 'queued'
+        self.message = None
+        self.fps = None
+        self.frame_count = 0
+        self.segments = []
+        self.segments_total = 0
+        self.frames_read = 0
+        self.frames_analyzed = 0
+        self.appearances = []
+        self.rows_written = 0
+        self.created_at = time.time()
+        self.started = None
+        self.elapsed = 0.0
+        self.finished_at = None
+
+    def start(self):
+        threading.Thread(target=self.run, name=f'video-analysis-{self.id[:8]}', daemon=True).start()
+        return self
+
+    def run(self):
+        self.state = 'running'
+        self.started = time.perf_counter()
+        try:
+            tasks = self._plan()
+            sightings = []
+            # Never fork the threaded web process; the initializer hands each worker the gallery snapshot
+            context = multiprocessing.get_context(
+                'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn')
+            with concurrent.futures.ProcessPoolExecutor(min(self.processes, len(tasks)), mp_context=context,
+                                                        initializer=_init_worker, initargs=(self.gallery,)) as pool:
+                for future in concurrent.futures.as_completed([pool.submit(self.analyze, task) for task in tasks]):
+                    result = future.result()
+                    sightings.extend(result['sightings'])
+                    with self._lock:
+                        self.frames_read += result['frames_read']
+                        self.frames_analyzed += result['frames_analyzed']
+                        self.segments.append({k: v for k, v in result.items() if k != 'sightings'})
+                        self.elapsed = time.perf_counter() - self.started
+            appearances = merge_sightings(sightings, self.fps, self.merge_gap_seconds)
+            self.rows_written = self.store(appearances)
+            self.appearances = appearances
+            self.state = 'completed'
+        except Exception as e:
+            self.state = 'failed'
+            self.message = str(e)
+            print(f"Video analysis {self.id} failed: {e}")
+        finally:
+            self.elapsed = time.perf_counter() - self.started
+            self.finished_at = time.time()
+
+    def _plan(self):
+        self.fps, self.frame_count = probe_video(self.path)
+        step = max(1, int(round(self.fps / self.sample_fps))) if self.sample_fps else 1
+        duration = self.frame_count / self.fps
+        segments = max(self.processes, math.ceil(duration / self.segment_seconds))
+        tasks = [(self.path, start, end, step, self.detection, self.tolerance)
+                 for start, end in segment_ranges(self.frame_count, segments)]
+        self.segments_total = len(tasks)
+        return tasks
+
+    def status(self):
+        with self._lock:
+            elapsed = self.elapsed if self.finished_at else (
+                time.perf_counter() - self.started if self.started else 0.0)
+            video_seconds = self.frame_count / self.fps if self.fps else 0.0
+            done = sum(s['end'] - s['start'] for s in self.segments)
+            return {
+                'job_id': self.id,
+                'state': self.state,
+                'message': self.message,
+                'video_seconds': round(video_seconds, 2),
+                'progress': round(done / self.frame_count, 4) if self.frame_count else 0.0,
+                'segments_total': self.segments_total,
+                'segments_done': len(self.segments),
+                'frames_read': self.frames_read,
+                'frames_analyzed': self.frames_analyzed,
+                'elapsed_seconds': round(elapsed, 3),
+                'read_fps': round(self.frames_read / elapsed, 1) if elapsed else None,
+                'analyzed_fps': round(self.frames_analyzed / elapsed, 1) if elapsed else None,
+                'realtime_factor': round(video_seconds * done / self.frame_count / elapsed, 2)
+                if elapsed and self.frame_count else None,
+                'segments': [dict(s, analyzed_fps=round(s['frames_analyzed'] / s['seconds'], 1) if s['seconds'] else None)
+                             for s in sorted(self.segments, key=lambda s: s['start'])],
+                'appearances': [dict(a, first_seen=round(a['first_seen'], 2), last_seen=round(a['last_seen'], 2),
+                                     confidence=round(1 - a['best_distance'], 4)) for a in self.appearances],
+                'rows_written': self.rows_written,
+                'created_at': self.created_at,
+                'finished_at': self.finished_at
+            }
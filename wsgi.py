@@ -6,5 +6,10 @@ Use this file with production WSGI servers like Gunicorn or uWSGI
 
 from app import app
 
+if app.config.get('RECOGNITION_SERVICE_ENABLED'):
+    # Every WSGI worker imports this module, so starting it here would run each camera once per worker
+    print("RECOGNITION_SERVICE_ENABLED is not applied under a WSGI server; "
+          "run 'python app.py --recognition-only' as a separate process")
+
 if __name__ == "__main__":
     app.run() 
\ No newline at end of file